@@ -0,0 +1,112 @@
+import asyncio
+import json as jsonlib
+from types import MappingProxyType
+
+import aiohttp
+from utils.loader import YamlLoader
+
+
+class AsyncResponse:
+    """异步请求的响应，字段与 requests.Response 常用部分一致（status_code / headers / json() / text），
+    同步、异步用例可以共用同一套断言。响应体在返回前已读完，连接已归还连接池。"""
+
+    __slots__ = ('status_code', 'headers', 'content', 'url', 'elapsed')
+
+    def __init__(self, status_code, headers, content, url, elapsed):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.elapsed = elapsed
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+    def __repr__(self):
+        return f'<AsyncResponse [{self.status_code}]>'
+
+
+class AsyncAPIClient:
+    """基于 asyncio / aiohttp 的接口客户端
+
+    - 一个 aiohttp.ClientSession（TCPConnector 连接池，keep-alive 复用连接），在第一次请求时创建，
+      因为 aiohttp 要求在事件循环内创建会话；
+    - 每个请求使用 client.timeout 秒的超时，调用时可传 timeout= 覆盖；
+    - 信号量限制同时在途的请求数（client.async_max_concurrency），超出的请求排队等待；
+    - as_user(token) 返回共用会话、只是鉴权头不同的句柄，可以在同一个事件循环里驱动大量身份。
+
+    用完需要 await client.close()，或者 async with AsyncAPIClient() as client: ...
+    """
+
+    def __init__(self):
+        self.config = YamlLoader.get_config()
+        self.base_url = self.config.get("base_url", "http://127.0.0.1:3001")
+        client_config = self.config.get("client", {})
+        self.pool_size = client_config.get("pool_size", 10)
+        self.timeout = aiohttp.ClientTimeout(total=client_config.get("timeout", 10))
+        self.max_concurrency = client_config.get("async_max_concurrency", 500)
+        self._state = {"session": None, "semaphore": None}  # as_user() 句柄共用
+        self.auth_headers = MappingProxyType({})
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def session(self):
+        session = self._state["session"]
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size)
+            session = self._state["session"] = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._state["semaphore"] = asyncio.Semaphore(self.max_concurrency)
+        return session
+
+    async def close(self):
+        session = self._state["session"]
+        if session is not None and not session.closed:
+            await session.close()
+        self._state["session"] = None
+
+    def as_user(self, token):
+        """返回以 token 身份发请求的句柄，与原客户端共用会话、连接池和并发上限"""
+        handle = object.__new__(type(self))
+        handle.__dict__.update(self.__dict__)
+        handle.auth_headers = MappingProxyType({"Authorization": f"Bearer {token}"})
+        return handle
+
+    async def request(self, method, endpoint, param=None, json=None, data=None, headers=None, timeout=None):
+        url = f"{self.base_url}{endpoint}"
+        if self.auth_headers:
+            headers = {**self.auth_headers, **(headers or {})}
+        if timeout is not None and not isinstance(timeout, aiohttp.ClientTimeout):
+            timeout = aiohttp.ClientTimeout(total=timeout)
+        session = self.session
+        loop = asyncio.get_running_loop()
+        async with self._state["semaphore"]:
+            start = loop.time()
+            async with session.request(method, url, params=param, json=json, data=data,
+                                       headers=headers, timeout=timeout or self.timeout) as resp:
+                content = await resp.read()
+                return AsyncResponse(resp.status, resp.headers, content, str(resp.url), loop.time() - start)
+
+    async def get(self, endpoint, param=None, **kwargs):
+        return await self.request("GET", endpoint, param=param, **kwargs)
+
+    async def post(self, endpoint, json=None, data=None, **kwargs):
+        return await self.request("POST", endpoint, json=json, data=data, **kwargs)
+
+    async def put(self, endpoint, json=None, data=None, **kwargs):
+        return await self.request("PUT", endpoint, json=json, data=data, **kwargs)
+
+    async def delete(self, endpoint, json=None, **kwargs):
+        return await self.request("DELETE", endpoint, json=json, **kwargs)
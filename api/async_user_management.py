@@ -0,0 +1,69 @@
+from api.async_client import AsyncAPIClient
+from api.user_management import ENDPOINTS
+
+
+class AsyncUserManagementAPI(AsyncAPIClient):
+    """UserManagementAPI 的 asyncio 版本，方法名、参数与返回的响应结构保持一致，调用时加 await"""
+
+    def __init__(self):
+        super().__init__()
+        self.endpoint = dict(ENDPOINTS)
+
+    async def register(self,register_data):
+        """用户注册"""
+        return await self.post(self.endpoint["register"],json=register_data)
+
+    async def login(self,login_data):
+        """用户登录"""
+        return await self.post(self.endpoint["login"],json=login_data)
+
+    async def obtain(self,user_id):
+        """获取用户信息"""
+        endpoint = self.endpoint["obtain"].format(user_id = user_id)
+        return await self.get(endpoint)
+
+    async def update(self,user_id,update_data):
+        """更新用户信息"""
+        endpoint = self.endpoint["update"].format(user_id = user_id)
+        return await self.put(endpoint,json=update_data)
+
+    async def delete_user(self,user_id,reason):
+        """删除用户信息"""
+        endpoint = self.endpoint["delete"].format(user_id = user_id)
+        return await self.delete(endpoint,json=reason)
+
+    async def admin(self,admin_data):
+        """管理员注册"""
+        return await self.post(self.endpoint["admin"],json=admin_data)
+
+    async def batch_register(self,users):
+        """批量注册，users 为注册参数列表"""
+        return await self.post(self.endpoint["batch_register"],json={"users": users})
+
+    async def batch_login(self,users):
+        """批量登录，users 为登录参数列表"""
+        return await self.post(self.endpoint["batch_login"],json={"users": users})
+
+    async def batch_obtain(self,user_ids):
+        """批量获取用户信息"""
+        return await self.post(self.endpoint["batch_obtain"],json={"user_ids": user_ids})
+
+    async def batch_delete(self,user_ids,reason = None):
+        """批量删除用户"""
+        return await self.post(self.endpoint["batch_delete"],json={"user_ids": user_ids,"reason": reason})
+
+    async def list_users(self,cursor = None,limit = None,**filters):
+        """管理员分页获取用户列表，filters 支持 role/status/create_time_from/create_time_to"""
+        param = {key: value for key, value in filters.items() if value is not None}
+        if cursor is not None:
+            param["cursor"] = cursor
+        if limit is not None:
+            param["limit"] = limit
+        return await self.get(self.endpoint["list"],param=param)
+
+    async def search(self,q,field = "email",mode = "prefix",limit = None):
+        """按邮箱 / 手机号搜索用户（需管理员权限），mode 为 prefix 或 exact"""
+        param = {"q": q,"field": field,"mode": mode}
+        if limit is not None:
+            param["limit"] = limit
+        return await self.get(self.endpoint["search"],param=param)
@@ -1,11 +1,115 @@
+import copy
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from types import MappingProxyType
+
 import requests
+from api.timing import TimedHTTPAdapter, connect_time, default_recorder, reset_connect_time
+from api.traffic import default_traffic_recorder
 from utils.loader import YamlLoader
 
+# 可以安全重试的幂等方法
+IDEMPOTENT_METHODS = frozenset(("GET","PUT","DELETE"))
+
+
+class DeadlineExceeded(requests.Timeout):
+    """一次调用（含重试、对冲）超过了 deadline"""
+
+
+class ETagCache:
+    """带 ETag 的 GET 响应缓存（LRU），键为 (url, 查询参数, Authorization)
+
+    缓存的响应每次都会用 If-None-Match 向服务端确认，服务端返回 304 时才复用，
+    所以不会读到过期数据，节省的是响应体的构造、传输和解析。
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(url, params, authorization):
+        if isinstance(params, dict):
+            params = tuple(sorted((str(k), str(v)) for k, v in params.items()))
+        return url, params, authorization
+
+    def get(self, key):
+        with self._lock:
+            resp = self._data.get(key)
+            if resp is not None:
+                self._data.move_to_end(key)
+            return resp
+
+    def put(self, key, resp):
+        with self._lock:
+            self._data[key] = resp
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    # 计数在锁内累加：缓存由所有 as_user() 句柄共用，会被多个线程并发调用
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
 class APIClient:
     def __init__(self):
         self.config = YamlLoader.get_config()
         self.base_url = self.config.get("base_url","http://127.0.0.1:3001")
         self.session = requests.session()  #requests.Session() 是 requests 库（Python 常用的 HTTP 请求库）提供的会话对象，它能保持请求之间的连接、Cookie 等状态。
+        client_config = self.config.get("client",{})
+        #连接池：每个 host 最多保持 pool_size 个连接，所有身份句柄共用
+        adapter = TimedHTTPAdapter(pool_maxsize=client_config.get("pool_size",10),
+                              pool_block=client_config.get("pool_block",False))
+        self.session.mount("http://",adapter)
+        self.session.mount("https://",adapter)
+        cache_size = client_config.get("etag_cache_size",256)
+        self.etag_cache = ETagCache(cache_size) if cache_size else None  #GET 响应的条件请求缓存，0 表示关闭
+        self.auth_headers = MappingProxyType({})  #as_user() 句柄每次请求携带的鉴权请求头
+        self.on_unauthorized = None  #响应为 401 时调用（无参数），login_as() 句柄用它让令牌池丢弃失效的令牌
+        self.recorder = default_recorder(client_config)  #请求耗时记录（client.timing），关闭时为 None
+        self.traffic = default_traffic_recorder(client_config,self.base_url)  #请求轨迹记录（client.traffic），关闭时为 None
+        self.timeout = client_config.get("timeout",10)  #单次尝试的超时（秒）
+        self.deadline = client_config.get("deadline")  #一次调用含重试、对冲的总时限（秒），None 不限
+        retry = client_config.get("retry",{})
+        self.max_attempts = max(1,retry.get("max_attempts",1))
+        self.backoff = retry.get("backoff",0.05)
+        self.backoff_max = retry.get("backoff_max",1.0)
+        self.retry_statuses = frozenset(retry.get("statuses",(429,502,503,504)))
+        hedge = client_config.get("hedge",{})
+        self.hedge_enabled = hedge.get("enabled",False)
+        self.hedge_quantile = hedge.get("quantile",95)
+        self.hedge_min_samples = hedge.get("min_samples",20)
+        self._shared = {"executor": None,"lock": threading.Lock()}  #对冲请求的线程池，as_user() 句柄共用
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+    def close(self):
+        """关闭对冲线程池与连接池（as_user() 句柄共用，关闭后所有句柄都不能再发请求）"""
+        with self._shared["lock"]:
+            executor,self._shared["executor"] = self._shared["executor"],None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        self.session.close()
 
 
 
@@ -19,37 +123,194 @@ class APIClient:
 
 
 
-    def authenticate(self,token):  #鉴权请求头
+    def authenticate(self,token):  #鉴权请求头（写入共享 session，多线程并发时请改用 as_user）
         self.session.headers.update(
             {"Authorization": f"Bearer {token}"
              })
 
+    def as_user(self,token):
+        """返回以 token 身份发请求的客户端句柄
+
+        句柄与原客户端共用同一个 session（连接池、ETag 缓存），鉴权头只随句柄自己的请求发送，
+        不修改共享的 session 请求头，多个线程可以各自持有不同身份的句柄并发调用。
+        """
+        handle = copy.copy(self)
+        handle.auth_headers = MappingProxyType({"Authorization": f"Bearer {token}"})
+        handle.on_unauthorized = None
+        return handle
+
+    def _headers(self,headers):
+        """合并句柄的鉴权头与本次请求显式传入的请求头（后者优先）"""
+        if not self.auth_headers:
+            return headers
+        return {**self.auth_headers,**(headers or {})}
+
+
+
+
 
 
 
 
+    def request(self,method,endpoint,path_params = None,deadline = None,**kwargs):
+        """发送请求：endpoint 可以是路径模板（如 /api/v1/users/{user_id}），由 path_params 填充，耗时按模板汇总
 
+        - 每次尝试的超时为 timeout（调用时可传 timeout= 覆盖），且不超过 deadline 的剩余时间；
+        - GET/PUT/DELETE 在连接失败、超时或返回 retry_statuses 时重试，至多 max_attempts 次，
+          重试前随机退避（full jitter），剩余时间不够退避时直接返回最后一次的结果；
+        - 开启对冲时，GET 的第一次请求超过该接口已观测的 p95 仍未返回，就再发一次，取先返回的结果。
+        """
+        kwargs["headers"] = self._headers(kwargs.get("headers"))
+        if self.traffic is None:
+            resp = self._request(method,endpoint,path_params,deadline,**kwargs)
+        else:
+            authorization = (kwargs["headers"] or {}).get("Authorization",self.session.headers.get("Authorization"))
+            sent_at = time.monotonic()
+            resp = None
+            try:
+                resp = self._request(method,endpoint,path_params,deadline,**kwargs)
+            finally:
+                self.traffic.record(sent_at,method,endpoint,path_params,kwargs.get("params"),kwargs.get("json"),
+                                    authorization,resp)
+        if resp.status_code == 401 and self.on_unauthorized is not None:
+            self.on_unauthorized()
+        return resp
 
+    def _request(self,method,endpoint,path_params,deadline,**kwargs):
+        url = f"{self.base_url}{endpoint.format(**path_params) if path_params else endpoint}"
+        timeout = kwargs.pop("timeout",self.timeout)
+        deadline = self.deadline if deadline is None else deadline
+        expires = time.monotonic() + deadline if deadline else None
+        attempts = self.max_attempts if method in IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            attempt_timeout = self._attempt_timeout(method,endpoint,timeout,expires)
+            try:
+                if method == "GET" and self.hedge_enabled:
+                    resp = self._send_hedged(method,endpoint,url,attempt_timeout,kwargs)
+                else:
+                    resp = self._send(method,endpoint,url,timeout=attempt_timeout,**kwargs)
+            except (requests.ConnectionError,requests.Timeout) as e:
+                if attempt == attempts - 1 or not self._backoff(attempt,None,expires):
+                    if isinstance(e,requests.Timeout) and expires is not None and time.monotonic() >= expires:
+                        self._count(method,endpoint,"deadline_exceeded")
+                    raise
+            else:
+                if resp.status_code not in self.retry_statuses or attempt == attempts - 1 \
+                        or not self._backoff(attempt,resp,expires):
+                    return resp
+            self._count(method,endpoint,"retry")
 
-    def get(self,endpoint,param = None,**kwargs):
-        """定义get请求方法"""
-        url = f"{self.base_url}{endpoint}"
-        # print(f"发送的请求头:{kwargs.get('headers')}]")
-        print(url)
-        return self.session.get(url,params=param,**kwargs)
+    def _attempt_timeout(self,method,endpoint,timeout,expires):
+        if expires is None:
+            return timeout
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            self._count(method,endpoint,"deadline_exceeded")
+            raise DeadlineExceeded(f"{method} {endpoint} 超过调用时限")
+        if timeout is None:
+            return remaining
+        if isinstance(timeout,tuple):
+            return tuple(min(t,remaining) if t is not None else remaining for t in timeout)
+        return min(timeout,remaining)
 
-    def post(self,endpoint,json = None,data = None,**kwargs):
+    def _backoff(self,attempt,resp,expires):
+        """重试前等待，剩余时间不够时返回 False（不再重试）"""
+        delay = random.uniform(0,min(self.backoff_max,self.backoff * 2 ** attempt))
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay,min(int(retry_after),self.backoff_max))
+        if expires is not None and time.monotonic() + delay >= expires:
+            return False
+        time.sleep(delay)
+        return True
+
+    def _count(self,method,endpoint,kind):
+        if self.recorder is not None:
+            self.recorder.count(method,endpoint,kind)
+
+    def _executor(self):
+        with self._shared["lock"]:
+            if self._shared["executor"] is None:
+                self._shared["executor"] = ThreadPoolExecutor(
+                    max_workers=self.config.get("client",{}).get("pool_size",10),thread_name_prefix="hedge")
+            return self._shared["executor"]
+
+    def _send_hedged(self,method,endpoint,url,timeout,kwargs):
+        """超过已观测的 p95 还没返回时发出第二个请求，取先成功返回的一个"""
+        delay = None
+        if self.recorder is not None:
+            delay = self.recorder.percentile(method,endpoint,self.hedge_quantile,self.hedge_min_samples)
+        if delay is None:
+            return self._send(method,endpoint,url,timeout=timeout,**kwargs)
+        executor = self._executor()
+        first = executor.submit(self._send,method,endpoint,url,timeout=timeout,**kwargs)
+        done,_ = wait([first],timeout=delay)
+        if done:
+            return first.result()
+        self._count(method,endpoint,"hedge")
+        hedge = executor.submit(self._send,method,endpoint,url,timeout=timeout,**kwargs)
+        pending = {first,hedge}
+        error = None
+        while pending:
+            done,pending = wait(pending,return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count(method,endpoint,"hedge_won")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _send(self,method,endpoint,url,**kwargs):
+        """发送一次请求并记录耗时"""
+        if self.recorder is None:
+            return self.session.request(method,url,**kwargs)
+        reset_connect_time()
+        start = time.perf_counter()
+        resp = self.session.request(method,url,**kwargs)
+        total = time.perf_counter() - start
+        body = resp.request.body or b""
+        self.recorder.record(method,endpoint,resp.status_code,connect_time(),resp.elapsed.total_seconds(),total,
+                             len(body.encode("utf-8") if isinstance(body,str) else body),_response_bytes(resp))
+        return resp
+
+    def get(self,endpoint,param = None,path_params = None,**kwargs):
+        """定义get请求方法（有缓存的响应时自动带 If-None-Match，304 时返回缓存的响应）"""
+        if self.etag_cache is None:
+            return self.request("GET",endpoint,path_params,params=param,**kwargs)
+
+        headers = dict(self._headers(kwargs.pop("headers",None)) or {})
+        authorization = headers.get("Authorization",self.session.headers.get("Authorization"))
+        url = endpoint.format(**path_params) if path_params else endpoint
+        key = self.etag_cache.key(url,param,authorization)
+        cached = self.etag_cache.get(key)
+        if cached is not None:
+            headers.setdefault("If-None-Match",cached.headers["ETag"])
+        resp = self.request("GET",endpoint,path_params,params=param,headers=headers,**kwargs)
+        if resp.status_code == 304 and cached is not None:
+            self.etag_cache.record_hit()
+            return cached
+        self.etag_cache.record_miss()
+        if resp.status_code == 200 and "ETag" in resp.headers:
+            self.etag_cache.put(key,resp)
+        return resp
+
+    def post(self,endpoint,json = None,data = None,path_params = None,**kwargs):
         """定义post方法"""
-        url = f"{self.base_url}{endpoint}"
-        return self.session.post(url,json=json,data=data,**kwargs)
+        return self.request("POST",endpoint,path_params,json=json,data=data,**kwargs)
 
-    def put(self,endpoint,json = None,data = None,**kwargs):
+    def put(self,endpoint,json = None,data = None,path_params = None,**kwargs):
         """定义put方法"""
-        url = f"{self.base_url}{endpoint}"
-        return self.session.put(url,json=json,data=data,**kwargs)
+        return self.request("PUT",endpoint,path_params,json=json,data=data,**kwargs)
 
-    def delete(self,endpoint,json= None,**kwargs):
+    def delete(self,endpoint,json= None,path_params = None,**kwargs):
         """定义delete方法"""
-        url = f"{self.base_url}{endpoint}"
-        return self.session.delete(url,json=json,**kwargs)
+        return self.request("DELETE",endpoint,path_params,json=json,**kwargs)
+
 
+def _response_bytes(resp):
+    """响应体在线路上的字节数（gzip 压缩时为压缩后的大小）"""
+    try:
+        return resp.raw.tell()
+    except AttributeError:
+        return len(resp.content)
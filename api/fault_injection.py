@@ -0,0 +1,216 @@
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger('mock_server')
+
+# 延迟分布：配置中的 latency.distribution -> 按参数（毫秒）采样一次延迟（毫秒）
+LATENCY_DISTRIBUTIONS = {
+    'fixed': lambda spec: spec['ms'],
+    'uniform': lambda spec: random.uniform(spec['min_ms'], spec['max_ms']),
+    'normal': lambda spec: random.gauss(spec['mean_ms'], spec.get('stddev_ms', 0)),
+    'exponential': lambda spec: random.expovariate(1 / spec['mean_ms']),
+    'lognormal': lambda spec: random.lognormvariate(math.log(spec['median_ms']), spec.get('sigma', 0.5)),
+}
+
+# 注入计数的事件类型
+EVENT_KINDS = ('latency', 'error', 'rate_limited')
+
+
+class TokenBucket:
+    """令牌桶：每秒补充 rate 个令牌，最多攒 burst 个"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，成功返回 0，否则返回距离下一个令牌的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class InjectionProfile:
+    """单个路由的注入配置
+
+    spec 字段（均可选）：
+    - latency: 毫秒数（固定延迟），或 {distribution: fixed|uniform|normal|exponential|lognormal, ...参数}
+    - latency_rate: 施加延迟的请求比例，默认 1
+    - error_rate: 返回 5xx 的概率；error_status: 状态码，默认 503
+    - rate_limit: {rate: 每秒请求数, burst: 突发上限}，超出时返回 429 + Retry-After
+
+    prod 多 worker 模式下每个 worker 各有一个令牌桶，rate / burst 按 worker 数平分。
+    """
+
+    def __init__(self, spec, workers=1):
+        if not isinstance(spec, dict):
+            raise ValueError('注入配置必须是对象')
+        self.spec = spec
+        latency = spec.get('latency')
+        if isinstance(latency, (int, float)):
+            latency = {'distribution': 'fixed', 'ms': latency}
+        if latency is not None and not isinstance(latency, dict):
+            raise ValueError(f'latency 必须是毫秒数或对象: {latency!r}')
+        if latency is not None:
+            sampler = LATENCY_DISTRIBUTIONS.get(latency.get('distribution', 'fixed'))
+            if sampler is None:
+                raise ValueError(f"不支持的延迟分布: {latency.get('distribution')}，"
+                                 f"可选值 {tuple(LATENCY_DISTRIBUTIONS)}")
+            try:
+                sampler(latency)
+            except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+                raise ValueError(f'延迟参数不合法: {latency}') from e
+        self.latency = latency
+        self.latency_rate = float(spec.get('latency_rate', 1))
+        self.error_rate = float(spec.get('error_rate', 0))
+        self.error_status = int(spec.get('error_status', 503))
+        if not 500 <= self.error_status <= 599:
+            raise ValueError('error_status 必须是 5xx')
+        if not (0 <= self.latency_rate <= 1 and 0 <= self.error_rate <= 1):
+            raise ValueError('latency_rate / error_rate 取值范围 0-1')
+        self.bucket = None
+        rate_limit = spec.get('rate_limit')
+        if rate_limit is not None:
+            rate = float(rate_limit['rate']) / workers
+            burst = max(1.0, float(rate_limit.get('burst', rate_limit['rate'])) / workers)
+            if rate <= 0:
+                raise ValueError('rate_limit.rate 必须大于 0')
+            self.bucket = TokenBucket(rate, burst)
+
+    def sample_latency(self):
+        """本次请求要注入的延迟（秒），不注入时为 0"""
+        if self.latency is None or (self.latency_rate < 1 and random.random() >= self.latency_rate):
+            return 0.0
+        return max(0.0, LATENCY_DISTRIBUTIONS[self.latency.get('distribution', 'fixed')](self.latency)) / 1000
+
+
+class FaultInjector:
+    """按路由注入延迟、5xx 错误和限流，并统计注入次数
+
+    profiles 的键为 "METHOD 路由模板"（如 "POST /api/v1/users/login"）、路由模板或 "*"（其余全部路由），
+    依次匹配。没有任何配置时 active 为 False，请求钩子只做一次判断。
+
+    sync_path 不为空时，运行时修改的配置会写入该文件，其他 worker 至多每秒检查一次并加载。
+    """
+
+    def __init__(self, profiles=None, workers=1, sync_path=None):
+        self.workers = workers
+        self.sync_path = sync_path
+        self._lock = threading.Lock()
+        self.counts = Counter()
+        self.injected_seconds = Counter()
+        self._synced_mtime = None
+        self._next_check = 0.0
+        self.set_profiles(profiles or {})
+
+    def set_profiles(self, specs, publish=False):
+        """替换全部注入配置，配置不合法时抛出 ValueError 且保持原配置"""
+        if not isinstance(specs, dict):
+            raise ValueError('profiles 必须是对象')
+        profiles = {}
+        for key, spec in specs.items():
+            try:
+                profiles[key] = InjectionProfile(spec, self.workers)
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f'{key}: {e}') from e
+        self.profiles = profiles
+        self.active = bool(profiles)
+        if publish and self.sync_path is not None:
+            tmp_path = self.sync_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(specs, f, ensure_ascii=False)
+            os.replace(tmp_path, self.sync_path)
+            self._synced_mtime = os.stat(self.sync_path).st_mtime_ns
+
+    def specs(self):
+        return {key: profile.spec for key, profile in self.profiles.items()}
+
+    def maybe_reload(self):
+        """多 worker 时检查共享配置文件是否被其他 worker 更新（至多每秒一次 stat）"""
+        if self.sync_path is None:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + 1
+        try:
+            mtime = os.stat(self.sync_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._synced_mtime:
+            self._synced_mtime = mtime
+            # 文件损坏或配置不合法时保留当前配置，不让每个请求都因此失败
+            try:
+                with open(self.sync_path, encoding='utf-8') as f:
+                    self.set_profiles(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning('加载共享的故障注入配置失败，保留当前配置: %s', e)
+
+    def profile_for(self, method, route):
+        profiles = self.profiles
+        return profiles.get(f'{method} {route}') or profiles.get(route) or profiles.get('*')
+
+    def _count(self, route, kind, seconds=0.0):
+        with self._lock:
+            self.counts[(route, kind)] += 1
+            if seconds:
+                self.injected_seconds[route] += seconds
+
+    def inject(self, method, route):
+        """对本次请求执行注入：需要直接返回时给出 (响应体, 状态码, 响应头)，否则返回 None"""
+        profile = self.profile_for(method, route)
+        if profile is None:
+            return None
+        if profile.bucket is not None:
+            wait = profile.bucket.acquire()
+            if wait:
+                self._count(route, 'rate_limited')
+                return {'code': 429, 'message': '请求过于频繁，请稍后再试'}, 429, \
+                    {'Retry-After': str(max(1, math.ceil(wait)))}
+        delay = profile.sample_latency()
+        if delay:
+            self._count(route, 'latency', delay)
+            time.sleep(delay)
+        if profile.error_rate and random.random() < profile.error_rate:
+            self._count(route, 'error')
+            return {'code': profile.error_status, 'message': '服务暂时不可用（故障注入）'}, \
+                profile.error_status, {}
+        return None
+
+    def stats(self):
+        with self._lock:
+            routes = {}
+            for (route, kind), n in self.counts.items():
+                routes.setdefault(route, dict.fromkeys(EVENT_KINDS, 0))[kind] = n
+            for route, seconds in self.injected_seconds.items():
+                routes[route]['latency_seconds'] = round(seconds, 6)
+            return routes
+
+    def render_metrics(self):
+        """追加到 /metrics 的 Prometheus 文本"""
+        lines = ['# HELP mock_server_injected_events_total 故障注入次数（latency / error / rate_limited）',
+                 '# TYPE mock_server_injected_events_total counter']
+        with self._lock:
+            counts = sorted(self.counts.items())
+            seconds = sorted(self.injected_seconds.items())
+        for (route, kind), n in counts:
+            lines.append(f'mock_server_injected_events_total{{route="{route}",kind="{kind}"}} {n}')
+        lines += ['# HELP mock_server_injected_latency_seconds_total 注入的延迟总时长',
+                  '# TYPE mock_server_injected_latency_seconds_total counter']
+        for route, total in seconds:
+            lines.append(f'mock_server_injected_latency_seconds_total{{route="{route}"}} {total:.6f}')
+        return '\n'.join(lines) + '\n'
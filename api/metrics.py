@@ -0,0 +1,197 @@
+import os
+import threading
+import time
+
+from common.histogram import Histogram
+
+# /metrics 中输出的分位数
+QUANTILES = (50, 95, 99)
+
+# 计入 store_read / store_write 阶段的存储方法
+STORE_READ_OPS = ('get', 'get_by_username', 'username_exists', 'email_exists', 'all', 'list_users',
+                  'search', 'peek_user_id')
+STORE_WRITE_OPS = ('add', 'update', 'delete', 'allocate_user_id')
+
+
+class _Shard:
+    """单个线程的统计数据，只由所属线程写入"""
+    __slots__ = ('requests', 'latency', 'phases')
+
+    def __init__(self):
+        # (method, route, status) -> 次数
+        self.requests = {}
+        # (method, route) -> Histogram
+        self.latency = {}
+        # (phase, op) -> Histogram
+        self.phases = {}
+
+    def merge(self, other):
+        for key, n in dict(other.requests).items():
+            self.requests[key] = self.requests.get(key, 0) + n
+        for target, source in ((self.latency, other.latency), (self.phases, other.phases)):
+            for key, hist in dict(source).items():
+                target.setdefault(key, Histogram()).merge(hist)
+        return self
+
+
+class _PhaseTimer:
+    __slots__ = ('metrics', 'key', 'start')
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe_phase(self.key, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """进程内的请求 / 阶段耗时统计
+
+    每个线程写自己的分片（threading.local），记录路径上没有锁，也没有跨线程共享的计数器；
+    只有线程第一次记录和 render() 汇总时才短暂持有锁。已退出线程的分片在新线程登记分片时、
+    以及汇总时并入 retired，每个请求一个线程的服务即使从不抓取 /metrics，分片数也不超过存活线程数。
+
+    prod 多进程模式下每个 worker 各自统计，/metrics 返回处理该请求的 worker 的数据。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = _Shard()
+        self.started = time.time()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._retire_dead()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_dead(self):
+        """把已退出线程的分片并入 retired（调用方持有 _lock）"""
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                self._retired.merge(shard)
+        self._shards = alive
+
+    # ---------- 记录 ----------
+    def observe_request(self, method, route, status, seconds):
+        shard = self._shard()
+        key = (method, route, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        hist = shard.latency.get((method, route))
+        if hist is None:
+            hist = shard.latency[(method, route)] = Histogram()
+        hist.record(seconds)
+
+    def observe_phase(self, key, seconds):
+        """key 为 (阶段, 操作)，例如 ('store_read', 'get')、('jwt_decode', '')"""
+        shard = self._shard()
+        hist = shard.phases.get(key)
+        if hist is None:
+            hist = shard.phases[key] = Histogram()
+        hist.record(seconds)
+
+    def phase(self, name, op=''):
+        """计时上下文：with metrics.phase('jwt_encode'): ..."""
+        return _PhaseTimer(self, (name, op))
+
+    def timed(self, name, op, func):
+        """返回包装后的 func，每次调用计入 (name, op) 阶段"""
+        key = (name, op)
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.observe_phase(key, perf_counter() - start)
+        return wrapper
+
+    # ---------- 汇总 ----------
+    def collect(self):
+        """合并所有线程的分片，返回一个 _Shard"""
+        total = _Shard()
+        with self._lock:
+            self._retire_dead()
+            total.merge(self._retired)
+            for _, shard in self._shards:
+                total.merge(shard)
+        return total
+
+    def reset(self):
+        with self._lock:
+            for _, shard in self._shards:
+                shard.requests.clear()
+                shard.latency.clear()
+                shard.phases.clear()
+            self._retired = _Shard()
+
+    def render(self):
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        data = self.collect()
+        lines = [
+            '# HELP mock_server_info 当前 worker 进程',
+            '# TYPE mock_server_info gauge',
+            f'mock_server_info{{pid="{os.getpid()}"}} 1',
+            '# HELP mock_server_start_time_seconds 统计开始时间（unix 时间戳）',
+            '# TYPE mock_server_start_time_seconds gauge',
+            f'mock_server_start_time_seconds {self.started:.3f}',
+            '# HELP mock_server_requests_total 按方法、路由、HTTP 状态码统计的请求数',
+            '# TYPE mock_server_requests_total counter',
+        ]
+        for (method, route, status), n in sorted(data.requests.items()):
+            lines.append(f'mock_server_requests_total{_labels(method=method, route=route, status=status)} {n}')
+        lines += ['# HELP mock_server_request_duration_seconds 请求处理耗时',
+                  '# TYPE mock_server_request_duration_seconds summary']
+        for (method, route), hist in sorted(data.latency.items()):
+            _summary(lines, 'mock_server_request_duration_seconds', hist, method=method, route=route)
+        lines += ['# HELP mock_server_phase_duration_seconds 请求内部各阶段耗时（存储读写、JWT、JSON 序列化）',
+                  '# TYPE mock_server_phase_duration_seconds summary']
+        for (phase, op), hist in sorted(data.phases.items()):
+            _summary(lines, 'mock_server_phase_duration_seconds', hist, phase=phase, op=op)
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _summary(lines, name, hist, **labels):
+    for q in QUANTILES:
+        lines.append(f'{name}{_labels(**labels, quantile=q / 100)} {hist.percentile(q):.6f}')
+    lines.append(f'{name}_sum{_labels(**labels)} {hist.total:.6f}')
+    lines.append(f'{name}_count{_labels(**labels)} {hist.count}')
+
+
+class InstrumentedStore:
+    """给存储对象的读写方法加上阶段计时，其余属性原样转发"""
+
+    def __init__(self, store, metrics):
+        self._store = store
+        for name in STORE_READ_OPS:
+            setattr(self, name, metrics.timed('store_read', name, getattr(store, name)))
+        for name in STORE_WRITE_OPS:
+            setattr(self, name, metrics.timed('store_write', name, getattr(store, name)))
+
+    def __getattr__(self, name):
+        return getattr(self._store, name)
+
+    def __len__(self):
+        return len(self._store)
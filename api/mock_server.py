@@ -1,26 +1,178 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, make_response
+try:
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:  # Flask < 2.2 没有 JSON provider，改为替换 app.json_encoder / json_decoder
+    from flask.json import JSONDecoder, JSONEncoder
+    DefaultJSONProvider = None
+import argparse
+import atexit
+import gzip
+import hashlib
 import json
 import os
+import time
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
 import sys
-# 重新配置标准输出编码为 utf-8
-sys.stdout.reconfigure(encoding='utf-8')
+# 以脚本方式启动时把项目根目录加入搜索路径，保证 api.* 可导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.user_store import UserStore, JournalPersistence, DuplicateUserError
+from api.user_record import parse_time
+from api.sqlite_store import SqliteUserStore, migrate_json_to_sqlite
+from api.token_cache import TokenCache
+from api.metrics import Metrics, InstrumentedStore
+from api.profiling import RequestProfiler
+from api.fault_injection import FaultInjector
+from api.serving import logger, configure_logging, serve_prefork
+from utils.loader import YamlLoader
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'mock_jwt_secret'
-PORT = 3001
 
-# 新增健康检查路由（放在这里）
+# Mock服务配置（config/config.yaml 中的 mock_server 节点）
+SERVER_CONFIG = YamlLoader.get_config().get('mock_server', {})
+STORAGE_CONFIG = SERVER_CONFIG.get('storage', {})
+TOKEN_CACHE_CONFIG = SERVER_CONFIG.get('token_cache', {})
+SERVE_CONFIG = SERVER_CONFIG.get('serve', {})
+METRICS_CONFIG = SERVER_CONFIG.get('metrics', {})
+PROFILING_CONFIG = SERVER_CONFIG.get('profiling', {})
+HTTP_CONFIG = SERVER_CONFIG.get('http', {})
+FAULT_INJECTION_CONFIG = SERVER_CONFIG.get('fault_injection', {})
+
+# GET 用户信息是否返回 ETag 并支持 If-None-Match 条件请求
+ETAG_ENABLED = HTTP_CONFIG.get('etag', True)
+# 响应体不小于该字节数且客户端接受 gzip 时压缩响应，0 表示关闭
+GZIP_MIN_SIZE = HTTP_CONFIG.get('gzip_min_size', 1024)
+GZIP_LEVEL = HTTP_CONFIG.get('gzip_level', 6)
+PORT = SERVE_CONFIG.get('port', 3001)
+
+# 批量接口单次请求允许的最大条目数
+BATCH_MAX_ITEMS = SERVER_CONFIG.get('batch_max_items', 1000)
+
+# 管理员用户列表的默认 / 最大分页大小
+LIST_PAGE_SIZE = SERVER_CONFIG.get('list_page_size', 50)
+LIST_MAX_PAGE_SIZE = SERVER_CONFIG.get('list_max_page_size', 1000)
+
+# 用户搜索的默认 / 最大返回条数
+SEARCH_LIMIT = SERVER_CONFIG.get('search_limit', 20)
+SEARCH_MAX_LIMIT = SERVER_CONFIG.get('search_max_limit', 200)
+
+# 已解码令牌的缓存，关闭时为 None
+token_cache = TokenCache(TOKEN_CACHE_CONFIG.get('maxsize', 4096)) if TOKEN_CACHE_CONFIG.get('enabled', True) else None
+
+
+# 新增健康检查路由（放在这里），附带令牌缓存的命中统计
 @app.route('/health')
 def health_check():
-    return jsonify({"status": "ok"}), 200
+    body = {"status": "ok"}
+    if token_cache is not None:
+        body["token_cache"] = token_cache.stats()
+    return jsonify(body), 200
+
+
+# 请求 / 内部阶段耗时统计，关闭时为 None
+metrics = Metrics() if METRICS_CONFIG.get('enabled', True) else None
+
+
+# 统计 JSON 序列化 / 反序列化耗时（jsonify、视图返回 dict 与 request.get_json 都经过它）
+if DefaultJSONProvider is not None:
+    class TimedJSONProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            with metrics.phase('json_dumps'):
+                return super().dumps(obj, **kwargs)
+
+        def loads(self, s, **kwargs):
+            with metrics.phase('json_loads'):
+                return super().loads(s, **kwargs)
+else:
+    class TimedJSONEncoder(JSONEncoder):
+        def encode(self, o):
+            with metrics.phase('json_dumps'):
+                return super().encode(o)
+
+    class TimedJSONDecoder(JSONDecoder):
+        def decode(self, s, **kwargs):
+            with metrics.phase('json_loads'):
+                return super().decode(s, **kwargs)
+
+
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+def record_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe_request(request.method, route, response.status_code, time.perf_counter() - start)
+    return response
+
+
+if metrics is not None:
+    if DefaultJSONProvider is not None:
+        app.json = TimedJSONProvider(app)
+    else:
+        app.json_encoder = TimedJSONEncoder
+        app.json_decoder = TimedJSONDecoder
+    app.before_request(start_request_timer)
+    app.after_request(record_request)
+
+
+# 按请求采样的 cProfile 分析，关闭时为 None，不安装中间件
+profiler = RequestProfiler(
+    PROFILING_CONFIG.get('output_dir', 'profiles'),
+    header=PROFILING_CONFIG.get('header', 'X-Profile'),
+    sample_rate=PROFILING_CONFIG.get('sample_rate', 0.0),
+    flush_interval=PROFILING_CONFIG.get('flush_interval', 5)
+) if PROFILING_CONFIG.get('enabled', False) else None
+
+if profiler is not None:
+    app.wsgi_app = profiler.wrap(app)
+    atexit.register(profiler.close)
+
 
+# 按路由注入延迟 / 5xx / 限流，没有配置时钩子只做一次判断
+injector = FaultInjector(FAULT_INJECTION_CONFIG.get('profiles') or {})
+
+# 不做注入的路由：健康检查、指标和注入配置接口本身
+INJECTION_EXEMPT_ROUTES = ('/health', '/metrics', '/api/v1/admin/fault-injection')
+
+
+@app.before_request
+def inject_faults():
+    injector.maybe_reload()
+    if not injector.active or request.url_rule is None or request.url_rule.rule in INJECTION_EXEMPT_ROUTES:
+        return None
+    return injector.inject(request.method, request.url_rule.rule)
+
+
+# 响应压缩：客户端接受 gzip 且响应体足够大时压缩
+@app.after_request
+def compress_response(response):
+    if (not GZIP_MIN_SIZE or response.direct_passthrough or response.status_code < 200
+            or 'Content-Encoding' in response.headers
+            or (response.content_length or 0) < GZIP_MIN_SIZE):
+        return response
+    response.vary.add('Accept-Encoding')
+    if request.accept_encodings['gzip']:
+        response.set_data(gzip.compress(response.get_data(), compresslevel=GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+# 指标接口：Prometheus 文本格式，包含各路由请求数、状态码分布、耗时分位数和内部阶段耗时
+@app.get('/metrics')
+def metrics_endpoint():
+    if metrics is None:
+        return {'code': 404, 'message': '指标统计未开启'}, 404
+    return metrics.render() + injector.render_metrics(), 200, \
+        {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 # 数据存储路径
-DATA_DIR = 'data'
+DATA_DIR = STORAGE_CONFIG.get('data_dir', 'data')
 USERS_FILE = os.path.join(DATA_DIR, 'users.json')
+SQLITE_FILE = os.path.join(DATA_DIR, STORAGE_CONFIG.get('sqlite_file', 'users.db'))
 
 # 确保数据目录存在
 if not os.path.exists(DATA_DIR):
@@ -61,52 +213,84 @@ def init_data():
             json.dump(initial_users, f, indent=2)
 
 
-# 读取用户数据
-def get_users():
-    try:
-        with open(USERS_FILE, 'r') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"读取用户数据失败: {e}")
-        return []
+# 常驻内存的用户存储，启动时加载一次，所有接口都通过它读写
+store = None
+
+
+# 按配置的存储引擎初始化用户存储，路径参数为空时使用配置中的路径
+# - json：常驻内存 + 快照/日志持久化
+# - sqlite：SQLite 库，库为空时自动导入现有的 users.json
+def init_store(users_file=None, storage_config=None, sqlite_file=None):
+    global store
+    conf = STORAGE_CONFIG if storage_config is None else storage_config
+    users_file = users_file or USERS_FILE
+    engine = conf.get('engine', 'json')
+    if engine == 'sqlite':
+        sqlite_file = sqlite_file or SQLITE_FILE
+        store = SqliteUserStore(sqlite_file, fsync=conf.get('fsync', 'batch'))
+        if len(store) == 0 and os.path.exists(users_file):
+            count = migrate_json_to_sqlite(users_file, sqlite_file, fsync=conf.get('fsync', 'batch'))
+            logger.info("已从 %s 导入 %d 个用户到 %s", users_file, count, sqlite_file)
+        if metrics is not None:
+            store = InstrumentedStore(store, metrics)
+        return store
+    if engine != 'json':
+        raise ValueError(f"不支持的存储引擎: {engine}，可选值 json / sqlite")
+
+    persistence = JournalPersistence(
+        users_file,
+        fsync=conf.get('fsync', 'batch'),
+        fsync_interval=conf.get('fsync_interval', 1),
+        compact_every=conf.get('compact_every', 10000),
+        shared=conf.get('shared', False)
+    )
+    store = UserStore.load(persistence)
+    if metrics is not None:
+        store = InstrumentedStore(store, metrics)
+    return store
 
 
-# 保存用户数据
-def save_users(users):
-    try:
-        with open(USERS_FILE, 'w') as f:
-            json.dump(users, f, indent=2)
-        return True
-    except Exception as e:
-        print(f"保存用户数据失败: {e}")
-        return False
+# 释放存储占用的文件句柄 / 数据库连接（prefork 前父进程调用）
+def close_store():
+    global store
+    if store is not None:
+        store.close()
+        store = None
 
 
 # 生成JWT令牌
 def generate_token(user):
-    return jwt.encode(
-        {
-            'user_id': user['user_id'],
-            'username': user['username'],
-            'role': user['role'],
-            'exp': datetime.utcnow() + timedelta(hours=1)
-        },
-        app.config['SECRET_KEY'],
-        algorithm='HS256'
-    )
+    payload = {
+        'user_id': user['user_id'],
+        'username': user['username'],
+        'role': user['role'],
+        'exp': datetime.utcnow() + timedelta(hours=1)
+    }
+    if metrics is None:
+        return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+    with metrics.phase('jwt_encode'):
+        return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
 
 
-# 验证令牌
+# 验证令牌（优先读取已解码令牌缓存）
 def verify_token(token):
     if not token:
         return None
 
+    secret = app.config['SECRET_KEY']
+    if token_cache is not None:
+        decoded = token_cache.get(token, secret)
+        if decoded is not None:
+            return decoded
+
     try:
-        decoded = jwt.decode(
-            token,
-            app.config['SECRET_KEY'],
-            algorithms=['HS256']
-        )
+        if metrics is not None:
+            with metrics.phase('jwt_decode'):
+                decoded = jwt.decode(token, secret, algorithms=['HS256'])
+        else:
+            decoded = jwt.decode(token, secret, algorithms=['HS256'])
+        if token_cache is not None:
+            token_cache.put(token, secret, decoded)
         return decoded
     except jwt.ExpiredSignatureError:
         return None
@@ -114,6 +298,19 @@ def verify_token(token):
         return None
 
 
+# 用户名 / 邮箱冲突的响应
+def duplicate_result(error):
+    if error.field == 'username':
+        return {
+            'code': 40001,
+            'message': '用户名已存在'
+        }, 400
+    return {
+        'code': 40002,
+        'message': '邮箱已注册'
+    }, 400
+
+
 # 令牌验证装饰器
 def token_required(f):
     @wraps(f)
@@ -147,44 +344,72 @@ def token_required(f):
 # 1. 用户注册接口
 @app.post('/api/v1/users/register')
 def register():
-    data = request.get_json()
+    return register_user(request.get_json())
+
+
+# 请求体（或批量中的单个条目）必须是对象且 fields 都是非空字符串，否则返回 40000 错误响应
+def required_fields_error(data, fields):
+    if not isinstance(data, dict) or not all(isinstance(data.get(f), str) and data.get(f) for f in fields):
+        return {
+            'code': 40000,
+            'message': f"缺少必要参数，{'、'.join(fields)} 为必填字符串"
+        }, 400
+    return None
+
+
+def phone_error(phone, code=40000):
+    """phone 只能是字符串或 None（None 按空字符串处理），否则返回 400 响应"""
+    if phone is not None and not isinstance(phone, str):
+        return {
+            'code': code,
+            'message': '手机号格式不正确，phone 必须为字符串'
+        }, 400
+    return None
+
+
+# 注册逻辑（单个注册与批量注册共用），返回 (响应体, HTTP 状态码)
+def register_user(data):
+    error = required_fields_error(data, ('username', 'password', 'email'))
+    if error:
+        return error
     username = data.get('username')
     password = data.get('password')
     email = data.get('email')
     phone = data.get('phone')
-
-    users = get_users()
+    error = phone_error(phone)
+    if error:
+        return error
 
     # 验证用户名是否已存在
-    if any(user['username'] == username for user in users):
-        return jsonify({
+    if store.username_exists(username):
+        return {
             'code': 40001,
             'message': '用户名已存在'
-        }), 400
+        }, 400
 
     # 验证邮箱是否已注册
-    if any(user['email'] == email for user in users):
-        return jsonify({
+    if store.email_exists(email):
+        return {
             'code': 40002,
             'message': '邮箱已注册'
-        }), 400
+        }, 400
 
     # 验证密码格式（至少8位，包含字母和数字）
     if not (8 <= len(password) <= 20 and any(c.isalpha() for c in password) and any(c.isdigit() for c in password)):
-        return jsonify({
+        return {
             'code': 40003,
             'message': '密码格式不正确，需包含字母和数字，长度8-20位'
-        }), 400
+        }, 400
 
     # 验证邮箱格式
     if not (email and '@' in email and '.' in email):
-        return jsonify({
+        return {
             'code': 40004,
             'message': '邮箱格式不正确'
-        }), 400
+        }, 400
 
     # 生成新用户ID
-    new_user_id = max(user['user_id'] for user in users) + 1 if users else 1
+    new_user_id = store.allocate_user_id()
 
     # 创建新用户
     new_user = {
@@ -200,12 +425,14 @@ def register():
         'status': 1
     }
 
-    # 添加新用户到数据
-    users.append(new_user)
-    save_users(users)
+    # 添加新用户到数据（并发注册时由存储保证用户名、邮箱唯一）
+    try:
+        store.add(new_user)
+    except DuplicateUserError as e:
+        return duplicate_result(e)
 
     # 返回注册成功响应
-    return jsonify({
+    return {
         'code': 200,
         'message': '注册成功',
         'data': {
@@ -214,7 +441,7 @@ def register():
             'email': new_user['email'],
             'create_time': new_user['create_time']
         }
-    }), 200
+    }, 200
 
 
 # 2. 用户登录接口（对应文档第2节）
@@ -229,64 +456,70 @@ def login():
     - 成功响应: code=200, 包含token和user_info
     - 错误码: 40005(用户名/密码错误), 40006(账号禁用)
     """
-    print("接收到登录请求")
+    logger.debug("接收到登录请求")
+    return login_user(request.get_json())
+
+
+# 登录逻辑（单个登录与批量登录共用），返回 (响应体, HTTP 状态码)
+def login_user(data):
+    error = required_fields_error(data, ('username', 'password'))
+    if error:
+        return error
     try:
         # 解析请求参数
-        data = request.get_json()
         username = data.get('username')
         password = data.get('password')
         remember_me = data.get('remember_me', False)  # 文档要求：可选，默认false
-        print(f"登录参数: username={username}")
+        logger.debug("登录参数: username=%s", username)
 
-        # 读取用户数据（增加文件操作异常处理）
+        # 读取用户数据（增加存储异常处理）
         try:
-            users = get_users()
+            user = store.get_by_username(username)
         except Exception as e:
-            print(f"读取用户数据异常: {e}")
-            return jsonify({
+            logger.error("读取用户数据异常: %s", e)
+            return {
                 'code': 500,
                 'message': '服务器内部错误，用户数据读取失败',
                 'error_detail': str(e)
-            }), 500
+            }, 500
 
         # 查找用户（文档错误码40005）
-        user = next((u for u in users if u['username'] == username), None)
         if not user:
-            print(f"登录失败: 用户名 {username} 不存在")
-            return jsonify({
+            logger.debug("登录失败: 用户名 %s 不存在", username)
+            return {
                 'code': 40005,
                 'message': '用户名或密码错误'
-            }), 400
+            }, 400
 
         # 验证密码（文档错误码40005）
         if user['password'] != password:
-            print(f"登录失败: 密码错误 for user: {username}")
-            return jsonify({
+            logger.debug("登录失败: 密码错误 for user: %s", username)
+            return {
                 'code': 40005,
                 'message': '用户名或密码错误'
-            }), 400
+            }, 400
 
         # 检查账号状态（文档错误码40006）
         if user['status'] != 1:
-            print(f"登录失败: 账号 {username} 已被禁用")
-            return jsonify({
+            logger.debug("登录失败: 账号 %s 已被禁用", username)
+            return {
                 'code': 40006,
                 'message': '账号已被禁用'
-            }), 400
+            }, 400
 
         # 生成令牌（符合文档响应结构）
         try:
             token = generate_token(user)
         except jwt.exceptions.PyJWTError as e:
-            print(f"登录接口JWT处理异常: {e}")
-            return jsonify({
+            logger.error("登录接口JWT处理异常: %s", e)
+            return {
                 'code': 500,
                 'message': '登录处理失败，令牌生成异常',
                 'error_detail': str(e)
-            }), 500
+            }, 500
 
-        print(f"登录成功: user {username} (ID: {user['user_id']})")
-        return jsonify({
+        logger.debug("登录成功: user %s (ID: %s)", username, user['user_id'])
+        return {
             'code': 200,
             'message': '登录成功',
             'data': {
@@ -300,54 +533,97 @@ def login():
                     'role': user['role']
                 }
             }
-        }), 200
+        }, 200
 
     except Exception as e:
-        import traceback
-        print(f"登录接口全局异常: {e}")
-        print(traceback.format_exc())
-        return jsonify({
+        logger.exception("登录接口全局异常: %s", e)
+        return {
             'code': 500,
             'message': '登录处理失败，请稍后再试',
             'error_detail': str(e)
-        }), 500
+        }, 500
+
 
 # 3. 获取用户信息接口
 @app.get('/api/v1/users/<int:user_id>')
 @token_required
 def get_user(decoded, user_id):
-    users = get_users()
-    user = next((u for u in users if u['user_id'] == user_id), None)
+    """
+    - 成功响应带 ETag（由对外字段计算，包含 update_time）；
+    - 请求头 If-None-Match 与当前 ETag 一致时直接返回 304，不构造、不序列化响应体
+    """
+    user, error = find_visible_user(decoded, user_id)
+    if error:
+        return error
+    if not ETAG_ENABLED:
+        return user_info_result(user)
+
+    etag = user_etag(user)
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(user_info_result(user))
+    response.set_etag(etag, weak=True)
+    return response
+
+
+# 查询逻辑（单个查询与批量查询共用），返回 (响应体, HTTP 状态码)
+def get_user_info(decoded, user_id):
+    user, error = find_visible_user(decoded, user_id)
+    if error:
+        return error
+    return user_info_result(user)
+
+
+# 查找当前令牌有权查看的用户，返回 (用户, None) 或 (None, 错误响应)
+def find_visible_user(decoded, user_id):
+    user = store.get(user_id)
 
     if not user:
-        return jsonify({
+        return None, ({
             'code': 40007,
             'message': '用户不存在'
-        }), 404
+        }, 404)
 
     # 检查权限：只能访问自己的信息或管理员访问所有
     if decoded['user_id'] != user_id and decoded['role'] != 'admin':
-        return jsonify({
+        return None, ({
             'code': 40008,
             'message': '无权限访问'
-        }), 403
+        }, 403)
+    return user, None
 
-    # 返回用户信息
-    return jsonify({
+
+# 用户对外信息的 ETag：对外字段的摘要，任一字段（包括 update_time）变化都会改变
+def user_etag(user):
+    raw = '\x1f'.join(str(user[field]) for field in PUBLIC_FIELDS)
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def user_info_result(user):
+    return {
         'code': 200,
         'message': '获取成功',
-        'data': {
-            'user_id': user['user_id'],
-            'username': user['username'],
-            'email': user['email'],
-            'phone': user['phone'],
-            'avatar': user['avatar'],
-            'create_time': user['create_time'],
-            'update_time': user['update_time'],
-            'role': user['role'],
-            'status': user['status']
-        }
-    }), 200
+        'data': user_public_info(user)
+    }, 200
+
+
+# 对外返回的用户字段（不含密码）
+PUBLIC_FIELDS = ('user_id', 'username', 'email', 'phone', 'avatar', 'create_time', 'update_time', 'role', 'status')
+
+
+def user_public_info(user):
+    return {
+        'user_id': user['user_id'],
+        'username': user['username'],
+        'email': user['email'],
+        'phone': user['phone'],
+        'avatar': user['avatar'],
+        'create_time': user['create_time'],
+        'update_time': user['update_time'],
+        'role': user['role'],
+        'status': user['status']
+    }
 
 
 # 4. 更新用户信息接口
@@ -360,10 +636,8 @@ def update_user(decoded, user_id):
     avatar = data.get('avatar')
     password = data.get('password')
 
-    users = get_users()
-    user_index = next((i for i, u in enumerate(users) if u['user_id'] == user_id), None)
-
-    if user_index is None:
+    user = store.get(user_id)
+    if user is None:
         return jsonify({
             'code': 40007,
             'message': '用户不存在'
@@ -390,21 +664,40 @@ def update_user(decoded, user_id):
             'message': '密码格式不正确，需包含字母和数字，长度8-20位'
         }), 400
 
+    error = phone_error(phone, code=40010)
+    if error:
+        body, status = error
+        return jsonify(body), status
+
+    # 邮箱在存储中唯一，不能改成其他用户已注册的邮箱
+    if email and email != user['email'] and store.email_exists(email):
+        return jsonify({
+            'code': 40002,
+            'message': '邮箱已注册'
+        }), 400
+
     # 更新用户信息
-    user = users[user_index]
+    changes = {}
     if email is not None:
-        user['email'] = email
+        changes['email'] = email
     if phone is not None:
-        user['phone'] = phone
+        changes['phone'] = phone
     if avatar is not None:
-        user['avatar'] = avatar
+        changes['avatar'] = avatar
     if password is not None:
-        user['password'] = password  # 实际应用中应该加密
-    user['update_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        changes['password'] = password  # 实际应用中应该加密
+    changes['update_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
     # 保存更新
-    users[user_index] = user
-    save_users(users)
+    try:
+        user = store.update(user_id, changes)
+    except DuplicateUserError as e:
+        return duplicate_result(e)
+    if user is None:
+        return jsonify({
+            'code': 40007,
+            'message': '用户不存在'
+        }), 404
 
     # 返回更新成功响应
     return jsonify({
@@ -422,45 +715,49 @@ def update_user(decoded, user_id):
 @token_required
 def delete_user(decoded, user_id):
     reason = request.args.get('reason')  # 删除原因，可选
+    return delete_user_by_id(decoded, user_id)
 
-    users = get_users()
-    user_index = next((i for i, u in enumerate(users) if u['user_id'] == user_id), None)
 
-    if user_index is None:
-        return jsonify({
+# 删除逻辑（单个删除与批量删除共用），返回 (响应体, HTTP 状态码)
+def delete_user_by_id(decoded, user_id):
+    user = store.get(user_id)
+
+    if user is None:
+        return {
             'code': 40007,
             'message': '用户不存在'
-        }), 404
-
-    user = users[user_index]
+        }, 404
 
     # 检查权限：只能删除自己的信息或管理员删除非管理员用户
     if not (
         (decoded['role'] == 'admin' and user['role'] != 'admin') or
         (decoded['user_id'] == user_id and decoded['role'] == 'user')
     ):
-        return jsonify({
+        return {
             'code': 40008,
             'message': '无权限访问'
-        }), 403
+        }, 403
 
     # 不能删除管理员用户
     if user['role'] == 'admin':
-        return jsonify({
+        return {
             'code': 40011,
             'message': '不能删除管理员用户'
-        }), 400
+        }, 400
 
-    # 删除用户
-    users.pop(user_index)
-    save_users(users)
+    # 删除用户（并发删除时可能已被其他请求删掉）
+    if store.delete(user_id) is None:
+        return {
+            'code': 40007,
+            'message': '用户不存在'
+        }, 404
 
     # 返回删除成功响应
-    return jsonify({
+    return {
         'code': 200,
         'message': '删除成功',
         'data': {}
-    }), 200
+    }, 200
 
 
 # 6.管理员专用：创建用户接口（支持创建管理员）
@@ -483,27 +780,30 @@ def create_admin_user(decoded):
     username = data.get('username')
     password = data.get('password')
     email = data.get('email')
-    phone = data.get('phone', '')
+    phone = data.get('phone')
     role = data.get('role', 'user')  # 默认角色为 user
 
-    users = get_users()
-
     # 验证必填参数
     if not all([username, password, email]):
         return jsonify({
             'code': 40000,
             'message': '缺少必要参数，username、password、email 为必填项'
         }), 400
+    error = phone_error(phone)
+    if error:
+        body, status = error
+        return jsonify(body), status
+    phone = phone or ''
 
     # 验证用户名是否已存在
-    if any(user['username'] == username for user in users):
+    if store.username_exists(username):
         return jsonify({
             'code': 40001,
             'message': '用户名已存在'
         }), 400
 
     # 验证邮箱是否已注册
-    if any(user['email'] == email for user in users):
+    if store.email_exists(email):
         return jsonify({
             'code': 40002,
             'message': '邮箱已注册'
@@ -531,7 +831,7 @@ def create_admin_user(decoded):
         }), 400
 
     # 生成新用户ID
-    new_user_id = max(user['user_id'] for user in users) + 1 if users else 1
+    new_user_id = store.allocate_user_id()
 
     # 创建新用户
     new_user = {
@@ -547,9 +847,11 @@ def create_admin_user(decoded):
         'status': 1
     }
 
-    # 添加新用户到数据
-    users.append(new_user)
-    save_users(users)
+    # 添加新用户到数据（并发注册时由存储保证用户名、邮箱唯一）
+    try:
+        store.add(new_user)
+    except DuplicateUserError as e:
+        return duplicate_result(e)
 
     # 返回创建成功响应
     return jsonify({
@@ -564,9 +866,249 @@ def create_admin_user(decoded):
         }
     }), 200
 
-if __name__ == '__main__':
+# 7. 批量接口：一次请求处理 N 个条目，每个条目的 code/message 与对应单条接口一致
+def batch_items(data, key):
+    """取出批量请求中的条目列表，不合法时返回 (None, 错误响应)"""
+    items = (data or {}).get(key)
+    if not isinstance(items, list) or not items:
+        return None, ({
+            'code': 40000,
+            'message': f'缺少必要参数，{key} 必须为非空列表'
+        }, 400)
+    if len(items) > BATCH_MAX_ITEMS:
+        return None, ({
+            'code': 40013,
+            'message': f'批量条目数超出限制，单次最多 {BATCH_MAX_ITEMS} 条'
+        }, 400)
+    return items, None
+
+
+def invalid_user_id_result(user_id):
+    """批量查询 / 删除中的 user_id 必须是整数，否则该条目返回 40000（其余条目照常处理）"""
+    if isinstance(user_id, int) and not isinstance(user_id, bool):
+        return None
+    return {
+        'code': 40000,
+        'message': 'user_id 必须为整数'
+    }, 400
+
+
+def batch_result(results):
+    """把逐条处理的 (响应体, HTTP 状态码) 汇总成批量响应"""
+    items = []
+    succeeded = 0
+    for index, (body, _) in enumerate(results):
+        items.append(dict(body, index=index))
+        if body['code'] == 200:
+            succeeded += 1
+    return {
+        'code': 200,
+        'message': '批量处理完成',
+        'data': {
+            'total': len(items),
+            'succeeded': succeeded,
+            'failed': len(items) - succeeded,
+            'results': items
+        }
+    }, 200
+
+
+# 7.1 批量注册：{"users": [{username, password, email, phone}, ...]}
+@app.post('/api/v1/users/batch/register')
+def batch_register():
+    items, error = batch_items(request.get_json(silent=True), 'users')
+    if error:
+        return error
+    return batch_result(register_user(item) for item in items)
+
+
+# 7.2 批量登录：{"users": [{username, password}, ...]}
+@app.post('/api/v1/users/batch/login')
+def batch_login():
+    items, error = batch_items(request.get_json(silent=True), 'users')
+    if error:
+        return error
+    return batch_result(login_user(item) for item in items)
+
+
+# 7.3 批量查询：{"user_ids": [1, 2, ...]}，权限规则同单个查询
+@app.post('/api/v1/users/batch/get')
+@token_required
+def batch_get_users(decoded):
+    user_ids, error = batch_items(request.get_json(silent=True), 'user_ids')
+    if error:
+        return error
+    return batch_result(invalid_user_id_result(user_id) or get_user_info(decoded, user_id) for user_id in user_ids)
+
+
+# 7.4 批量删除：{"user_ids": [1, 2, ...], "reason": "..."}，权限规则同单个删除
+@app.post('/api/v1/users/batch/delete')
+@token_required
+def batch_delete_users(decoded):
+    user_ids, error = batch_items(request.get_json(silent=True), 'user_ids')
+    if error:
+        return error
+    return batch_result(invalid_user_id_result(user_id) or delete_user_by_id(decoded, user_id)
+                        for user_id in user_ids)
+
+
+# 8. 管理员专用：按游标分页列出用户
+@app.get('/api/v1/admin/users')
+@token_required
+def list_users(decoded):
+    """
+    查询参数（均可选）：
+    - cursor: 上一页返回的 next_cursor（按 user_id 递增分页，首页不传）
+    - limit: 每页条数，默认 LIST_PAGE_SIZE，最大 LIST_MAX_PAGE_SIZE
+    - role / status: 按角色、状态过滤
+    - create_time_from / create_time_to: 创建时间范围（YYYY-MM-DD HH:MM:SS，含边界）
+    """
+    if decoded['role'] != 'admin':
+        return {
+            'code': 40008,
+            'message': '无管理员权限'
+        }, 403
+
+    args = request.args
+    try:
+        cursor = int(args.get('cursor', 0))
+        limit = int(args.get('limit', LIST_PAGE_SIZE))
+        status = int(args['status']) if 'status' in args else None
+        for key in ('create_time_from', 'create_time_to'):
+            if key in args:
+                parse_time(args[key])
+    except ValueError:
+        return {
+            'code': 40014,
+            'message': '分页参数不合法，cursor、limit、status 必须为整数，创建时间格式为 YYYY-MM-DD HH:MM:SS'
+        }, 400
+    if not 1 <= limit <= LIST_MAX_PAGE_SIZE:
+        return {
+            'code': 40014,
+            'message': f'分页参数不合法，limit 取值范围 1-{LIST_MAX_PAGE_SIZE}'
+        }, 400
+
+    users, has_more = store.list_users(
+        after_id=cursor,
+        limit=limit,
+        role=args.get('role'),
+        status=status,
+        create_time_from=args.get('create_time_from'),
+        create_time_to=args.get('create_time_to')
+    )
+    return {
+        'code': 200,
+        'message': '获取成功',
+        'data': {
+            'users': [user_public_info(user) for user in users],
+            'has_more': has_more,
+            'next_cursor': users[-1]['user_id'] if has_more else None
+        }
+    }, 200
+
+
+# 9. 管理员专用：按邮箱 / 手机号精确或前缀搜索用户
+@app.get('/api/v1/admin/users/search')
+@token_required
+def search_users(decoded):
+    """
+    查询参数：
+    - q: 搜索内容（必填）
+    - field: email / phone，默认 email
+    - mode: prefix（前缀，默认）/ exact（精确）
+    - limit: 最多返回条数，默认 SEARCH_LIMIT，最大 SEARCH_MAX_LIMIT
+    结果按 (字段值, user_id) 排序；错误码: 40008(非管理员), 40016(搜索参数不合法)
+    """
+    if decoded['role'] != 'admin':
+        return {
+            'code': 40008,
+            'message': '无管理员权限'
+        }, 403
+
+    args = request.args
+    query = args.get('q', '')
+    field = args.get('field', 'email')
+    mode = args.get('mode', 'prefix')
+    try:
+        limit = int(args.get('limit', SEARCH_LIMIT))
+    except ValueError:
+        limit = 0
+    if not query or field not in ('email', 'phone') or mode not in ('prefix', 'exact') \
+            or not 1 <= limit <= SEARCH_MAX_LIMIT:
+        return {
+            'code': 40016,
+            'message': f'搜索参数不合法：q 必填，field 为 email/phone，mode 为 prefix/exact，'
+                       f'limit 取值范围 1-{SEARCH_MAX_LIMIT}'
+        }, 400
+
+    users, has_more = store.search(field, query, prefix=mode == 'prefix', limit=limit)
+    return {
+        'code': 200,
+        'message': '获取成功',
+        'data': {
+            'users': [user_public_info(user) for user in users],
+            'has_more': has_more
+        }
+    }, 200
+
+
+# 故障注入配置：查看当前配置与注入次数 / 整体替换 / 关闭（需管理员权限）
+@app.route('/api/v1/admin/fault-injection', methods=['GET', 'PUT', 'DELETE'])
+@token_required
+def fault_injection(decoded):
+    """
+    PUT 请求体: {"profiles": {"POST /api/v1/users/login": {"latency": 50, "error_rate": 0.01}, ...}}
+    错误码: 40008(非管理员), 40015(配置不合法)
+    """
+    if decoded['role'] != 'admin':
+        return {
+            'code': 40008,
+            'message': '无管理员权限'
+        }, 403
+
+    if request.method == 'PUT':
+        profiles = (request.get_json(silent=True) or {}).get('profiles')
+        try:
+            injector.set_profiles(profiles, publish=True)
+        except ValueError as e:
+            return {
+                'code': 40015,
+                'message': f'故障注入配置不合法: {e}'
+            }, 400
+    elif request.method == 'DELETE':
+        injector.set_profiles({}, publish=True)
+
+    return {
+        'code': 200,
+        'message': '获取成功' if request.method == 'GET' else '设置成功',
+        'data': {
+            'profiles': injector.specs(),
+            'stats': injector.stats()
+        }
+    }, 200
+
+
+# 启动服务
+# - dev：Flask 自带的开发服务器（单进程）
+# - prod：预派生多进程 + HTTP/1.1 keep-alive，每个 worker 在 fork 后各自打开存储
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='用户管理 Mock 服务')
+    parser.add_argument('--mode', choices=['dev', 'prod'], default=SERVE_CONFIG.get('mode', 'dev'),
+                        help='运行模式，默认读取 config.yaml 中的 mock_server.serve.mode')
+    parser.add_argument('--host', default=SERVE_CONFIG.get('host', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=SERVE_CONFIG.get('workers', 4),
+                        help='prod 模式的 worker 进程数')
+    parser.add_argument('--log-level', default=SERVE_CONFIG.get('log_level', 'WARNING'))
+    args = parser.parse_args(argv)
+
+    # 重新配置标准输出编码为 utf-8
+    sys.stdout.reconfigure(encoding='utf-8')
+    configure_logging(args.log_level, SERVE_CONFIG.get('log_buffer', 1000))
     init_data()
-    print(f'Mock服务已启动，运行在 http://localhost:{PORT}')
+    # 在父进程中完成 sqlite 导入等一次性初始化
+    init_store()
+    print(f'Mock服务已启动（{args.mode} 模式），运行在 http://localhost:{args.port}')
     print('接口文档:')
     print('1. 注册: POST /api/v1/users/register')
     print('2. 登录: POST /api/v1/users/login')
@@ -574,4 +1116,28 @@ if __name__ == '__main__':
     print('4. 更新用户信息: PUT /api/v1/users/:user_id')
     print('5. 删除用户: DELETE /api/v1/users/:user_id')
     print('6. 管理员创建：POST /api/v1/admin/users/create')
-    app.run(port=PORT, debug=False, host='0.0.0.0')
+    print('7. 批量注册/登录/查询/删除：POST /api/v1/users/batch/{register,login,get,delete}')
+    print('8. 管理员用户列表：GET /api/v1/admin/users?cursor=&limit=&role=&status=')
+    print('9. 管理员搜索用户：GET /api/v1/admin/users/search?q=&field=email|phone&mode=prefix|exact&limit=')
+    print('10. 运行指标：GET /metrics')
+    print('11. 故障注入配置：GET/PUT/DELETE /api/v1/admin/fault-injection')
+    sys.stdout.flush()
+
+    if args.mode == 'dev':
+        app.run(port=args.port, debug=False, host=args.host)
+        return
+
+    close_store()
+    # 限流按 worker 数平分；运行时修改的注入配置通过文件同步给所有 worker
+    global injector
+    injector = FaultInjector(injector.specs(), workers=args.workers,
+                             sync_path=os.path.join(DATA_DIR, 'fault_injection.json') if args.workers > 1 else None)
+    injector.set_profiles(injector.specs(), publish=True)
+    # 多个 worker 共享同一份 json 数据时必须开启跨进程同步
+    storage_config = dict(STORAGE_CONFIG, shared=True) if args.workers > 1 else STORAGE_CONFIG
+    serve_prefork(app, args.host, args.port, workers=args.workers,
+                  on_worker_start=lambda: init_store(storage_config=storage_config))
+
+
+if __name__ == '__main__':
+    main()
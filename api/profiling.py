@@ -0,0 +1,159 @@
+import cProfile
+import marshal
+import os
+import pstats
+import random
+import re
+import threading
+from collections import Counter
+
+from werkzeug.datastructures import EnvironHeaders
+from werkzeug.exceptions import HTTPException
+
+# 折叠栈中忽略的最小耗时（微秒），避免调用链过多时路径数爆炸
+MIN_STACK_MICROS = 1
+MAX_STACK_DEPTH = 64
+
+
+def _frame_name(func):
+    filename, line, name = func
+    if filename == '~':
+        return name.strip('<>').replace(';', ',')
+    return f'{name} ({os.path.basename(filename)}:{line})'.replace(';', ',')
+
+
+def collapsed_stacks(entries):
+    """把 pstats 数据（Stats.stats）转换为折叠栈（flamegraph.pl / speedscope 可读），返回 {栈: 微秒}
+
+    cProfile 只记录“调用者 -> 被调用者”的边，这里把每个函数的自身耗时按各调用边的累计耗时
+    比例分摊到调用者，逐层向上直到没有调用者的根函数，得到近似的完整调用栈。
+    """
+    result = Counter()
+
+    def walk(func, path, micros):
+        callers = entries[func][4] if func in entries else {}
+        callers = {c: v for c, v in callers.items() if c not in path}
+        total = sum(v[3] for v in callers.values())
+        if not callers or total <= 0 or len(path) >= MAX_STACK_DEPTH:
+            result[';'.join(_frame_name(f) for f in reversed(path))] += micros
+            return
+        for caller, value in callers.items():
+            share = micros * value[3] / total
+            if share >= MIN_STACK_MICROS:
+                walk(caller, path + (caller,), share)
+
+    for func, (cc, nc, tt, ct, callers) in entries.items():
+        micros = tt * 1e6
+        if micros >= MIN_STACK_MICROS:
+            walk(func, (func,), micros)
+    return {stack: int(round(micros)) for stack, micros in result.items() if micros >= 0.5}
+
+
+class RequestProfiler:
+    """按请求采样的 cProfile 分析器，结果按路由汇总写入 output_dir
+
+    - 请求带上 header（值非空且不为 0）或按 sample_rate 随机命中时，对本次请求的处理过程做 cProfile；
+    - 同一进程同一时刻只分析一个请求（cProfile 在 Python 3.12+ 不能在多个线程同时启用），
+      其余命中的请求直接跳过；
+    - 同一路由的多次结果累加后写成 <方法>_<路由>.<pid>.pstats 与 .collapsed 两个文件，
+      由后台线程每 flush_interval 秒写一次（请求处理过程中不做文件读写），close() 时再写一次；
+      多 worker 的文件可用 pstats.Stats(*files) 再合并；
+    - wrap(app) 返回包在 app.wsgi_app 外层的 WSGI 中间件，只有启用时才安装，关闭时请求路径上没有任何钩子。
+    """
+
+    def __init__(self, output_dir, header='X-Profile', sample_rate=0.0, flush_interval=5.0):
+        self.output_dir = output_dir
+        self.header = header
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self._busy = threading.Lock()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._stats = {}
+        self._dirty = set()
+        self._closed = threading.Event()
+        self._flusher_pid = None
+        self.profiled = 0
+
+    def wrap(self, app):
+        """返回分析 app 请求的 WSGI 中间件：app.wsgi_app = profiler.wrap(app)"""
+        wsgi_app = app.wsgi_app
+
+        def middleware(environ, start_response):
+            if not self.should_profile(EnvironHeaders(environ)):
+                return wsgi_app(environ, start_response)
+            profile = self.start()
+            if profile is None:
+                return wsgi_app(environ, start_response)
+            try:
+                return wsgi_app(environ, start_response)
+            finally:
+                try:
+                    route = app.url_map.bind_to_environ(environ).match(return_rule=True)[0].rule
+                except HTTPException:
+                    route = 'unmatched'
+                self.stop(profile, environ['REQUEST_METHOD'], route)
+        return middleware
+
+    def should_profile(self, headers):
+        value = headers.get(self.header)
+        if value is not None:
+            return value not in ('', '0')
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """开始分析当前请求，已有请求在分析时返回 None"""
+        if not self._busy.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 已有其他分析工具（例如整个进程在 cProfile 下运行）
+            self._busy.release()
+            return None
+        return profile
+
+    def stop(self, profile, method, route):
+        profile.disable()
+        self._busy.release()
+        key = re.sub(r'[^A-Za-z0-9]+', '_', f'{method}_{route}').strip('_')
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                self._stats[key] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self._dirty.add(key)
+            self.profiled += 1
+            # prefork 模式下 fork 出的 worker 没有父进程的线程，按进程启动后台写盘线程
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                threading.Thread(target=self._flush_loop, name='profile-flusher', daemon=True).start()
+
+    def _flush_loop(self):
+        while not self._closed.wait(max(self.flush_interval, 0.1)):
+            self.flush()
+
+    def flush(self):
+        """把有新数据的路由写盘：持锁时只复制统计数据，文件读写与折叠栈计算在锁外进行"""
+        with self._lock:
+            # Stats.add 会替换 stats 中的条目而不是原地修改，浅拷贝即可得到一致的快照
+            snapshot = {key: dict(self._stats[key].stats) for key in self._dirty}
+            self._dirty.clear()
+        if not snapshot:
+            return
+        with self._io_lock:
+            os.makedirs(self.output_dir, exist_ok=True)
+            pid = os.getpid()
+            for key, entries in snapshot.items():
+                base = os.path.join(self.output_dir, f'{key}.{pid}')
+                with open(base + '.pstats', 'wb') as f:
+                    marshal.dump(entries, f)  # 与 Stats.dump_stats 的格式相同
+                with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+                    for stack, micros in sorted(collapsed_stacks(entries).items()):
+                        f.write(f'{stack} {micros}\n')
+
+    def close(self):
+        self._closed.set()
+        self.flush()
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+
+# 以脚本方式运行时把项目根目录加入搜索路径，保证 api.* / common.* 可导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.user_store import JournalPersistence
+from api.sqlite_store import SqliteUserStore
+from common import generate_parameter
+from common.generate_parameter import Generate
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def generate_users(count, start_id=1, taken_usernames=(), taken_emails=(), interval=1, batch_size=10000):
+    """用 Generate 的批量接口生成 count 个用户，user_id 从 start_id 开始连续分配
+
+    - 用户名、邮箱在本次运行内由 Generate 保证不重复，与 taken_* 冲突的（极少见）重新生成；
+    - create_time 从 count * interval 秒之前开始按 interval 秒递增，分布在过去一段时间内；
+    - 每次生成 batch_size 个、逐个产出，写 SQLite 时不需要把全部用户放进内存。
+    """
+    usernames = set(taken_usernames)
+    emails = set(taken_emails)
+    start = int(time.time()) - count * interval
+    user_id = start_id
+    while user_id < start_id + count:
+        for user in Generate.generate_users(min(batch_size, start_id + count - user_id)):
+            while user['username'] in usernames:
+                user['username'] = Generate.generate_username()
+            while user['email'] in emails:
+                user['email'] = Generate.generate_email()
+            created = time.strftime(TIME_FORMAT, time.localtime(start + (user_id - start_id) * interval))
+            yield {
+                'user_id': user_id,
+                'username': user['username'],
+                'password': user['password'],
+                'email': user['email'],
+                'phone': user['phone'],
+                'avatar': f'http://example.com/avatar/{user_id}.jpg',
+                'create_time': created,
+                'update_time': created,
+                'role': 'user',
+                'status': 1
+            }
+            user_id += 1
+
+
+def seed_json(users_file, count, fsync='batch'):
+    """在现有数据（快照 + 日志）之后追加 count 个用户，整体写成一个新快照，返回用户总数
+
+    不经过内存 store 和日志，写入时持有存储的文件锁；写入期间服务不应运行。
+    """
+    persistence = JournalPersistence(users_file, fsync=fsync)
+    with persistence.exclusive():
+        users = persistence.load()
+        start_id = persistence.next_user_id
+        users.sort(key=lambda u: u['user_id'])
+        users.extend(generate_users(count, start_id,
+                                    (u['username'] for u in users), (u['email'] for u in users)))
+        persistence.write_snapshot(users, start_id + count)
+    persistence.close()
+    return len(users)
+
+
+def seed_sqlite(sqlite_file, count, fsync='batch'):
+    """向 SQLite 库追加 count 个用户（单个事务批量插入），返回用户总数"""
+    store = SqliteUserStore(sqlite_file, fsync=fsync)
+    try:
+        conn = store._conn()
+        usernames = [row[0] for row in conn.execute('SELECT username FROM users')]
+        emails = [row[0] for row in conn.execute('SELECT email FROM users')]
+        # 先占住整段 ID，服务同时运行时新注册的用户不会与导入的用户冲突
+        conn.execute('BEGIN IMMEDIATE')
+        start_id = conn.execute("SELECT value FROM id_sequence WHERE name = 'user_id'").fetchone()[0]
+        conn.execute("UPDATE id_sequence SET value = ? WHERE name = 'user_id'", (start_id + count,))
+        conn.execute('COMMIT')
+        store.add_many(generate_users(count, start_id, usernames, emails))
+        return len(store)
+    finally:
+        store.close()
+
+
+def main(argv=None):
+    import argparse
+    from api import mock_server
+
+    parser = argparse.ArgumentParser(description='批量生成用户数据，直接写入 mock 服务的存储')
+    parser.add_argument('count', type=int, help='生成的用户数')
+    parser.add_argument('--engine', choices=['json', 'sqlite'],
+                        default=mock_server.STORAGE_CONFIG.get('engine', 'json'))
+    parser.add_argument('--output', help='目标文件，默认使用配置中的 users.json / users.db')
+    parser.add_argument('--seed', type=int, help='随机种子，指定后生成的数据可复现')
+    args = parser.parse_args(argv)
+
+    if args.seed is not None:
+        generate_parameter.seed(args.seed)
+    fsync = mock_server.STORAGE_CONFIG.get('fsync', 'batch')
+    started = time.perf_counter()
+    if args.engine == 'sqlite':
+        output = args.output or mock_server.SQLITE_FILE
+        total = seed_sqlite(output, args.count, fsync)
+    else:
+        output = args.output or mock_server.USERS_FILE
+        if args.output is None:
+            mock_server.init_data()
+        total = seed_json(output, args.count, fsync)
+    print(f'已生成 {args.count} 个用户，{output} 共 {total} 个用户，耗时 {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
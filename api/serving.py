@@ -0,0 +1,157 @@
+import io
+import logging
+import logging.handlers
+import os
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+logger = logging.getLogger('mock_server')
+
+# keep-alive 连接上预读请求体的上限，超过时处理完本请求即断开连接
+MAX_BUFFERED_BODY = 16 * 1024 * 1024
+
+
+def configure_logging(level='WARNING', buffer_size=1000):
+    """配置 mock 服务日志
+
+    - level 控制输出级别，默认 WARNING，请求路径上的 debug/info 日志不会格式化也不会输出；
+    - buffer_size > 0 时日志先写入内存缓冲，攒满或遇到 ERROR 才统一写到 stderr，
+      避免每条日志都做一次控制台 I/O；为 0 时直接输出。
+    """
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter('%(asctime)s [%(process)d] %(levelname)s %(message)s'))
+    handler = stream
+    if buffer_size > 0:
+        handler = logging.handlers.MemoryHandler(buffer_size, flushLevel=logging.ERROR, target=stream)
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    # werkzeug 默认每个请求打印一行访问日志，跟随同一级别
+    logging.getLogger('werkzeug').setLevel(logger.level)
+    return logger
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """HTTP/1.1 长连接请求处理器，访问日志只在 DEBUG 级别输出
+
+    werkzeug 的开发服务器每个响应都带 Connection: close，原因是应用可能没读完请求体，
+    下一个请求会从错误的位置开始解析。这里在调用应用前先把请求体完整读入内存，
+    之后就可以安全地复用连接；空闲超过 timeout 秒的连接自动断开。
+    """
+    protocol_version = 'HTTP/1.1'
+    timeout = 75
+    # 响应头和响应体分两次写出，长连接上不关 Nagle 会和客户端的延迟 ACK 叠加出 40ms 停顿
+    disable_nagle_algorithm = True
+    _keep_alive = False
+
+    def run_wsgi(self):
+        rfile = self.rfile
+        self._keep_alive = False
+        if not self.close_connection and 'chunked' not in self.headers.get('Transfer-Encoding', '').lower():
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                length = -1
+            if 0 <= length <= MAX_BUFFERED_BODY:
+                self.rfile = io.BytesIO(rfile.read(length))
+                self._keep_alive = True
+        try:
+            super().run_wsgi()
+        finally:
+            self.rfile = rfile
+        if not self._keep_alive:
+            self.close_connection = True
+
+    def send_header(self, keyword, value):
+        if self._keep_alive and keyword.lower() == 'connection' and value.lower() == 'close':
+            return
+        super().send_header(keyword, value)
+
+    def log_request(self, code='-', size='-'):
+        if logger.isEnabledFor(logging.DEBUG):
+            super().log_request(code, size)
+
+
+def _bind(host, port, backlog=1024):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, host, port, sock, on_worker_start):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if on_worker_start is not None:
+        on_worker_start()
+    server = make_server(host, port, app, threaded=True, request_handler=KeepAliveRequestHandler,
+                         fd=sock.fileno())
+    logger.info('worker %d 已启动', os.getpid())
+    server.serve_forever()
+
+
+def serve_prefork(app, host, port, workers=4, on_worker_start=None):
+    """预派生多进程服务：父进程监听端口后 fork 出 workers 个子进程共同 accept
+
+    每个 worker 是一个多线程的 WSGI 服务，支持 HTTP/1.1 keep-alive；
+    on_worker_start 在 fork 之后、开始处理请求之前于子进程内调用（例如打开存储）。
+    worker 异常退出时父进程会重新拉起；父进程收到 SIGINT/SIGTERM 时结束全部 worker。
+    """
+    if not hasattr(os, 'fork'):
+        raise RuntimeError('预派生多进程模式需要 os.fork（仅类 Unix 系统）')
+
+    sock = _bind(host, port)
+    children = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(app, host, port, sock, on_worker_start)
+            except BaseException:
+                logger.exception('worker %d 异常退出', os.getpid())
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        logger.error('worker %d 退出（状态 %d），重新启动', pid, status)
+        # 启动即崩溃时放慢重启节奏，避免空转
+        if time.monotonic() - started < 1:
+            time.sleep(1)
+        spawn()
+    sock.close()
@@ -0,0 +1,275 @@
+import os
+import sqlite3
+import threading
+
+from api.user_record import format_time, parse_time
+from api.user_store import JournalPersistence, DuplicateUserError
+
+USER_COLUMNS = ('user_id', 'username', 'password', 'email', 'phone', 'avatar',
+                'create_time', 'update_time', 'role', 'status')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS users (
+    user_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+    username    TEXT    NOT NULL,
+    password    TEXT    NOT NULL,
+    email       TEXT    NOT NULL,
+    phone       TEXT    NOT NULL DEFAULT '',
+    avatar      TEXT    NOT NULL DEFAULT '',
+    create_time TEXT    NOT NULL,
+    update_time TEXT    NOT NULL,
+    role        TEXT    NOT NULL DEFAULT 'user',
+    status      INTEGER NOT NULL DEFAULT 1
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users(username);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users(email);
+CREATE INDEX IF NOT EXISTS idx_users_create_time ON users(create_time);
+CREATE INDEX IF NOT EXISTS idx_users_phone ON users(phone);
+-- 用户 ID 分配器：只增不减，删除用户后 ID 也不会复用
+CREATE TABLE IF NOT EXISTS id_sequence (
+    name  TEXT    PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO id_sequence (name, value)
+    SELECT 'user_id', COALESCE(MAX(user_id), 0) + 1 FROM users;
+'''
+
+# 支持前缀 / 精确搜索的字段
+SEARCH_FIELDS = ('email', 'phone')
+
+# fsync 策略与 SQLite synchronous 级别的对应关系
+SYNCHRONOUS = {'always': 'FULL', 'batch': 'NORMAL', 'off': 'OFF'}
+
+
+def _duplicate_error(error):
+    """把唯一索引冲突转换成 DuplicateUserError"""
+    field = 'username' if 'users.username' in str(error) else 'email'
+    return DuplicateUserError(field)
+
+
+def _prefix_upper_bound(value):
+    """以 value 为前缀的字符串的上界（不含）：去掉末尾的 U+10FFFF 后把最后一个字符加一，没有上界时返回 None
+
+    加一落在代理区时跳到 U+E000，上界才能编码成 UTF-8。
+    """
+    stripped = value.rstrip('\U0010ffff')
+    if not stripped:
+        return None
+    code = ord(stripped[-1]) + 1
+    if 0xD800 <= code <= 0xDFFF:
+        code = 0xE000
+    return stripped[:-1] + chr(code)
+
+
+class SqliteUserStore:
+    """基于 SQLite 的用户存储，接口与 UserStore 一致
+
+    使用 WAL 模式，多个线程 / 多个 worker 进程可以同时读写同一个库文件；
+    每个线程持有自己的连接。并发控制交给 SQLite：每条写语句是一个事务，
+    跨进程由库文件锁串行化，用户名 / 邮箱的唯一性由唯一索引保证。
+    """
+
+    def __init__(self, path, fsync='batch', busy_timeout=5.0):
+        self.path = path
+        self.synchronous = SYNCHRONOUS[fsync]
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            self._local.conn = conn
+        return conn
+
+    def _query_one(self, sql, params):
+        row = self._conn().execute(sql, params).fetchone()
+        return dict(row) if row is not None else None
+
+    def __len__(self):
+        return self._conn().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    # ---------- 查询 ----------
+    def get(self, user_id):
+        return self._query_one('SELECT * FROM users WHERE user_id = ?', (user_id,))
+
+    def get_by_username(self, username):
+        return self._query_one('SELECT * FROM users WHERE username = ?', (username,))
+
+    def username_exists(self, username):
+        return self._conn().execute(
+            'SELECT 1 FROM users WHERE username = ?', (username,)).fetchone() is not None
+
+    def email_exists(self, email):
+        return self._conn().execute(
+            'SELECT 1 FROM users WHERE email = ?', (email,)).fetchone() is not None
+
+    def all(self):
+        return [dict(row) for row in self._conn().execute('SELECT * FROM users ORDER BY user_id')]
+
+    def list_users(self, after_id=0, limit=50, role=None, status=None,
+                   create_time_from=None, create_time_to=None):
+        """按 user_id 游标分页列出用户，返回 (用户列表, 是否还有下一页)
+
+        create_time 过滤条件先规范成 'YYYY-MM-DD HH:MM:SS' 再与列按字符串比较（与 UserStore 语义一致），
+        格式不合法时抛出 ValueError。
+        """
+        if create_time_from is not None:
+            create_time_from = format_time(parse_time(create_time_from))
+        if create_time_to is not None:
+            create_time_to = format_time(parse_time(create_time_to))
+        conditions = ['user_id > ?']
+        params = [after_id]
+        for clause, value in (('role = ?', role), ('status = ?', status),
+                              ('create_time >= ?', create_time_from), ('create_time <= ?', create_time_to)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        rows = self._conn().execute(
+            f'SELECT * FROM users WHERE {" AND ".join(conditions)} ORDER BY user_id LIMIT ?',
+            params + [limit + 1]).fetchall()
+        return [dict(row) for row in rows[:limit]], len(rows) > limit
+
+    def search(self, field, value, prefix=True, limit=50):
+        """按 email / phone 精确或前缀搜索，返回 (用户列表, 是否还有更多)
+
+        前缀查询改写成 [value, value 的后继) 的范围条件，走字段上的索引。
+        """
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"不支持的搜索字段: {field}，可选值 {SEARCH_FIELDS}")
+        upper = _prefix_upper_bound(value) if prefix else None
+        if upper is not None:
+            condition, params = f'{field} >= ? AND {field} < ?', [value, upper]
+        elif prefix and value:
+            condition, params = f'{field} >= ?', [value]
+        elif prefix:
+            condition, params = '1', []
+        else:
+            condition, params = f'{field} = ?', [value]
+        rows = self._conn().execute(
+            f'SELECT * FROM users WHERE {condition} ORDER BY {field}, user_id LIMIT ?',
+            params + [limit + 1]).fetchall()
+        return [dict(row) for row in rows[:limit]], len(rows) > limit
+
+    def peek_user_id(self):
+        """下一个将要分配的用户 ID（不占用）"""
+        return self._conn().execute(
+            "SELECT value FROM id_sequence WHERE name = 'user_id'").fetchone()[0]
+
+    def allocate_user_id(self):
+        """原子地分配一个新的用户 ID（跨线程、跨进程），O(1)"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            user_id = conn.execute(
+                "SELECT value FROM id_sequence WHERE name = 'user_id'").fetchone()[0]
+            conn.execute("UPDATE id_sequence SET value = value + 1 WHERE name = 'user_id'")
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return user_id
+
+    def reserve_user_ids(self, next_user_id):
+        """保证分配器不会分配小于 next_user_id 的 ID（导入数据时使用）"""
+        self._conn().execute(
+            "UPDATE id_sequence SET value = MAX(value, ?) WHERE name = 'user_id'", (next_user_id,))
+
+    # ---------- 变更 ----------
+    def add(self, user):
+        """新增用户，用户名或邮箱已被占用时抛出 DuplicateUserError"""
+        columns = ', '.join(USER_COLUMNS)
+        placeholders = ', '.join('?' for _ in USER_COLUMNS)
+        try:
+            self._conn().execute(f'INSERT INTO users ({columns}) VALUES ({placeholders})',
+                                 [user[c] for c in USER_COLUMNS])
+        except sqlite3.IntegrityError as e:
+            raise _duplicate_error(e) from e
+        return user
+
+    def add_many(self, users):
+        """批量导入用户（单个事务），分配器同步推进到最大 ID 之后"""
+        columns = ', '.join(USER_COLUMNS)
+        placeholders = ', '.join('?' for _ in USER_COLUMNS)
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(f'INSERT INTO users ({columns}) VALUES ({placeholders})',
+                             ([user[c] for c in USER_COLUMNS] for user in users))
+            conn.execute("UPDATE id_sequence SET value = MAX(value, (SELECT COALESCE(MAX(user_id), 0) + 1 FROM users)) "
+                         "WHERE name = 'user_id'")
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def update(self, user_id, changes):
+        """按字段更新用户，用户不存在时返回 None；新邮箱已被占用时抛出 DuplicateUserError"""
+        fields = [c for c in changes if c in USER_COLUMNS and c != 'user_id']
+        if fields:
+            assignments = ', '.join(f'{c} = ?' for c in fields)
+            try:
+                cursor = self._conn().execute(f'UPDATE users SET {assignments} WHERE user_id = ?',
+                                              [changes[c] for c in fields] + [user_id])
+            except sqlite3.IntegrityError as e:
+                raise _duplicate_error(e) from e
+            if cursor.rowcount == 0:
+                return None
+        return self.get(user_id)
+
+    def delete(self, user_id):
+        """删除用户，返回被删除的用户，不存在时返回 None"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            user = self._query_one('SELECT * FROM users WHERE user_id = ?', (user_id,))
+            if user is not None:
+                conn.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return user
+
+    def compact(self):
+        """把 WAL 中的内容合并回主库文件"""
+        self._conn().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def migrate_json_to_sqlite(json_path, db_path, fsync='batch'):
+    """把 users.json（快照 + 日志）导入 SQLite 库，返回导入的用户数
+
+    目标库中已存在的用户（相同 user_id）会被跳过。
+    """
+    persistence = JournalPersistence(json_path)
+    users = persistence.load()
+    store = SqliteUserStore(db_path, fsync=fsync)
+    existing = {row[0] for row in store._conn().execute('SELECT user_id FROM users')}
+    pending = [user for user in users if user['user_id'] not in existing]
+    store.add_many(sorted(pending, key=lambda u: u['user_id']))
+    store.reserve_user_ids(persistence.next_user_id)
+    store.close()
+    return len(pending)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='把 users.json 导入 SQLite 存储')
+    parser.add_argument('json_path', help='users.json 路径（同目录下的 users.journal 会一并重放）')
+    parser.add_argument('db_path', help='目标 SQLite 库文件路径')
+    args = parser.parse_args()
+    if not os.path.exists(args.json_path):
+        parser.error(f'文件不存在: {args.json_path}')
+    count = migrate_json_to_sqlite(args.json_path, args.db_path)
+    print(f'已导入 {count} 个用户到 {args.db_path}')
@@ -0,0 +1,185 @@
+import json
+import threading
+import time
+from collections import deque
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from requests.adapters import HTTPAdapter
+
+from common.histogram import Histogram
+
+# 每条请求记录的字段（JSONL 中的键），耗时单位为秒
+RECORD_FIELDS = ('ts', 'method', 'endpoint', 'status', 'connect', 'ttfb', 'total',
+                 'request_bytes', 'response_bytes')
+
+# 按接口统计的客户端事件：重试、发出对冲请求、对冲请求先返回、超过调用时限
+EVENT_KINDS = ('retry', 'hedge', 'hedge_won', 'deadline_exceeded')
+
+# 当前线程最近一次新建连接的耗时；请求前清零，连接复用时保持为 0
+_connect = threading.local()
+
+
+class _TimedConnectMixin:
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _connect.seconds = getattr(_connect, 'seconds', 0.0) + time.perf_counter() - start
+
+
+class TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """建立 TCP（及 TLS）连接时记录耗时的 HTTPAdapter，其余行为与 HTTPAdapter 相同"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool,
+                                                   'https': TimedHTTPSConnectionPool}
+
+
+def reset_connect_time():
+    _connect.seconds = 0.0
+
+
+def connect_time():
+    return getattr(_connect, 'seconds', 0.0)
+
+
+class RequestRecorder:
+    """客户端请求耗时记录
+
+    - 每次请求一条记录（dict，字段见 RECORD_FIELDS），endpoint 是路径模板（如 /api/v1/users/{user_id}），
+      同一接口的不同用户汇总到一起；
+    - 最近 maxlen 条保存在内存的环形缓冲区中，sink 不为空时同时逐行追加到 JSONL 文件；
+    - summary() 按 (方法, 接口) 给出 total / ttfb 的分位数，直方图累计全部请求，不受缓冲区大小限制；
+    - 重试、对冲请求只计入 summary() 的事件次数（EVENT_KINDS），每次实际发出的请求仍各记一条。
+    """
+
+    def __init__(self, maxlen=10000, sink=None):
+        self.records = deque(maxlen=maxlen)
+        self.sink = sink
+        self._lock = threading.Lock()
+        self._file = None
+        self._total = {}
+        self._ttfb = {}
+        self._status = {}
+        self._events = {}
+
+    def record(self, method, endpoint, status, connect, ttfb, total, request_bytes, response_bytes):
+        record = {'ts': round(time.time(), 6), 'method': method, 'endpoint': endpoint, 'status': status,
+                  'connect': connect, 'ttfb': ttfb, 'total': total,
+                  'request_bytes': request_bytes, 'response_bytes': response_bytes}
+        key = (method, endpoint)
+        with self._lock:
+            self.records.append(record)
+            self._total.setdefault(key, Histogram()).record(total)
+            self._ttfb.setdefault(key, Histogram()).record(ttfb)
+            statuses = self._status.setdefault(key, {})
+            statuses[status] = statuses.get(status, 0) + 1
+            if self.sink is not None:
+                if self._file is None:
+                    self._file = open(self.sink, 'a', encoding='utf-8')
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return record
+
+    def count(self, method, endpoint, kind):
+        key = (method, endpoint)
+        with self._lock:
+            events = self._events.setdefault(key, dict.fromkeys(EVENT_KINDS, 0))
+            events[kind] += 1
+
+    def percentile(self, method, endpoint, q, min_count=1):
+        """某个接口总耗时的第 q 百分位（秒），记录数不足 min_count 时返回 None"""
+        with self._lock:
+            hist = self._total.get((method, endpoint))
+            if hist is None or hist.count < min_count:
+                return None
+            return hist.percentile(q)
+
+    def summary(self, quantiles=(50, 95, 99)):
+        """{(方法, 接口): {'count', 'mean', 'min', 'max', 'p50', ..., 'ttfb_p95', 'status': {状态码: 次数},
+        'retry', 'hedge', 'hedge_won', 'deadline_exceeded'}}"""
+        with self._lock:
+            result = {}
+            for key, hist in self._total.items():
+                item = hist.summary(quantiles)
+                item['ttfb_p95'] = self._ttfb[key].percentile(95)
+                item['status'] = dict(self._status[key])
+                result[key] = item
+            for key, events in self._events.items():
+                result.setdefault(key, {**Histogram().summary(quantiles), 'ttfb_p95': 0.0, 'status': {}})
+                result[key].update(events)
+            for item in result.values():
+                for kind in EVENT_KINDS:
+                    item.setdefault(kind, 0)
+            return result
+
+    def histogram(self, method, endpoint):
+        """某个接口总耗时的直方图副本，没有记录时返回 None"""
+        with self._lock:
+            hist = self._total.get((method, endpoint))
+            return Histogram().merge(hist) if hist is not None else None
+
+    def format_summary(self):
+        """summary() 的文本表格，耗时单位毫秒"""
+        lines = [f"{'METHOD':<7}{'ENDPOINT':<42}{'COUNT':>7}{'P50':>9}{'P95':>9}{'P99':>9}"
+                 f"{'MAX':>9}{'TTFB95':>9}{'RETRY':>7}{'HEDGE':>7}{'WON':>5}{'DEADLINE':>9}  STATUS"]
+        for (method, endpoint), item in sorted(self.summary().items()):
+            statuses = ','.join(f'{status}:{n}' for status, n in sorted(item['status'].items()))
+            lines.append(f"{method:<7}{endpoint:<42}{item['count']:>7}"
+                         + ''.join(f"{item[name] * 1000:>9.2f}" for name in ('p50', 'p95', 'p99', 'max', 'ttfb_p95'))
+                         + f"{item['retry']:>7}{item['hedge']:>7}{item['hedge_won']:>5}"
+                         f"{item['deadline_exceeded']:>9}  {statuses}")
+        return '\n'.join(lines)
+
+    def clear(self):
+        with self._lock:
+            self.records.clear()
+            self._total.clear()
+            self._ttfb.clear()
+            self._status.clear()
+            self._events.clear()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+_default_recorder = None
+_default_lock = threading.Lock()
+
+
+def default_recorder(config):
+    """进程内共用的记录器（按 client.timing 配置创建一次），未启用时返回 None"""
+    global _default_recorder
+    timing = config.get('timing', {})
+    if not timing.get('enabled', True):
+        return None
+    with _default_lock:
+        if _default_recorder is None:
+            _default_recorder = RequestRecorder(timing.get('buffer_size', 10000), timing.get('sink'))
+        return _default_recorder
+
+
+def current_recorder():
+    """已创建的共用记录器，还没有客户端创建过时返回 None"""
+    return _default_recorder
@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    """已解码 JWT 的 LRU 缓存，键为令牌字符串，值为解码后的 claims
+
+    - 命中时检查 exp，过期的令牌直接淘汰，不会从缓存返回；
+    - 缓存与签名密钥绑定，SECRET_KEY 变化后首次访问会清空缓存；
+    - hits / misses / evictions / expired 计数供运维查看。
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._secret = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def _check_secret(self, secret):
+        if secret != self._secret:
+            self._data.clear()
+            self._secret = secret
+
+    def get(self, token, secret):
+        """返回缓存的 claims，未命中或已过期返回 None"""
+        with self._lock:
+            self._check_secret(secret)
+            claims = self._data.get(token)
+            if claims is None:
+                self.misses += 1
+                return None
+            exp = claims.get('exp')
+            if exp is not None and exp <= time.time():
+                del self._data[token]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token, secret, claims):
+        with self._lock:
+            self._check_secret(secret)
+            self._data[token] = claims
+            self._data.move_to_end(token)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expired': self.expired,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
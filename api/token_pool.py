@@ -0,0 +1,215 @@
+import atexit
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，多进程同时保存时不互斥
+    fcntl = None
+
+
+def token_expiry(token):
+    """读取 JWT 载荷中的 exp（unix 时间戳，不校验签名），解析失败时返回 None"""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _fingerprint(password, salt):
+    # 只用于判断密码是否变化，磁盘上不保存明文密码；以每个缓存文件各自的随机盐作为 blake2b 的 key
+    return hashlib.blake2b(password.encode('utf-8'), key=salt, digest_size=16).hexdigest()
+
+
+def _public(entry):
+    return {key: value for key, value in entry.items() if key != 'password'}
+
+
+class TokenPool:
+    """按 (base_url, 用户名) 复用未过期的登录令牌
+
+    - get(api, username, password) 返回 {'token', 'user_id', 'role', 'exp'}：缓存中的令牌距离 exp 还有
+      refresh_margin 秒以上时直接返回，否则调用 api.login 重新登录；
+    - 同一个用户同一时刻只有一个线程登录，其余线程等它的结果；不同用户互不阻塞；
+    - path 不为空时缓存同时写入该 JSON 文件（权限 0600），下次运行启动时读取，跨进程、跨运行复用；
+      文件中只保存令牌和密码的加盐摘要（盐随文件生成），密码变化时视为未命中；
+      读取-合并-替换文件时持有 <path>.lock 文件锁，多个进程同时保存不会丢失彼此的令牌；
+    - 新令牌至多每 save_interval 秒写一次文件，其余的在下一次写入或进程退出时一起写入；
+    - put() 把批量登录等途径拿到的令牌放进缓存；服务端不再认可某个令牌（401）时用 invalidate() 移除。
+    """
+
+    def __init__(self, path=None, refresh_margin=60, save_interval=5):
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._user_locks = {}
+        self._removed = set()
+        self._dirty = False
+        self._last_save = 0.0
+        self.hits = 0
+        self.logins = 0
+        self.salt = os.urandom(16)
+        self._entries = {}
+        if path:
+            with self._file_lock():
+                salt, self._entries = self._load()
+                if salt is None:
+                    # 新文件：先写入盐，之后各进程共用同一个盐
+                    self._write({})
+                else:
+                    self.salt = salt
+            atexit.register(self._save_if_dirty)
+
+    @staticmethod
+    def key(base_url, username):
+        return f'{base_url}|{username}'
+
+    @contextmanager
+    def _file_lock(self):
+        """跨进程的文件锁（没有 fcntl 的平台上只有进程内的互斥）"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        """读取缓存文件，返回 (盐, 令牌)；文件不存在、损坏或为旧格式时返回 (None, {})"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            return bytes.fromhex(data['salt']), dict(data['tokens'])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None, {}
+
+    def _write(self, entries):
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'salt': self.salt.hex(), 'tokens': entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def save(self):
+        """持有文件锁，与磁盘上的内容合并后原子替换（其他进程写入的令牌不会丢失），没有配置 path 时不做任何事"""
+        if not self.path:
+            return
+        with self._file_lock():
+            salt, entries = self._load()
+            if salt is not None and salt != self.salt:
+                # 文件被其他进程重建过，盐不同的摘要无法比较，只保留本进程的令牌
+                entries = {}
+            now = time.time()
+            with self._lock:
+                for key in self._removed:
+                    entries.pop(key, None)
+                entries.update(self._entries)
+                self._dirty = False
+                self._last_save = time.monotonic()
+            self._write({key: entry for key, entry in entries.items() if entry['exp'] > now})
+
+    def _save_if_dirty(self):
+        if self._dirty:
+            self.save()
+
+    def _fresh(self, key, password):
+        entry = self._entries.get(key)
+        if entry is None or entry.get('password') != _fingerprint(password, self.salt):
+            return None
+        if entry['exp'] - time.time() <= self.refresh_margin:
+            return None
+        return entry
+
+    def get(self, api, username, password):
+        key = self.key(api.base_url, username)
+        with self._lock:
+            entry = self._fresh(key, password)
+            if entry is not None:
+                self.hits += 1
+                return _public(entry)
+            user_lock = self._user_locks.setdefault(key, threading.Lock())
+        with user_lock:
+            with self._lock:
+                entry = self._fresh(key, password)
+                if entry is not None:
+                    self.hits += 1
+                    return _public(entry)
+            resp_json = api.login({'username': username, 'password': password, 'remember_me': False}).json()
+            if resp_json.get('code') != 200:
+                raise RuntimeError(f'登录失败：{resp_json}')
+            entry = self.put(api.base_url, username, password, resp_json['data'])
+            with self._lock:
+                self.logins += 1
+            return entry
+
+    def put(self, base_url, username, password, login_data, save=True):
+        """缓存一次登录结果（登录接口响应的 data），返回与 get() 相同结构的 dict
+
+        save=True 时距离上次写文件超过 save_interval 秒才立即写入，否则留到下一次写入或进程退出时
+        """
+        token = login_data['token']
+        exp = token_expiry(token) or int(time.time()) + int(login_data.get('expires_in', 3600))
+        user_info = login_data.get('user_info', {})
+        entry = {'token': token, 'user_id': user_info.get('user_id'), 'role': user_info.get('role'),
+                 'exp': exp, 'password': _fingerprint(password, self.salt)}
+        key = self.key(base_url, username)
+        with self._lock:
+            self._entries[key] = entry
+            self._removed.discard(key)
+            self._dirty = True
+            due = time.monotonic() - self._last_save >= self.save_interval
+        if save and due:
+            self.save()
+        return _public(entry)
+
+    def invalidate(self, base_url, username, token=None):
+        """移除该用户的令牌（例如服务端重启换了密钥，令牌返回 401），下次 get() 时重新登录
+
+        传入 token 时只在缓存的仍是这个令牌时移除，其他线程已经换上的新令牌不受影响
+        """
+        key = self.key(base_url, username)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and token is not None and entry['token'] != token:
+                return
+            self._entries.pop(key, None)
+            self._removed.add(key)
+        self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._removed.clear()
+            self._dirty = False
+        if self.path:
+            with self._file_lock():
+                self._write({})
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def default_token_pool(config):
+    """进程内共用的令牌池（按 client.token_pool 配置创建一次）"""
+    global _default_pool
+    pool_config = config.get('token_pool', {})
+    with _default_lock:
+        if _default_pool is None:
+            path = pool_config.get('path')
+            if path and not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+            _default_pool = TokenPool(path, pool_config.get('refresh_margin', 60),
+                                      pool_config.get('save_interval', 5))
+        return _default_pool
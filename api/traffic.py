@@ -0,0 +1,141 @@
+import atexit
+import gzip
+import json
+import threading
+import time
+
+# 轨迹文件格式版本（首行的 trace 字段）
+TRACE_VERSION = 1
+
+
+def open_trace(path, mode='rt'):
+    """按扩展名打开轨迹文件，.gz 结尾时读写 gzip 压缩的 JSONL"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def response_outputs(data):
+    """从响应的 data 中取出回放时需要对应起来的值：登录得到的 token、注册 / 登录得到的 user_id
+
+    批量接口（data.results）按位置返回每一项的结果列表。
+    """
+    if not isinstance(data, dict):
+        return None
+    if isinstance(data.get('results'), list):
+        items = [response_outputs(item.get('data')) if isinstance(item, dict) else None for item in data['results']]
+        return {'items': items} if any(items) else None
+    outputs = {}
+    if 'token' in data:
+        outputs['token'] = data['token']
+    user_info = data.get('user_info') if isinstance(data.get('user_info'), dict) else data
+    if isinstance(user_info.get('user_id'), int):
+        outputs['user_id'] = user_info['user_id']
+    return outputs or None
+
+
+class TrafficRecorder:
+    """把客户端发出的每个请求写成一行紧凑的 JSON（可回放的轨迹）
+
+    首行为 {"trace": 版本, "base_url": ..., "started": unix 时间}，之后每个请求一行：
+    - t：相对第一条记录的发送时间（秒）；m：方法；e：路径模板；p：路径参数；q：查询参数；b：JSON 请求体；
+    - i：发送者身份。token 不写入文件，第一次见到某个 token 时分配 "u1"、"u2"… 代替；
+    - o：响应中回放需要对应的值，登录得到的 token 记为身份（identity），注册 / 登录得到的 user_id 原样记录；
+    - s：HTTP 状态码。
+    没有的字段省略。多线程共用同一个记录器，写入时加锁；文件在写第一条记录时才创建。
+    """
+
+    def __init__(self, path, base_url=''):
+        self.path = path
+        self.base_url = base_url
+        self._file = None
+        self._lock = threading.Lock()
+        self._identities = {}
+        self._start = None
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+    def _identity(self, token):
+        identity = self._identities.get(token)
+        if identity is None:
+            identity = self._identities[token] = f'u{len(self._identities) + 1}'
+        return identity
+
+    def record(self, sent_at, method, endpoint, path_params=None, params=None, body=None,
+               authorization=None, resp=None):
+        """sent_at 为 time.monotonic() 的发送时间；resp 为 None 表示请求没有拿到响应"""
+        outputs = None
+        # 只有 POST（注册、登录、管理员创建及批量接口）会产生新的 token / user_id
+        if method == 'POST' and resp is not None and resp.headers.get('Content-Type', '').startswith('application/json'):
+            try:
+                outputs = response_outputs(resp.json().get('data'))
+            except ValueError:
+                outputs = None
+        with self._lock:
+            if self._file is None:
+                self._file = open_trace(self.path, 'wt')
+                self._write({'trace': TRACE_VERSION, 'base_url': self.base_url, 'started': round(time.time(), 3)})
+            if self._start is None:
+                self._start = sent_at
+            record = {'t': round(sent_at - self._start, 6), 'm': method, 'e': endpoint}
+            if path_params:
+                record['p'] = path_params
+            if params:
+                record['q'] = params
+            if body is not None:
+                record['b'] = body
+            if authorization and authorization.startswith('Bearer '):
+                record['i'] = self._identity(authorization[7:])
+            if outputs:
+                record['o'] = self._replace_tokens(outputs)
+            if resp is not None:
+                record['s'] = resp.status_code
+            self._write(record)
+
+    def _replace_tokens(self, outputs):
+        if 'items' in outputs:
+            return {'items': [self._replace_tokens(item) if item else None for item in outputs['items']]}
+        outputs = dict(outputs)
+        if 'token' in outputs:
+            outputs['identity'] = self._identity(outputs.pop('token'))
+        return outputs
+
+    def close(self):
+        with self._lock:
+            if self._file is not None and not self._file.closed:
+                self._file.close()
+
+
+_default_traffic = None
+_default_lock = threading.Lock()
+
+
+def default_traffic_recorder(config, base_url=''):
+    """进程内共用的轨迹记录器（client.traffic.path 不为空时创建一次），未启用时返回 None"""
+    global _default_traffic
+    path = config.get('traffic', {}).get('path')
+    if not path:
+        return None
+    with _default_lock:
+        if _default_traffic is None:
+            _default_traffic = TrafficRecorder(path, base_url)
+            # 缓冲中的记录（以及 gzip 文件尾）在关闭时才写出，进程退出前关闭
+            atexit.register(_default_traffic.close)
+        return _default_traffic
+
+
+def read_trace(path):
+    """逐行读取轨迹（生成器，不整体载入内存），返回 (首行信息, 记录迭代器)"""
+    f = open_trace(path)
+    header = json.loads(f.readline())
+    if header.get('trace') != TRACE_VERSION:
+        f.close()
+        raise ValueError(f'不支持的轨迹文件版本: {header.get("trace")}')
+
+    def records():
+        with f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    return header, records()
@@ -1,18 +1,30 @@
 from keyword import kwlist
 
 from api.client import APIClient
+from api.token_pool import default_token_pool
+
+# 接口路径，同步 / 异步客户端共用
+ENDPOINTS = {
+    "register": "/api/v1/users/register",
+    "login": "/api/v1/users/login",
+    "obtain": "/api/v1/users/{user_id}",
+    "update": "/api/v1/users/{user_id}",
+    "delete": "/api/v1/users/{user_id}",
+    "admin": "/api/v1/admin/users/create",
+    "batch_register": "/api/v1/users/batch/register",
+    "batch_login": "/api/v1/users/batch/login",
+    "batch_obtain": "/api/v1/users/batch/get",
+    "batch_delete": "/api/v1/users/batch/delete",
+    "list": "/api/v1/admin/users",
+    "search": "/api/v1/admin/users/search"
+}
+
 
 class UserManagementAPI(APIClient):
     def __init__(self):
         super().__init__()
-        self.endpoint = {
-            "register": "/api/v1/users/register",
-            "login": "/api/v1/users/login",
-            "obtain": "/api/v1/users/{user_id}",
-            "update": "/api/v1/users/{user_id}",
-            "delete": "/api/v1/users/{user_id}",
-            "admin": "/api/v1/admin/users/create"
-        }
+        self.endpoint = dict(ENDPOINTS)
+        self.token_pool = default_token_pool(self.config.get("client",{}))  #按 (base_url, 用户名) 复用未过期的令牌
 
     def register(self,register_data):
         """用户注册"""
@@ -25,21 +37,73 @@ class UserManagementAPI(APIClient):
 
     def obtain(self,user_id):
         """获取用户信息"""
-        endpoint = self.endpoint["obtain"].format(user_id = user_id)
-        return self.get(endpoint)
+        return self.get(self.endpoint["obtain"],path_params={"user_id": user_id})
 
     def update(self,user_id,update_data):
         """更新用户信息"""
-        endpoint = self.endpoint["update"].format(user_id = user_id)
-        return self.put(endpoint,json=update_data)
+        return self.put(self.endpoint["update"],json=update_data,path_params={"user_id": user_id})
 
     def delete_user(self,user_id,reason):
         """"删除用户信息"""
-        endpoint = self.endpoint["delete"].format(user_id = user_id)
-        return self.delete(endpoint,json=reason)
+        return self.delete(self.endpoint["delete"],json=reason,path_params={"user_id": user_id})
+
 
+    def login_as(self,username,password):
+        """返回该用户身份的句柄：令牌池中有未过期的令牌时直接使用，否则登录一次
+
+        句柄的请求返回 401 时（令牌已被服务端拒绝）从令牌池移除该令牌，下次 login_as 重新登录
+        """
+        token = self.token_pool.get(self,username,password)["token"]
+        user = self.as_user(token)
+        base_url = self.base_url
+        user.on_unauthorized = lambda: self.token_pool.invalidate(base_url,username,token)
+        return user
 
     def admin(self,admin_data):
         """管理员注册"""
         return self.post(self.endpoint["admin"],json=admin_data)
 
+    def batch_register(self,users):
+        """批量注册，users 为注册参数列表"""
+        return self.post(self.endpoint["batch_register"],json={"users": users})
+
+    def batch_login(self,users):
+        """批量登录，users 为登录参数列表"""
+        return self.post(self.endpoint["batch_login"],json={"users": users})
+
+    def batch_obtain(self,user_ids):
+        """批量获取用户信息"""
+        return self.post(self.endpoint["batch_obtain"],json={"user_ids": user_ids})
+
+    def batch_delete(self,user_ids,reason = None):
+        """批量删除用户"""
+        return self.post(self.endpoint["batch_delete"],json={"user_ids": user_ids,"reason": reason})
+
+    def list_users(self,cursor = None,limit = None,**filters):
+        """管理员分页获取用户列表，filters 支持 role/status/create_time_from/create_time_to"""
+        param = {key: value for key, value in filters.items() if value is not None}
+        if cursor is not None:
+            param["cursor"] = cursor
+        if limit is not None:
+            param["limit"] = limit
+        return self.get(self.endpoint["list"],param=param)
+
+    def search(self,q,field = "email",mode = "prefix",limit = None):
+        """按邮箱 / 手机号搜索用户（需管理员权限），mode 为 prefix 或 exact"""
+        param = {"q": q,"field": field,"mode": mode}
+        if limit is not None:
+            param["limit"] = limit
+        return self.get(self.endpoint["search"],param=param)
+
+    def iter_users(self,page_size = None,**filters):
+        """逐页惰性遍历全部用户（需管理员权限），每次只请求下一页"""
+        cursor = None
+        while True:
+            resp_json = self.list_users(cursor=cursor,limit=page_size,**filters).json()
+            if resp_json.get("code") != 200:
+                raise RuntimeError(f"获取用户列表失败：{resp_json}")
+            data = resp_json["data"]
+            yield from data["users"]
+            if not data["has_more"]:
+                return
+            cursor = data["next_cursor"]
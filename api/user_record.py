@@ -0,0 +1,132 @@
+import sys
+import time
+from datetime import datetime
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+_EPOCH = datetime(1970, 1, 1)
+
+# 对外（接口响应、快照、日志）使用的字段顺序
+USER_FIELDS = ('user_id', 'username', 'password', 'email', 'phone', 'avatar',
+               'create_time', 'update_time', 'role', 'status')
+
+
+def parse_time(value):
+    """'YYYY-MM-DD HH:MM:SS' -> 整数秒（按墙上时间换算，不做时区转换，保证原样格式化回去）"""
+    return int((datetime.fromisoformat(value) - _EPOCH).total_seconds())
+
+
+def format_time(seconds):
+    return time.strftime(TIME_FORMAT, time.gmtime(seconds))
+
+
+class UserRecord:
+    """常驻内存的紧凑用户记录
+
+    - __slots__ 代替 dict，没有每个对象一份的哈希表；
+    - create_time / update_time 存为整数秒，只在读取 'create_time' 等字段时格式化成字符串；
+    - role 使用 sys.intern，所有用户共享同一个字符串对象。
+
+    支持 user['field'] / user.get() / dict(user) 等只读映射用法以及 user.update(changes)，
+    与原来的 dict 用户对象以及 SqliteUserStore 返回的 dict 可以互换使用。
+    """
+
+    __slots__ = ('user_id', 'username', 'password', 'email', 'phone', 'avatar',
+                 'create_ts', 'update_ts', 'role', 'status')
+
+    def __init__(self, user_id, username, password, email, phone='', avatar='',
+                 create_ts=0, update_ts=0, role='user', status=1):
+        self.user_id = user_id
+        self.username = username
+        self.password = password
+        self.email = email
+        self.phone = phone
+        self.avatar = avatar
+        self.create_ts = create_ts
+        self.update_ts = update_ts
+        self.role = sys.intern(role)
+        self.status = status
+
+    @classmethod
+    def from_dict(cls, data):
+        create_time, update_time = data['create_time'], data['update_time']
+        create_ts = parse_time(create_time)
+        # 从未更新过的用户两个时间相同，共用同一个整数对象
+        update_ts = create_ts if update_time == create_time else parse_time(update_time)
+        return cls(data['user_id'], data['username'], data['password'], data['email'],
+                   data.get('phone', ''), data.get('avatar', ''), create_ts, update_ts,
+                   data.get('role', 'user'), data.get('status', 1))
+
+    def to_dict(self):
+        """转换为持久化 / 接口使用的 dict，时间格式化为字符串"""
+        return {
+            'user_id': self.user_id,
+            'username': self.username,
+            'password': self.password,
+            'email': self.email,
+            'phone': self.phone,
+            'avatar': self.avatar,
+            'create_time': format_time(self.create_ts),
+            'update_time': format_time(self.update_ts),
+            'role': self.role,
+            'status': self.status
+        }
+
+    # ---------- 映射接口 ----------
+    def __getitem__(self, key):
+        if key == 'create_time':
+            return format_time(self.create_ts)
+        if key == 'update_time':
+            return format_time(self.update_ts)
+        if key not in USER_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key == 'create_time':
+            self.create_ts = parse_time(value)
+        elif key == 'update_time':
+            self.update_ts = parse_time(value)
+        elif key == 'role':
+            self.role = sys.intern(value)
+        elif key in USER_FIELDS:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in USER_FIELDS
+
+    def __iter__(self):
+        return iter(USER_FIELDS)
+
+    def __len__(self):
+        return len(USER_FIELDS)
+
+    def keys(self):
+        return USER_FIELDS
+
+    def get(self, key, default=None):
+        return self[key] if key in USER_FIELDS else default
+
+    def update(self, changes):
+        for key, value in changes.items():
+            self[key] = value
+
+    def __eq__(self, other):
+        if isinstance(other, UserRecord):
+            return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'UserRecord({self.to_dict()!r})'
+
+
+def encode_record(obj):
+    """json.dumps 的 default 钩子：UserRecord 按 to_dict() 序列化"""
+    if isinstance(obj, UserRecord):
+        return obj.to_dict()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
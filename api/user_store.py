@@ -0,0 +1,742 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+
+from api.user_record import UserRecord, encode_record, parse_time
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只能使用单进程模式
+    fcntl = None
+
+FSYNC_POLICIES = ('always', 'batch', 'off')
+
+logger = logging.getLogger('mock_server')
+
+# 单进程模式下按 user_id 分段加锁的段数
+LOCK_STRIPES = 64
+
+# 分页扫描时每次在锁内取出的 user_id 个数
+SCAN_CHUNK = 256
+
+# 支持前缀 / 精确搜索的字段
+SEARCH_FIELDS = ('email', 'phone')
+
+
+# 搜索索引每个分块的目标大小：插入 / 删除只移动一个分块内的元素
+INDEX_CHUNK = 1000
+
+
+class SortedIndex:
+    """按 (字段值, user_id) 排序的分块有序索引（思路同 sortedcontainers.SortedList）
+
+    单个大列表上 insert / del 要移动插入点之后的全部元素，百万用户时每次写入都是一次 O(n) 的内存搬移，
+    且发生在 _index_lock 内；这里把数据切成若干个不超过 2 * INDEX_CHUNK 的分块，写入先在分块的最大值
+    列表上二分找到分块，再在分块内插入，代价为 O(log n + INDEX_CHUNK)。
+    每个分块用两个平行列表（字段值、user_id）保存，不为每个条目创建元组。
+    """
+
+    def __init__(self, pairs=()):
+        """pairs 为已按 (字段值, user_id) 排好序的序列"""
+        pairs = list(pairs)
+        self._values, self._ids, self._maxes = [], [], []
+        for start in range(0, len(pairs), INDEX_CHUNK):
+            chunk = pairs[start:start + INDEX_CHUNK]
+            self._values.append([value for value, _ in chunk])
+            self._ids.append([uid for _, uid in chunk])
+            self._maxes.append(chunk[-1])
+        self._len = len(pairs)
+
+    def __len__(self):
+        return self._len
+
+    def _locate(self, value, user_id):
+        """(分块序号, 分块内位置)：(value, user_id) 应插入的位置"""
+        k = bisect_left(self._maxes, (value, user_id))
+        if k == len(self._maxes):
+            k -= 1
+        values, ids = self._values[k], self._ids[k]
+        lo = bisect_left(values, value)
+        hi = bisect_right(values, value, lo)
+        return k, bisect_left(ids, user_id, lo, hi)
+
+    def position(self, value, user_id):
+        """(value, user_id) 的插入位置，索引为空时为 None；只读，值与索引中的值无法比较时在这里抛出 TypeError"""
+        if not self._maxes:
+            return None
+        return self._locate(value, user_id)
+
+    def insert(self, position, value, user_id):
+        """在 position() 算出的位置插入，两次调用之间索引不能被修改"""
+        if position is None:
+            self._values.append([value])
+            self._ids.append([user_id])
+            self._maxes.append((value, user_id))
+            self._len = 1
+            return
+        k, i = position
+        values, ids = self._values[k], self._ids[k]
+        values.insert(i, value)
+        ids.insert(i, user_id)
+        self._maxes[k] = (values[-1], ids[-1])
+        self._len += 1
+        if len(values) > 2 * INDEX_CHUNK:
+            self._values[k + 1:k + 1] = [values[INDEX_CHUNK:]]
+            self._ids[k + 1:k + 1] = [ids[INDEX_CHUNK:]]
+            del values[INDEX_CHUNK:], ids[INDEX_CHUNK:]
+            self._maxes[k:k + 1] = [(values[-1], ids[-1]), (self._values[k + 1][-1], self._ids[k + 1][-1])]
+
+    def add(self, value, user_id):
+        self.insert(self.position(value, user_id), value, user_id)
+
+    def remove(self, value, user_id):
+        """删除 (value, user_id)，不存在时不做任何事"""
+        if not self._maxes:
+            return
+        k, i = self._locate(value, user_id)
+        values, ids = self._values[k], self._ids[k]
+        if i == len(values) or values[i] != value or ids[i] != user_id:
+            return
+        del values[i], ids[i]
+        self._len -= 1
+        if values:
+            self._maxes[k] = (values[-1], ids[-1])
+        else:
+            del self._values[k], self._ids[k], self._maxes[k]
+
+    def iter_from(self, value):
+        """从第一个字段值 >= value 的条目开始，按顺序产出 (字段值, user_id)"""
+        k = bisect_left(self._maxes, (value,))
+        if k == len(self._maxes):
+            return
+        i = bisect_left(self._values[k], value)
+        for values, ids in zip(self._values[k:], self._ids[k:]):
+            for j in range(i, len(values)):
+                yield values[j], ids[j]
+            i = 0
+
+
+class SortedIds:
+    """有序的 user_id 分块列表，用于按游标分页；分块方式同 SortedIndex，增删为 O(log n + INDEX_CHUNK)"""
+
+    def __init__(self, ids=()):
+        """ids 为已排好序的 user_id 序列"""
+        ids = list(ids)
+        self._lists = [ids[start:start + INDEX_CHUNK] for start in range(0, len(ids), INDEX_CHUNK)]
+        self._maxes = [chunk[-1] for chunk in self._lists]
+        self._len = len(ids)
+
+    def __len__(self):
+        return self._len
+
+    def add(self, user_id):
+        if not self._maxes:
+            self._lists.append([user_id])
+            self._maxes.append(user_id)
+            self._len = 1
+            return
+        # 新 ID 总是最大的，绝大多数情况下追加到最后一个分块
+        k = min(bisect_left(self._maxes, user_id), len(self._maxes) - 1)
+        chunk = self._lists[k]
+        insort(chunk, user_id)
+        self._maxes[k] = chunk[-1]
+        self._len += 1
+        if len(chunk) > 2 * INDEX_CHUNK:
+            self._lists[k + 1:k + 1] = [chunk[INDEX_CHUNK:]]
+            del chunk[INDEX_CHUNK:]
+            self._maxes[k:k + 1] = [chunk[-1], self._lists[k + 1][-1]]
+
+    def remove(self, user_id):
+        """删除 user_id，不存在时不做任何事"""
+        k = bisect_left(self._maxes, user_id)
+        if k == len(self._maxes):
+            return
+        chunk = self._lists[k]
+        i = bisect_left(chunk, user_id)
+        if chunk[i] != user_id:
+            return
+        del chunk[i]
+        self._len -= 1
+        if chunk:
+            self._maxes[k] = chunk[-1]
+        else:
+            del self._lists[k], self._maxes[k]
+
+    def after(self, cursor, count):
+        """大于 cursor 的前 count 个 user_id"""
+        k = bisect_right(self._maxes, cursor)
+        if k == len(self._maxes):
+            return []
+        i = bisect_right(self._lists[k], cursor)
+        result = []
+        for chunk in self._lists[k:]:
+            result.extend(chunk[i:i + count - len(result)])
+            if len(result) >= count:
+                break
+            i = 0
+        return result
+
+
+class DuplicateUserError(Exception):
+    """用户名或邮箱已被其他用户占用，field 为 'username' 或 'email'"""
+
+    def __init__(self, field):
+        super().__init__(f"{field} 已存在")
+        self.field = field
+
+
+class JournalPersistence:
+    """追加写日志 + 定期快照压缩的持久化方式
+
+    - 快照文件（users.json）保存某一时刻的全部用户，使用紧凑 JSON；
+    - 快照同时记录 next_user_id，保证删除的用户 ID 在压缩后也不会被复用；
+    - 日志文件（users.journal）每行一条变更记录（create/update/delete），
+      每次写入只追加一行，开销与变更大小成正比；
+    - 日志累计 compact_every 条后把内存中的全量数据写成新快照并换用新的空日志；
+    - 启动时先读快照，再重放日志尾部。
+
+    fsync 策略：always 每次写入都刷盘；batch 每隔 fsync_interval 秒刷一次；
+    off 只写入操作系统缓冲区。
+
+    shared=True 时多个进程共享同一份数据：写操作持有文件锁（users.lock），
+    并在修改前先重放其他进程追加的日志（见 UserStore）。
+    """
+
+    def __init__(self, snapshot_path, journal_path=None, fsync='batch', fsync_interval=1.0,
+                 compact_every=10000, shared=False):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"不支持的 fsync 策略: {fsync}，可选值 {FSYNC_POLICIES}")
+        if shared and fcntl is None:
+            raise RuntimeError("多进程共享 json 存储需要 fcntl 文件锁（仅类 Unix 系统），请改用 sqlite 引擎")
+        base_path = os.path.splitext(snapshot_path)[0]
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or base_path + '.journal'
+        self.lock_path = base_path + '.lock'
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self.shared = shared
+        self._journal = None
+        self._journal_records = 0
+        # 已应用到内存的日志位置：(日志文件 inode, 字节偏移)
+        self._journal_inode = None
+        self._offset = 0
+        # load() 之后为下一个可分配的用户 ID
+        self.next_user_id = 1
+        self._last_fsync = time.monotonic()
+        self._lock = threading.RLock()
+        self._lock_file = None
+
+    # ---------- 锁 ----------
+    @contextmanager
+    def exclusive(self):
+        """持有本进程的写锁；shared 模式下同时持有跨进程的文件锁"""
+        with self._lock:
+            if not self.shared:
+                yield
+                return
+            if self._lock_file is None:
+                self._lock_file = open(self.lock_path, 'a')
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # ---------- 读取 ----------
+    def _read_snapshot(self):
+        """读取快照，返回 (用户列表, next_user_id)；兼容旧版纯列表格式的 users.json"""
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return [], 1
+        except Exception as e:
+            logger.error("读取用户快照失败: %s", e)
+            return [], 1
+        if isinstance(snapshot, list):
+            return snapshot, 1
+        return snapshot['users'], snapshot.get('next_user_id', 1)
+
+    def _replay_journal(self, apply):
+        """从已应用的位置开始重放日志，每条记录交给 apply 处理，返回重放的条数"""
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            self._journal_inode, self._offset = None, 0
+            return 0
+        count = 0
+        with f:
+            self._journal_inode = os.fstat(f.fileno()).st_ino
+            f.seek(self._offset)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程崩溃时可能留下写了一半的最后一行，丢弃它
+                    logger.warning("用户日志在偏移 %d 处损坏，丢弃之后的内容", self._offset)
+                    break
+                if record['op'] == 'alloc':
+                    self.next_user_id = max(self.next_user_id, record['next_user_id'])
+                elif record['op'] != 'delete':
+                    self.next_user_id = max(self.next_user_id, record['user']['user_id'] + 1)
+                apply(record)
+                self._offset += len(line)
+                count += 1
+            end = f.seek(0, os.SEEK_END)
+        if self._offset != end:
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(self._offset)
+        return count
+
+    def load(self):
+        """读取快照并重放日志，返回全部用户，同时恢复 next_user_id"""
+        snapshot_users, next_user_id = self._read_snapshot()
+        self.next_user_id = max(next_user_id, max((user['user_id'] for user in snapshot_users), default=0) + 1)
+        # 日志为空时（刚压缩或批量导入后）直接返回快照里的列表，不再逐个建字典
+        users = None
+
+        def apply(record):
+            nonlocal users
+            if users is None:
+                users = {user['user_id']: user for user in snapshot_users}
+            if record['op'] == 'delete':
+                users.pop(record['user_id'], None)
+            elif record['op'] != 'alloc':
+                users[record['user']['user_id']] = record['user']
+
+        self._close_journal()
+        self._offset = 0
+        self._journal_records = self._replay_journal(apply)
+        return snapshot_users if users is None else list(users.values())
+
+    def is_stale(self):
+        """日志是否被其他进程追加或替换过（一次 stat 调用）"""
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return self._journal_inode is not None
+        return st.st_ino != self._journal_inode or st.st_size != self._offset
+
+    def catch_up(self, apply):
+        """重放其他进程追加的日志；日志已被压缩替换时返回 False，调用方需要重新 load()"""
+        try:
+            inode = os.stat(self.journal_path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if inode != self._journal_inode:
+            return False
+        self._journal_records += self._replay_journal(apply)
+        return True
+
+    # ---------- 写入 ----------
+    def _open_journal(self):
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'ab')
+            self._journal_inode = os.fstat(self._journal.fileno()).st_ino
+        return self._journal
+
+    def _close_journal(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def _sync(self, f, force=False):
+        f.flush()
+        if self.fsync == 'always' or force:
+            os.fsync(f.fileno())
+        elif self.fsync == 'batch':
+            now = time.monotonic()
+            if now - self._last_fsync >= self.fsync_interval:
+                os.fsync(f.fileno())
+                self._last_fsync = now
+
+    def _append(self, record):
+        line = (json.dumps(record, separators=(',', ':'), default=encode_record) + '\n').encode('utf-8')
+        f = self._open_journal()
+        f.write(line)
+        self._sync(f)
+        self._offset += len(line)
+        self._journal_records += 1
+
+    def write(self, store, op, user):
+        """追加一条变更记录，必要时触发快照压缩"""
+        if op == 'delete':
+            record = {'op': op, 'user_id': user['user_id']}
+        else:
+            record = {'op': op, 'user': user}
+        try:
+            with self._lock:
+                self._append(record)
+                if self._journal_records >= self.compact_every:
+                    self._compact(store)
+            return True
+        except Exception as e:
+            logger.error("保存用户数据失败: %s", e)
+            return False
+
+    def write_alloc(self, next_user_id):
+        """记录分配器的位置，多进程共享时避免不同进程分配出相同的 ID"""
+        with self._lock:
+            self._append({'op': 'alloc', 'next_user_id': next_user_id})
+
+    def _replace_file(self, path, content):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+            f.flush()
+            if self.fsync != 'off':
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _compact(self, store):
+        """写入新快照（先写临时文件再原子替换），再用新的空日志替换旧日志
+
+        日志通过 rename 替换而不是原地截断，其他进程据 inode 变化得知需要重新加载。
+        """
+        self._write_snapshot(store.all(), store.peek_user_id())
+        self._open_journal()
+
+    def _write_snapshot(self, users, next_user_id):
+        snapshot = {'next_user_id': next_user_id, 'users': users}
+        self._replace_file(self.snapshot_path, json.dumps(snapshot, separators=(',', ':'), default=encode_record))
+        self._close_journal()
+        self._replace_file(self.journal_path, '')
+        self._offset = 0
+        self._journal_records = 0
+
+    def compact(self, store):
+        """立即把当前数据压缩成快照"""
+        with self.exclusive():
+            self._compact(store)
+
+    def write_snapshot(self, users, next_user_id):
+        """直接用给定的全部用户写出新快照并清空日志（批量导入数据时使用，不经过内存 store）"""
+        with self.exclusive():
+            self._write_snapshot(users, next_user_id)
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._sync(self._journal, force=self.fsync != 'off')
+            self._close_journal()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+
+class UserStore:
+    """常驻内存的用户存储，按 user_id / username / email 建立哈希索引
+
+    用户以紧凑的 UserRecord 保存（见 api/user_record.py），读写接口仍按 dict 字段访问；
+    所有查询与唯一性校验都是 O(1)；持久化交给 persistence 对象处理，
+    store 只负责在每次变更后通知它。
+
+    并发控制：
+    - 单进程：同一用户的变更按 user_id 分段加锁串行执行，索引的“检查 + 修改”
+      在一把短锁内完成，用户名 / 邮箱冲突时抛出 DuplicateUserError；
+    - 多进程共享（persistence.shared）：写操作持有文件锁，并先重放其他进程
+      写入的日志；读操作发现日志有变化时先追上再读。
+    """
+
+    def __init__(self, users=None, persistence=None, next_user_id=1):
+        self.persistence = persistence
+        self._shared = persistence is not None and persistence.shared
+        self._index_lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._id_lock = threading.Lock()
+        self._rebuild(users or [], next_user_id)
+
+    @classmethod
+    def load(cls, persistence):
+        """从持久化层加载全部用户并建立索引"""
+        with persistence.exclusive():
+            users = persistence.load()
+        return cls(users, persistence, persistence.next_user_id)
+
+    def __len__(self):
+        self._refresh()
+        return len(self._by_id)
+
+    def _rebuild(self, users, next_user_id):
+        users = [UserRecord.from_dict(user) for user in users]
+        by_id = {user.user_id: user for user in users}
+        by_username = {user.username: user for user in users}
+        # 邮箱索引的值是 user_id；历史数据中同一邮箱可能对应多个用户，此时才换成 set
+        by_email = {user.email: user.user_id for user in users}
+        if len(by_email) != len(by_id):
+            for user in users:
+                self._add_email(by_email, user.email, user.user_id)
+        self._by_id, self._by_username, self._by_email = by_id, by_username, by_email
+        # 有序的 user_id 分块列表，用于按游标分页
+        self._sorted_ids = SortedIds(sorted(by_id))
+        # 搜索用的有序索引：字段 -> SortedIndex，首次搜索时才建立
+        self._sorted_values = {}
+        # 用户 ID 单调递增，只增不减，已删除用户的 ID 不会再分配
+        self._next_user_id = max(next_user_id, max(by_id, default=0) + 1)
+
+    @staticmethod
+    def _add_email(by_email, email, user_id):
+        ids = by_email.setdefault(email, user_id)
+        if isinstance(ids, set):
+            ids.add(user_id)
+        elif ids != user_id:
+            by_email[email] = {ids, user_id}
+
+    def _index_email(self, user):
+        self._add_email(self._by_email, user.email, user.user_id)
+
+    def _unindex_email(self, user):
+        email, user_id = user.email, user.user_id
+        ids = self._by_email.get(email)
+        if ids == user_id:
+            del self._by_email[email]
+        elif isinstance(ids, set):
+            ids.discard(user_id)
+            if len(ids) == 1:
+                self._by_email[email] = ids.pop()
+
+    def _sorted_index(self, field):
+        """字段的有序索引，按 (字段值, user_id) 排序，不存在时建立（需持有 _index_lock）"""
+        index = self._sorted_values.get(field)
+        if index is None:
+            index = self._sorted_values[field] = SortedIndex(
+                sorted((getattr(user, field), user.user_id) for user in self._by_id.values()))
+        return index
+
+    def _sorted_positions(self, user, fields):
+        """各字段有序索引中 user 的插入位置 [(索引, 位置, 字段值)]；值无法比较时抛出 TypeError，此时不修改任何索引"""
+        pending = []
+        for field in fields:
+            index = self._sorted_values.get(field)
+            if index is not None:
+                value = getattr(user, field)
+                pending.append((index, index.position(value, user.user_id), value))
+        return pending
+
+    @staticmethod
+    def _index_sorted(user, pending):
+        for index, position, value in pending:
+            index.insert(position, value, user.user_id)
+
+    def _unindex_sorted(self, user, fields):
+        for field in fields:
+            index = self._sorted_values.get(field)
+            if index is not None:
+                index.remove(getattr(user, field), user.user_id)
+
+    def _index(self, user):
+        user_id = user.user_id
+        # 先算出所有有序索引的插入位置（只读，出错时直接抛出），再统一修改，不会留下只建了一半的索引
+        pending = self._sorted_positions(user, SEARCH_FIELDS)
+        self._by_id[user_id] = user
+        self._by_username[user.username] = user
+        self._index_email(user)
+        self._index_sorted(user, pending)
+        self._sorted_ids.add(user_id)
+
+    def _unindex(self, user):
+        user_id = user.user_id
+        del self._by_id[user_id]
+        self._by_username.pop(user.username, None)
+        self._unindex_email(user)
+        self._unindex_sorted(user, SEARCH_FIELDS)
+        self._sorted_ids.remove(user_id)
+
+    def _email_taken(self, email, user_id):
+        ids = self._by_email.get(email)
+        return ids is not None and ids != user_id
+
+    def _persist(self, op, user):
+        if self.persistence is not None:
+            self.persistence.write(self, op, user)
+
+    # ---------- 并发控制 ----------
+    def _apply_record(self, record):
+        """应用其他进程写入的一条日志记录"""
+        with self._index_lock:
+            if record['op'] == 'alloc':
+                self._next_user_id = max(self._next_user_id, record['next_user_id'])
+                return
+            user_id = record['user_id'] if record['op'] == 'delete' else record['user']['user_id']
+            old = self._by_id.get(user_id)
+            if old is not None:
+                self._unindex(old)
+            if record['op'] != 'delete':
+                self._index(UserRecord.from_dict(record['user']))
+                self._next_user_id = max(self._next_user_id, user_id + 1)
+
+    def _catch_up(self):
+        if not self.persistence.catch_up(self._apply_record):
+            users = self.persistence.load()
+            with self._index_lock:
+                self._rebuild(users, max(self._next_user_id, self.persistence.next_user_id))
+
+    def _refresh(self):
+        """多进程共享时，读之前追上其他进程的修改"""
+        if self._shared and self.persistence.is_stale():
+            with self.persistence.exclusive():
+                self._catch_up()
+
+    @contextmanager
+    def _writing(self, user_id):
+        if self._shared:
+            with self.persistence.exclusive():
+                self._catch_up()
+                yield
+        else:
+            with self._stripes[user_id % LOCK_STRIPES]:
+                yield
+
+    def compact(self):
+        """把当前数据压缩为持久化层的快照"""
+        if self.persistence is not None:
+            self.persistence.compact(self)
+
+    def close(self):
+        if self.persistence is not None:
+            self.persistence.close()
+
+    # ---------- 查询 ----------
+    def get(self, user_id):
+        self._refresh()
+        return self._by_id.get(user_id)
+
+    def get_by_username(self, username):
+        self._refresh()
+        return self._by_username.get(username)
+
+    def username_exists(self, username):
+        self._refresh()
+        return username in self._by_username
+
+    def email_exists(self, email):
+        self._refresh()
+        return email in self._by_email
+
+    def all(self):
+        return list(self._by_id.values())
+
+    def list_users(self, after_id=0, limit=50, role=None, status=None,
+                   create_time_from=None, create_time_to=None):
+        """按 user_id 游标分页列出用户，返回 (用户列表, 是否还有下一页)
+
+        沿有序 user_id 索引从 after_id 之后扫描，凑满 limit 条符合过滤条件的用户即停止，
+        不会物化全部用户。create_time 过滤条件为 'YYYY-MM-DD HH:MM:SS'（或其前缀，如日期），
+        含边界，格式不合法时抛出 ValueError。
+        """
+        time_from = parse_time(create_time_from) if create_time_from is not None else None
+        time_to = parse_time(create_time_to) if create_time_to is not None else None
+        self._refresh()
+        page = []
+        cursor = after_id
+        while len(page) <= limit:
+            with self._index_lock:
+                chunk = [self._by_id[user_id] for user_id in self._sorted_ids.after(cursor, SCAN_CHUNK)]
+            if not chunk:
+                break
+            for user in chunk:
+                if role is not None and user.role != role:
+                    continue
+                if status is not None and user.status != status:
+                    continue
+                if time_from is not None and user.create_ts < time_from:
+                    continue
+                if time_to is not None and user.create_ts > time_to:
+                    continue
+                page.append(user)
+                if len(page) > limit:
+                    break
+            cursor = chunk[-1].user_id
+        return page[:limit], len(page) > limit
+
+    def search(self, field, value, prefix=True, limit=50):
+        """按 email / phone 精确或前缀搜索，返回 (用户列表, 是否还有更多)
+
+        在有序索引上二分定位后顺序取出，O(log n + k)；结果按 (字段值, user_id) 排序。
+        """
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"不支持的搜索字段: {field}，可选值 {SEARCH_FIELDS}")
+        self._refresh()
+        with self._index_lock:
+            matched = []
+            for found, user_id in self._sorted_index(field).iter_from(value):
+                if len(matched) > limit or not (found.startswith(value) if prefix else found == value):
+                    break
+                matched.append(self._by_id[user_id])
+        return matched[:limit], len(matched) > limit
+
+    def peek_user_id(self):
+        """下一个将要分配的用户 ID（不占用）"""
+        return self._next_user_id
+
+    def allocate_user_id(self):
+        """原子地分配一个新的用户 ID，O(1)"""
+        if self._shared:
+            with self.persistence.exclusive():
+                self._catch_up()
+                with self._id_lock:
+                    user_id = self._next_user_id
+                    self._next_user_id += 1
+                self.persistence.write_alloc(self._next_user_id)
+            return user_id
+        with self._id_lock:
+            user_id = self._next_user_id
+            self._next_user_id += 1
+        return user_id
+
+    # ---------- 变更 ----------
+    def add(self, user):
+        """新增用户（dict），返回存入的 UserRecord；用户名或邮箱已被占用时抛出 DuplicateUserError"""
+        user = UserRecord.from_dict(user)
+        with self._writing(user.user_id):
+            with self._index_lock:
+                if user.username in self._by_username:
+                    raise DuplicateUserError('username')
+                if user.email in self._by_email:
+                    raise DuplicateUserError('email')
+                self._index(user)
+            self._persist('create', user)
+        return user
+
+    def update(self, user_id, changes):
+        """按字段更新用户，用户不存在时返回 None；新邮箱已被占用时抛出 DuplicateUserError"""
+        with self._writing(user_id):
+            with self._index_lock:
+                user = self._by_id.get(user_id)
+                if user is None:
+                    return None
+                new_email = changes.get('email')
+                email_changed = new_email is not None and new_email != user.email
+                if email_changed and self._email_taken(new_email, user_id):
+                    raise DuplicateUserError('email')
+                moved = [f for f in SEARCH_FIELDS if f in changes and changes[f] != getattr(user, f)]
+                # 修改索引前先在有序索引上定位一次新值，值无法比较时在这里抛出，用户和索引都保持原样
+                for field in moved:
+                    index = self._sorted_values.get(field)
+                    if index is not None:
+                        index.position(changes[field], user_id)
+                if email_changed:
+                    self._unindex_email(user)
+                self._unindex_sorted(user, moved)
+                user.update(changes)
+                if email_changed:
+                    self._index_email(user)
+                self._index_sorted(user, self._sorted_positions(user, moved))
+            self._persist('update', user)
+        return user
+
+    def delete(self, user_id):
+        """删除用户，返回被删除的用户，不存在时返回 None"""
+        with self._writing(user_id):
+            with self._index_lock:
+                user = self._by_id.get(user_id)
+                if user is None:
+                    return None
+                self._unindex(user)
+            self._persist('delete', user)
+        return user
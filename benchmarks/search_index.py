@@ -0,0 +1,65 @@
+"""对比搜索索引的单次写入耗时：单个有序大列表（list.insert / del）vs 分块的 SortedIndex
+
+用法：python benchmarks/search_index.py [索引条目数，默认 1000000] [写入次数，默认 20000]
+
+先建立 count 个 (手机号, user_id) 条目的索引，再随机插入、删除各 writes 次，
+输出每次写入的平均耗时（微秒）。两种结构都在同一把锁下执行，耗时即写入者持锁的时间。
+"""
+import os
+import random
+import sys
+import time
+from bisect import bisect_left, bisect_right
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.user_store import SortedIndex
+
+
+class FlatIndex:
+    """改造前的结构：两个平行的有序大列表"""
+
+    def __init__(self, pairs):
+        self.values = [value for value, _ in pairs]
+        self.ids = [uid for _, uid in pairs]
+
+    def _position(self, value, user_id):
+        lo = bisect_left(self.values, value)
+        hi = bisect_right(self.values, value, lo)
+        return bisect_left(self.ids, user_id, lo, hi)
+
+    def add(self, value, user_id):
+        i = self._position(value, user_id)
+        self.values.insert(i, value)
+        self.ids.insert(i, user_id)
+
+    def remove(self, value, user_id):
+        i = self._position(value, user_id)
+        del self.values[i]
+        del self.ids[i]
+
+
+def phone(rng):
+    return f'1{rng.randrange(3, 10)}{rng.randrange(10 ** 9):09d}'
+
+
+def main(count, writes):
+    rng = random.Random(0)
+    pairs = sorted((phone(rng), uid) for uid in range(count))
+    new_pairs = [(phone(rng), count + i) for i in range(writes)]
+    print(f'索引条目数: {count}，插入 / 删除各 {writes} 次')
+    for name, cls in (('有序大列表', FlatIndex), ('SortedIndex', SortedIndex)):
+        index = cls(pairs)
+        start = time.perf_counter()
+        for pair in new_pairs:
+            index.add(*pair)
+        inserted = time.perf_counter() - start
+        start = time.perf_counter()
+        for pair in new_pairs:
+            index.remove(*pair)
+        removed = time.perf_counter() - start
+        print(f'{name:<12} 插入 {inserted / writes * 1e6:8.2f} µs/次   删除 {removed / writes * 1e6:8.2f} µs/次')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
@@ -0,0 +1,50 @@
+"""对比每个用户常驻内存的字节数：dict 记录 vs UserRecord
+
+用法：python benchmarks/user_memory.py [用户数，默认 100000]
+
+数据先用 api.seed 生成并序列化成快照 JSON，再分别按两种方式从 JSON 加载，
+用 tracemalloc 统计加载结果（包括字符串、整数等全部对象）净占用的内存。
+"""
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.seed import generate_users
+from api.user_record import UserRecord
+from api.user_store import UserStore
+
+
+def measure(build):
+    """返回 build() 的结果存活期间新增的内存字节数"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return result, used
+
+
+def main(count):
+    random.seed(0)
+    text = json.dumps(list(generate_users(count)))
+
+    rows = [
+        ('dict 记录', lambda: json.loads(text)),
+        ('UserRecord 记录', lambda: [UserRecord.from_dict(u) for u in json.loads(text)]),
+        ('UserStore（记录 + 索引）', lambda: UserStore(json.loads(text))),
+    ]
+    print(f'用户数: {count}')
+    for name, build in rows:
+        result, used = measure(build)
+        print(f'{name:<24} {used / count:8.1f} 字节/用户')
+        del result
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -1,56 +1,266 @@
+import hashlib
+import itertools
+import os
 import random
 import string
+import threading
+
+try:  # 可选依赖：装了 NumPy 时未播种的批量采样走向量化路径，否则用标准库（一次 random.choices 采样整批）
+    import numpy as np
+except ImportError:
+    np = None
+
+LETTERS = string.ascii_letters
+DIGITS = string.digits
+ALNUM = string.ascii_letters + string.digits
+BASE36 = string.digits + string.ascii_lowercase
+
+PHONE_PREFIXES = [
+    '130', '131', '132', '133', '134', '135', '136', '137', '138', '139',
+    '145', '147', '149',
+    '150', '151', '152', '153', '155', '156', '157', '158', '159',
+    '166',
+    '170', '171', '172', '173', '175', '176', '177', '178',
+    '180', '181', '182', '183', '184', '185', '186', '187', '188', '189',
+    '191', '198', '199'
+]
+EMAIL_DOMAINS = ["@genomic.cn", "@qq.com", "@168.com", "@ecom.com"]
+
+# 唯一键 = 本次运行的标签（5 位）+ 序号（6 位 base36），用户名、邮箱都以它开头，构造上保证不重复
+TAG_LENGTH = 5
+SEQ_WIDTH = 6
+# 小于该元素数的采样直接用标准库，省去 NumPy 数组的固定开销
+NUMPY_MIN_SIZE = 256
+
+
+def _base36(n, width):
+    digits = []
+    while n:
+        n, r = divmod(n, 36)
+        digits.append(BASE36[r])
+    return ''.join(reversed(digits)).rjust(width, '0')
+
+
+class _KeySpace:
+    """进程内的唯一键分配：同一进程内的所有批次共用一个序号；fork 出的子进程换一个新标签"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def reset(self, rng=None):
+        rng = rng or random.SystemRandom()
+        self.tag = rng.choice(string.ascii_lowercase) + ''.join(rng.choices(BASE36, k=TAG_LENGTH - 1))
+        self._counter = itertools.count()
+        self._pid = os.getpid()
+
+    def reserve(self, n):
+        with self._lock:
+            if self._pid != os.getpid():
+                self.reset()
+            start = next(self._counter)
+            if n > 1:
+                # 跳过本批剩余的序号
+                self._counter = itertools.count(start + n)
+            if start + n > 36 ** SEQ_WIDTH:
+                raise OverflowError('本次运行生成的用户数超出唯一键空间')
+            return [self.tag + _base36(start + i, SEQ_WIDTH) for i in range(n)]
+
+
+_keys = _KeySpace()
+
+# NumPy 采样用的独立 Generator（不使用全局 np.random），按进程创建；调用 seed(值) 后为 None
+_numpy = {'pid': None, 'rng': None, 'seeded': False}
+
+
+def seed(value=None):
+    """给批量生成播种（random 以及唯一键的运行标签），相同种子生成相同的数据；None 时重新随机
+
+    播种后只走标准库采样，生成结果与是否安装 NumPy 无关；seed() / seed(None) 恢复 NumPy 向量化采样。
+    """
+    random.seed(value)
+    _numpy.update(pid=None, rng=None, seeded=value is not None)
+    with _keys._lock:
+        _keys.reset(None if value is None else random.Random(value))
+
+
+def _numpy_rng(size):
+    """本次采样使用的 NumPy Generator；未安装 NumPy、已播种或数据量太小时返回 None（走标准库）"""
+    if np is None or _numpy['seeded'] or size < NUMPY_MIN_SIZE:
+        return None
+    if _numpy['pid'] != os.getpid():
+        # fork 出的子进程重新创建，避免与父进程生成相同的随机序列
+        _numpy.update(pid=os.getpid(), rng=np.random.default_rng())
+    return _numpy['rng']
+
+
+def _strings(alphabet, n, width):
+    """n 个长度为 width、字符从 alphabet 中均匀抽取的字符串（整批一次采样）"""
+    total = n * width
+    rng = _numpy_rng(total)
+    if rng is not None:
+        table = np.frombuffer(alphabet.encode('ascii'), dtype=np.uint8)
+        data = table[rng.integers(0, len(alphabet), size=total)].tobytes().decode('ascii')
+    else:
+        data = ''.join(random.choices(alphabet, k=total))
+    return [data[i:i + width] for i in range(0, total, width)]
+
+
+def _integers(low, high, n):
+    """n 个 [low, high) 内均匀分布的整数"""
+    rng = _numpy_rng(n)
+    if rng is not None:
+        return rng.integers(low, high, size=n).tolist()
+    return random.choices(range(low, high), k=n)
+
+
+def _password(body, length, letter, digit, offset):
+    """取 body 的前 length 个字符，按 offset 在两个不同位置分别放入字母和数字"""
+    letter_pos = offset % length
+    digit_pos = (letter_pos + 1 + offset // length % (length - 1)) % length
+    chars = list(body[:length])
+    chars[letter_pos] = letter
+    chars[digit_pos] = digit
+    return ''.join(chars)
+
 
 class Generate:
     @staticmethod
     def generate_username() -> str:
-        length = random.randint(4,20)
-        chars = string.ascii_letters + string.digits  #包含所有Ascll字母，包含所有数字.
-        random.choices(chars,k=length)
-        user_name ="".join(random.choices(chars,k=length))
-        return user_name
+        return Generate.generate_usernames(1)[0]
+
+    @staticmethod
+    def generate_short_username(min_length: int = 4, max_length: int = 10) -> str:
+        """长度 min_length-max_length 的随机用户名（覆盖 11 位以下的短用户名），不保证唯一"""
+        length = random.randint(min_length, max_length)
+        return random.choice(LETTERS) + ''.join(random.choices(ALNUM, k=length - 1))
 
     @staticmethod
     def generate_password() -> str:
-        letters = string.ascii_letters
-        digits = string.digits
-        length = random.randint(8, 20)
-        char1 = random.choice(letters)
-        char2 = random.choice(digits)
-        remaining_length = length - 2
-        remaining_chars = letters + digits
-        password_list = [char1, char2] + random.choices(remaining_chars, k=remaining_length)
-        random.shuffle(password_list)
-        return "".join(password_list)
+        return Generate.generate_passwords(1)[0]
 
     @staticmethod
     def generate_email() -> str:
-        length = random.randint(5,10)
-        chars = string.digits
-        username = "".join(random.choices(chars,k=length))
-        domain = random.choice(["@genomic.cn","@qq.com","@168.com","@ecom.com"])
-        return f"{username}{domain}"
+        return Generate.generate_emails(1)[0]
 
     @staticmethod
     def generate_phone() -> str:
-        prefixes = [
-            '130', '131', '132', '133', '134', '135', '136', '137', '138', '139',
-            '145', '147', '149',
-            '150', '151', '152', '153', '155', '156', '157', '158', '159',
-            '166',
-            '170', '171', '172', '173', '175', '176', '177', '178',
-            '180', '181', '182', '183', '184', '185', '186', '187', '188', '189',
-            '191', '198', '199'
-        ]
+        return Generate.generate_phones(1)[0]
+
+    # ---------- 批量生成 ----------
+    @staticmethod
+    def generate_usernames(n: int) -> list:
+        """n 个用户名：唯一键（11 位）+ 0-9 位随机字母数字，长度 11-20，本次运行内不重复
+
+        短用户名（4-10 位）放不下唯一键，需要时用 generate_short_username()
+        """
+        keys = _keys.reserve(n)
+        lengths = _integers(0, 20 - TAG_LENGTH - SEQ_WIDTH + 1, n)
+        suffixes = _strings(ALNUM, n, 20 - TAG_LENGTH - SEQ_WIDTH)
+        return [key + suffix[:length] for key, suffix, length in zip(keys, suffixes, lengths)]
+
+    @staticmethod
+    def generate_passwords(n: int) -> list:
+        """n 个密码：长度 8-20，只含字母数字，且至少各有一个字母和数字"""
+        lengths = _integers(8, 21, n)
+        bodies = _strings(ALNUM, n, 20)
+        letters = _strings(LETTERS, n, 1)
+        digits = _strings(DIGITS, n, 1)
+        offsets = _integers(0, 20 * 19, n)
+        return [_password(*args) for args in zip(bodies, lengths, letters, digits, offsets)]
+
+    @staticmethod
+    def generate_emails(n: int) -> list:
+        """n 个邮箱：唯一键 + 0-4 位随机数字 @ 随机域名，本次运行内不重复"""
+        keys = _keys.reserve(n)
+        lengths = _integers(0, 5, n)
+        suffixes = _strings(DIGITS, n, 4)
+        domains = _integers(0, len(EMAIL_DOMAINS), n)
+        return [f"{key}{suffix[:length]}{EMAIL_DOMAINS[domain]}"
+                for key, suffix, length, domain in zip(keys, suffixes, lengths, domains)]
+
+    @staticmethod
+    def generate_phones(n: int) -> list:
+        """n 个手机号：号段前缀 + 8 位随机数字（手机号不要求唯一）"""
+        prefixes = _integers(0, len(PHONE_PREFIXES), n)
+        suffixes = _strings(DIGITS, n, 8)
+        return [PHONE_PREFIXES[prefix] + suffix for prefix, suffix in zip(prefixes, suffixes)]
+
+    @staticmethod
+    def generate_users(n: int) -> list:
+        """n 条注册参数 {'username', 'password', 'email', 'phone'}"""
+        return [{"username": username, "password": password, "email": email, "phone": phone}
+                for username, password, email, phone in zip(Generate.generate_usernames(n),
+                                                            Generate.generate_passwords(n),
+                                                            Generate.generate_emails(n),
+                                                            Generate.generate_phones(n))]
+
+
+class DataStream:
+    """由运行种子和 worker 编号确定的用户数据流，不使用全局 random
 
-        chars = string.digits
-        suffix = "".join(random.choice(chars) for _ in range(8))
-        prefix = random.choice(prefixes)
-        return f"{prefix}{suffix}"
+    - 第 k 条记录只由 (seed, worker, k) 决定，record(k) 直接重新生成，不需要先生成前面的记录；
+    - 用户名、邮箱以 种子标签（5 位）+ worker（3 位 base36）+ 序号（6 位 base36）开头，
+      同一种子下不同 worker 的键空间互不相交，多进程、多机器并行时只需给每个 worker 分配不同的编号；
+    - next() 按顺序取下一条，可在多个线程间共用。
+    """
+    WORKER_WIDTH = 3
+    SEQ_WIDTH = 6
 
+    def __init__(self, seed, worker=0, start=0):
+        if not 0 <= worker < 36 ** self.WORKER_WIDTH:
+            raise ValueError(f'worker 编号超出范围 [0, {36 ** self.WORKER_WIDTH})')
+        self.seed = seed
+        self.worker = worker
+        digest = hashlib.blake2b(f'{seed}'.encode('utf-8'), digest_size=8).digest()
+        n = int.from_bytes(digest, 'big')
+        tag = string.ascii_lowercase[n % 26]
+        n //= 26
+        for _ in range(TAG_LENGTH - 1):
+            n, r = divmod(n, 36)
+            tag += BASE36[r]
+        self.prefix = tag + _base36(worker, self.WORKER_WIDTH)
+        self._counter = itertools.count(start)
 
+    def key(self, k):
+        if not 0 <= k < 36 ** self.SEQ_WIDTH:
+            raise IndexError(f'序号超出范围 [0, {36 ** self.SEQ_WIDTH})')
+        return self.prefix + _base36(k, self.SEQ_WIDTH)
 
+    def position(self, value):
+        """用户名或邮箱属于本数据流时返回它的序号 k，否则返回 None（复现失败用例时由用户名反查记录）"""
+        width = len(self.prefix) + self.SEQ_WIDTH
+        if not value.startswith(self.prefix) or len(value) < width:
+            return None
+        try:
+            return int(value[len(self.prefix):width], 36)
+        except ValueError:
+            return None
 
+    def record(self, k):
+        """第 k 条记录 {'username', 'password', 'email', 'phone'}"""
+        key = self.key(k)
+        digest = hashlib.blake2b(f'{self.seed}|{self.worker}|{k}'.encode('utf-8'), digest_size=16).digest()
+        rng = random.Random(int.from_bytes(digest, 'big'))
+        username_suffix = ''.join(rng.choices(ALNUM, k=rng.randrange(21 - len(key))))
+        password = _password(''.join(rng.choices(ALNUM, k=20)), rng.randrange(8, 21),
+                             rng.choice(LETTERS), rng.choice(DIGITS), rng.randrange(20 * 19))
+        email_suffix = ''.join(rng.choices(DIGITS, k=rng.randrange(5)))
+        return {
+            "username": key + username_suffix,
+            "password": password,
+            "email": key + email_suffix + rng.choice(EMAIL_DOMAINS),
+            "phone": rng.choice(PHONE_PREFIXES) + ''.join(rng.choices(DIGITS, k=8)),
+        }
 
+    def records(self, start=0, count=None):
+        """从第 start 条开始按顺序产出 count 条（None 表示不限）"""
+        for k in itertools.islice(itertools.count(start), count):
+            yield self.record(k)
 
+    def next(self):
+        """按顺序取下一条记录（线程安全）"""
+        return self.record(next(self._counter))
 
+    def __iter__(self):
+        return self.records()
@@ -0,0 +1,91 @@
+class Histogram:
+    """对数分桶的耗时直方图，用于统计 p50 / p95 / p99
+
+    - 记录单位为秒，内部按微秒取整后分桶：小于 2^SUB_BITS 微秒的值每微秒一个桶，
+      更大的值保留最高 SUB_BITS 位，相对误差不超过 1 / 2^(SUB_BITS - 1)（约 3%）；
+    - 桶是稀疏的 dict（桶下界 -> 次数），只有出现过的区间占用内存；
+    - 不加锁：每个线程 / 进程各自记录，需要汇总时用 merge() 合并。
+    """
+
+    SUB_BITS = 6
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    @classmethod
+    def _bucket(cls, micros):
+        shift = micros.bit_length() - cls.SUB_BITS
+        if shift <= 0:
+            return micros
+        return micros >> shift << shift
+
+    @classmethod
+    def _width(cls, bucket):
+        shift = bucket.bit_length() - cls.SUB_BITS
+        return 1 << shift if shift > 0 else 1
+
+    def record(self, seconds):
+        bucket = self._bucket(int(seconds * 1e6))
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        """把另一个直方图的数据累加进来，返回 self"""
+        for bucket, n in dict(other.counts).items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    def percentile(self, q):
+        """第 q 百分位（0-100）的耗时（秒），取所在桶的中点；没有数据时返回 0.0"""
+        if not self.count:
+            return 0.0
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                value = (bucket + self._width(bucket) / 2) / 1e6
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self, quantiles=(50, 95, 99)):
+        """常用统计值，单位秒"""
+        result = {'count': self.count, 'mean': self.mean(), 'min': self.min or 0.0, 'max': self.max or 0.0}
+        for q in quantiles:
+            result[f'p{q}'] = self.percentile(q)
+        return result
+
+    def to_dict(self):
+        """转换为可 JSON 序列化的结构，跨进程汇总时使用"""
+        return {'counts': {str(k): v for k, v in self.counts.items()}, 'count': self.count,
+                'total': self.total, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls()
+        hist.counts = {int(k): v for k, v in data['counts'].items()}
+        hist.count = data['count']
+        hist.total = data['total']
+        hist.min = data['min']
+        hist.max = data['max']
+        return hist
@@ -2,6 +2,8 @@ from common.generate_parameter import Generate
 
 
 class Parameter:
+    # 设置为 DataStream 时 register_parameters 按顺序从中取注册参数（可复现，各 worker 互不冲突），见 tests/conftest.py
+    stream = None
 
     @staticmethod
     def register_parameter():
@@ -15,6 +17,8 @@ class Parameter:
 
     @staticmethod
     def register_parameters():
+        if Parameter.stream is not None:
+            return Parameter.stream.next()
         register_json = {
             "username": Generate.generate_username(),
             "password": Generate.generate_password(),
@@ -0,0 +1,207 @@
+"""回放 TrafficRecorder 录制的请求轨迹
+
+- 逐行读取轨迹文件，按记录的相对时间发出请求：speed=1 原速，speed=N 加速 N 倍，speed=0 不等待尽快发送；
+- 同一用户名的注册、登录以及同一身份的请求各自进入同一条通道（单线程顺序执行），保证先后顺序；
+- 录制时的身份（u1、u2…）和 user_id 在回放时换成回放过程中登录 / 注册得到的 token 和 user_id；
+  依赖的值还没返回时等待（至多 wait_timeout 秒），始终没有对应值的请求原样发送并计入 unmapped；
+- 每个请求的耗时从计划发送时间算起（开环），状态码与录制时不一致的 4xx/5xx 计为失败。
+
+回放目标最好是全新的服务：轨迹中的注册请求使用录制时的用户名，已存在时会注册失败。
+
+用法：python -m loadtest.replay trace.jsonl.gz --speed 2 --base-url http://127.0.0.1:3001
+"""
+import argparse
+import itertools
+import queue
+import sys
+import threading
+import time
+import zlib
+
+from api.traffic import read_trace, response_outputs
+from loadtest.report import format_report, injection_delta, scrape_injections
+from loadtest.runner import LoadStats, make_client
+from utils.loader import YamlLoader
+
+
+class Replayer:
+    def __init__(self, api, speed=1.0, lanes=32, wait_timeout=10.0):
+        self.api = api
+        self.speed = speed
+        self.lanes = lanes
+        self.wait_timeout = wait_timeout
+        self.stats = LoadStats()
+        self.unmapped = {'identity': 0, 'user_id': 0}
+        self._mapped = {'identity': {}, 'user_id': {}}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._round_robin = itertools.count()
+
+    # ---------- 录制值 -> 回放值 ----------
+    def _expect(self, outputs):
+        """派发会产生新身份 / user_id 的请求前登记，后续依赖这些值的请求会等待它返回"""
+        for kind, key in _output_keys(outputs):
+            with self._lock:
+                if key not in self._mapped[kind]:
+                    self._pending.setdefault((kind, key), threading.Event())
+
+    def _learn(self, outputs, replayed):
+        """把录制时的输出与回放时响应中的对应值配对，并唤醒等待的请求"""
+        for (kind, key), value in _pair(outputs, replayed):
+            if value is not None:
+                self._mapped[kind][key] = value
+        for kind, key in _output_keys(outputs):
+            with self._lock:
+                event = self._pending.pop((kind, key), None)
+            if event is not None:
+                event.set()
+
+    def _resolve(self, kind, key):
+        value = self._mapped[kind].get(key)
+        if value is None:
+            event = self._pending.get((kind, key))
+            if event is not None:
+                event.wait(self.wait_timeout)
+            value = self._mapped[kind].get(key)
+        if value is None:
+            with self._lock:
+                self.unmapped[kind] += 1
+        return value
+
+    def _user_id(self, user_id):
+        if not isinstance(user_id, int):
+            return user_id
+        mapped = self._resolve('user_id', user_id)
+        return user_id if mapped is None else mapped
+
+    # ---------- 发送 ----------
+    def _send(self, record, scheduled):
+        headers = None
+        if 'i' in record:
+            token = self._resolve('identity', record['i'])
+            if token is not None:
+                headers = {'Authorization': f'Bearer {token}'}
+        path_params = {key: self._user_id(value) if key == 'user_id' else value
+                       for key, value in record.get('p', {}).items()}
+        body = record.get('b')
+        if isinstance(body, dict) and isinstance(body.get('user_ids'), list):
+            body = dict(body, user_ids=[self._user_id(user_id) for user_id in body['user_ids']])
+
+        key = f"{record['m']} {record['e']}"
+        replayed = None
+        try:
+            resp = self.api.request(record['m'], record['e'], path_params or None, params=record.get('q'),
+                                    json=body, headers=headers)
+        except Exception as e:
+            self.stats.observe(key, time.perf_counter() - scheduled, type(e).__name__)
+        else:
+            recorded = record.get('s')
+            error = resp.status_code if resp.status_code >= 400 and resp.status_code != recorded else None
+            self.stats.observe(key, time.perf_counter() - scheduled, error)
+            if 'o' in record:
+                try:
+                    replayed = response_outputs(resp.json().get('data'))
+                except ValueError:
+                    replayed = None
+        finally:
+            if 'o' in record:
+                self._learn(record['o'], replayed)
+
+    def _lane(self, record):
+        """注册、登录按用户名分通道（先注册后登录），其余请求按发送者身份分通道"""
+        body = record.get('b')
+        actor = body.get('username') if isinstance(body, dict) else None
+        actor = actor or record.get('i')
+        if actor is None:
+            return next(self._round_robin) % self.lanes
+        return zlib.crc32(actor.encode()) % self.lanes
+
+    def _worker(self, lane):
+        while True:
+            item = lane.get()
+            if item is None:
+                return
+            self._send(*item)
+
+    def run(self, records):
+        """回放记录迭代器，返回实际耗时（秒）"""
+        lanes = [queue.Queue(maxsize=1000) for _ in range(self.lanes)]
+        threads = [threading.Thread(target=self._worker, args=(lane,), daemon=True) for lane in lanes]
+        for thread in threads:
+            thread.start()
+        start = time.perf_counter()
+        for record in records:
+            if self.speed:
+                scheduled = start + record['t'] / self.speed
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled = time.perf_counter()
+            self._expect(record.get('o'))
+            lanes[self._lane(record)].put((record, scheduled))
+        for lane in lanes:
+            lane.put(None)
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+
+def _output_keys(outputs):
+    if not outputs:
+        return
+    for item in outputs.get('items', ()):
+        yield from _output_keys(item)
+    if 'identity' in outputs:
+        yield 'identity', outputs['identity']
+    if 'user_id' in outputs:
+        yield 'user_id', outputs['user_id']
+
+
+def _pair(recorded, replayed):
+    """[((类型, 录制值), 回放值)]，回放响应缺少对应值时为 None"""
+    if not recorded:
+        return
+    replayed = replayed or {}
+    replayed_items = replayed.get('items', [])
+    for i, item in enumerate(recorded.get('items', ())):
+        yield from _pair(item, replayed_items[i] if i < len(replayed_items) else None)
+    if 'identity' in recorded:
+        yield ('identity', recorded['identity']), replayed.get('token')
+    if 'user_id' in recorded:
+        yield ('user_id', recorded['user_id']), replayed.get('user_id')
+
+
+def replay(path, base_url=None, speed=1.0, lanes=32, wait_timeout=10.0):
+    """回放轨迹文件，返回与 runner.run() 结构相同的结果（可用 format_report 输出）"""
+    header, records = read_trace(path)
+    options = {'mode': 'replay', 'trace': path, 'speed': speed, 'processes': 1, 'base_url': base_url}
+    api = make_client(options, lanes)
+    api.etag_cache = None  # 逐条按录制的请求发送，不额外附带条件请求头
+    api.traffic = None
+    base_url = api.base_url
+    before = scrape_injections(base_url)
+    replayer = Replayer(api, speed, lanes, wait_timeout)
+    elapsed = replayer.run(records)
+    after = scrape_injections(base_url)
+    return dict(replayer.stats.to_dict(), options=options, elapsed=elapsed,
+                injections=injection_delta(before, after), unmapped=dict(replayer.unmapped),
+                recorded_base_url=header.get('base_url'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='回放录制的请求轨迹')
+    parser.add_argument('trace', help='TrafficRecorder 写出的轨迹文件（.jsonl 或 .jsonl.gz）')
+    parser.add_argument('--base-url', default=None, help='回放目标，默认使用 config.yaml 中的 base_url')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放倍速，1 为原速')
+    parser.add_argument('--asap', action='store_true', help='忽略录制的时间间隔，尽快发送')
+    parser.add_argument('--lanes', type=int, default=32, help='并发通道数（同一身份的请求在同一通道内顺序执行）')
+    args = parser.parse_args(argv)
+    result = replay(args.trace, args.base_url or YamlLoader.get_config().get('base_url'),
+                    0 if args.asap else args.speed, args.lanes)
+    print(format_report(result))
+    return 0 if not result['errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
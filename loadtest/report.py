@@ -0,0 +1,85 @@
+"""压测结果报告：按接口 / 场景的吞吐与分位数，以及压测期间服务端的故障注入次数"""
+import re
+
+import requests
+
+from common.histogram import Histogram
+
+_INJECTED = re.compile(r'^mock_server_injected_events_total\{route="([^"]*)",kind="([^"]*)"\} (\d+)$')
+
+
+def scrape_injections(base_url):
+    """读取 /metrics 中的故障注入计数 {(路由, 类型): 次数}；服务端不支持或不可达时返回 {}
+
+    prod 多 worker 模式下 /metrics 只包含处理该请求的 worker 的计数，结果仅供参考。
+    """
+    try:
+        resp = requests.get(f'{base_url}/metrics', timeout=5)
+    except requests.RequestException:
+        return {}
+    if resp.status_code != 200:
+        return {}
+    counts = {}
+    for line in resp.text.splitlines():
+        match = _INJECTED.match(line)
+        if match:
+            counts[(match.group(1), match.group(2))] = int(match.group(3))
+    return counts
+
+
+def injection_delta(before, after):
+    """压测期间新增的注入次数，返回 [{'route', 'kind', 'count'}]"""
+    delta = []
+    for (route, kind), n in sorted(after.items()):
+        n -= before.get((route, kind), 0)
+        if n > 0:
+            delta.append({'route': route, 'kind': kind, 'count': n})
+    return delta
+
+
+def _ms(seconds):
+    return f'{seconds * 1000:>9.2f}'
+
+
+def format_report(result):
+    """run() / replay() 结果的文本报告，耗时单位毫秒"""
+    options, elapsed = result['options'], result['elapsed']
+    endpoints = {key: Histogram.from_dict(hist) for key, hist in result['endpoints'].items()}
+    total = sum(hist.count for hist in endpoints.values())
+    errors = sum(n for item in result['errors'].values() for n in item.values())
+    if options['mode'] == 'closed':
+        load = f"{options['users']} 个虚拟用户"
+    elif options['mode'] == 'replay':
+        speed = f"{options['speed']:g} 倍速" if options['speed'] else '不限速'
+        load = f"回放 {options['trace']}，{speed}"
+    else:
+        load = f"目标 {options['rate']:g} 流程/秒"
+    lines = [
+        f"模式: {options['mode']}（{load}），进程数 {options['processes']}，实际时长 {elapsed:.1f}s",
+        f"请求数: {total}，吞吐: {total / elapsed if elapsed else 0:.1f} 请求/秒，"
+        f"失败: {errors}（{errors / total * 100 if total else 0:.2f}%）",
+        '',
+        f"{'ENDPOINT':<40}{'COUNT':>8}{'RPS':>9}{'ERRORS':>8}{'P50':>9}{'P95':>9}{'P99':>9}{'MAX':>9}",
+    ]
+    for key, hist in sorted(endpoints.items()):
+        n_errors = sum(result['errors'].get(key, {}).values())
+        lines.append(f"{key:<40}{hist.count:>8}{hist.count / elapsed if elapsed else 0:>9.1f}{n_errors:>8}"
+                     f"{_ms(hist.percentile(50))}{_ms(hist.percentile(95))}{_ms(hist.percentile(99))}{_ms(hist.max or 0)}")
+    for key, item in sorted(result['errors'].items()):
+        lines.append(f"  {key} 失败: " + ', '.join(f'{error}×{n}' for error, n in sorted(item.items())))
+
+    if result['scenarios']:
+        lines += ['', f"{'SCENARIO':<40}{'COUNT':>8}{'FAILED':>8}{'P50':>9}{'P95':>9}{'P99':>9}"]
+    for name, data in sorted(result['scenarios'].items()):
+        hist = Histogram.from_dict(data)
+        lines.append(f"{name:<40}{hist.count:>8}{result['failed'].get(name, 0):>8}"
+                     f"{_ms(hist.percentile(50))}{_ms(hist.percentile(95))}{_ms(hist.percentile(99))}")
+
+    if any(result.get('unmapped', {}).values()):
+        lines += ['', '回放时没有对应值、按录制值原样发送: '
+                  + ', '.join(f'{kind}×{n}' for kind, n in sorted(result['unmapped'].items()) if n)]
+    if result['injections']:
+        lines += ['', '压测期间服务端故障注入（/metrics）:']
+        for item in result['injections']:
+            lines.append(f"  {item['route']:<40}{item['kind']:<14}{item['count']:>8}")
+    return '\n'.join(lines)
@@ -0,0 +1,248 @@
+"""压测引擎：按权重混合场景，对 mock 服务（或任意兼容的后端）施压并输出分位数 / 吞吐报告
+
+两种施压方式：
+- closed（闭环）：固定数量的虚拟用户，每个用户跑完一个流程再开始下一个，压力随服务端变慢而下降；
+- open（开环）：按目标 RPS 以泊松过程安排流程的到达时间，不管服务端快慢都按时发出。流程第一步的耗时
+  从“计划到达时间”算起，排队等待的时间也计入，避免协调遗漏（coordinated omission）让尾部耗时偏低。
+
+多进程时每个进程独立施压、各自统计，结束后把直方图（Histogram.to_dict）传回主进程合并。
+
+用法：python -m loadtest.runner --mode open --rate 200 --duration 30 --processes 4 --mix session=6,signup=2
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import requests
+
+from api.timing import TimedHTTPAdapter
+from api.token_pool import TokenPool
+from api.user_management import UserManagementAPI
+from common.generate_parameter import DataStream
+from common.histogram import Histogram
+from loadtest import scenarios
+from loadtest.report import format_report, scrape_injections, injection_delta
+from loadtest.scenarios import SCENARIOS, StepFailed, parse_mix
+from utils.loader import YamlLoader
+
+
+class LoadStats:
+    """单个进程内的压测统计：按接口、按场景的耗时直方图和失败次数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}   # 接口 -> Histogram
+        self.errors = {}      # 接口 -> {状态码（连接异常时为异常类名）: 次数}
+        self.scenarios = {}   # 场景 -> Histogram（整个流程的耗时）
+        self.failed = {}      # 场景 -> 失败次数
+
+    def observe(self, key, seconds, error=None):
+        with self._lock:
+            self.endpoints.setdefault(key, Histogram()).record(seconds)
+            if error is not None:
+                errors = self.errors.setdefault(key, {})
+                errors[error] = errors.get(error, 0) + 1
+
+    def observe_scenario(self, name, seconds, ok):
+        with self._lock:
+            self.scenarios.setdefault(name, Histogram()).record(seconds)
+            if not ok:
+                self.failed[name] = self.failed.get(name, 0) + 1
+
+    def merge(self, other):
+        for target, source in ((self.endpoints, other.endpoints), (self.scenarios, other.scenarios)):
+            for key, hist in source.items():
+                target.setdefault(key, Histogram()).merge(hist)
+        for key, errors in other.errors.items():
+            target = self.errors.setdefault(key, {})
+            for error, n in errors.items():
+                target[error] = target.get(error, 0) + n
+        for name, n in other.failed.items():
+            self.failed[name] = self.failed.get(name, 0) + n
+        return self
+
+    def to_dict(self):
+        """可 JSON 序列化、可跨进程传递的结构"""
+        with self._lock:
+            return {
+                'endpoints': {key: hist.to_dict() for key, hist in self.endpoints.items()},
+                'errors': {key: {str(error): n for error, n in errors.items()} for key, errors in self.errors.items()},
+                'scenarios': {name: hist.to_dict() for name, hist in self.scenarios.items()},
+                'failed': dict(self.failed),
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.endpoints = {key: Histogram.from_dict(hist) for key, hist in data['endpoints'].items()}
+        stats.errors = {key: dict(errors) for key, errors in data['errors'].items()}
+        stats.scenarios = {name: Histogram.from_dict(hist) for name, hist in data['scenarios'].items()}
+        stats.failed = dict(data['failed'])
+        return stats
+
+
+def run_flow(api, stats, name, scheduled):
+    """执行一个场景流程；scheduled 为计划开始时间（perf_counter），第一步的耗时从它算起"""
+    pending = {'start': scheduled}
+
+    def step(key, call):
+        start = pending.pop('start', None) or time.perf_counter()
+        try:
+            resp = call()
+        except requests.RequestException as e:
+            stats.observe(key, time.perf_counter() - start, type(e).__name__)
+            raise StepFailed(key) from e
+        elapsed = time.perf_counter() - start
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {}
+        if resp.status_code != 200 or body.get('code') != 200:
+            stats.observe(key, elapsed, resp.status_code if resp.status_code != 200 else body.get('code'))
+            raise StepFailed(key)
+        stats.observe(key, elapsed)
+        return body.get('data')
+
+    try:
+        SCENARIOS[name](api, step)
+    except StepFailed:
+        stats.observe_scenario(name, time.perf_counter() - scheduled, False)
+    else:
+        stats.observe_scenario(name, time.perf_counter() - scheduled, True)
+
+
+def make_client(options, concurrency):
+    """压测用的客户端：关闭重试、对冲和逐条耗时记录，连接池大小与并发数一致；令牌池只放在内存中"""
+    api = UserManagementAPI()
+    if options.get('base_url'):
+        api.base_url = options['base_url']
+    api.max_attempts = 1
+    api.hedge_enabled = False
+    api.recorder = None
+    api.token_pool = TokenPool()
+    adapter = TimedHTTPAdapter(pool_maxsize=max(1, concurrency))
+    api.session.mount('http://', adapter)
+    api.session.mount('https://', adapter)
+    return api
+
+
+def run_worker(options):
+    """单个进程的施压过程，返回 LoadStats.to_dict()"""
+    random.seed()  # fork 出来的进程会继承同一个随机数状态，重新播种以免生成相同的用户名
+    # 指定种子时注册参数来自本 worker 的数据流；同一种子重复压测同一个服务会注册到已存在的用户名
+    seed = options.get('seed')
+    scenarios.data_stream = DataStream(seed, options.get('worker', 0)) if seed is not None else None
+    names = list(options['mix'])
+    weights = [options['mix'][name] for name in names]
+    stats = LoadStats()
+    duration = options['duration']
+
+    if options['mode'] == 'closed':
+        api = make_client(options, options['users'])
+        end = time.perf_counter() + duration
+
+        def virtual_user():
+            while time.perf_counter() < end:
+                run_flow(api, stats, random.choices(names, weights)[0], time.perf_counter())
+                if options['think_time']:
+                    time.sleep(random.expovariate(1 / options['think_time']))
+
+        threads = [threading.Thread(target=virtual_user, daemon=True) for _ in range(options['users'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        api = make_client(options, options['max_in_flight'])
+        rate = options['rate']
+        with ThreadPoolExecutor(max_workers=options['max_in_flight']) as pool:
+            now = time.perf_counter()
+            scheduled, end = now, now + duration
+            while True:
+                scheduled += random.expovariate(rate)
+                if scheduled >= end:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(run_flow, api, stats, random.choices(names, weights)[0], scheduled)
+    return stats.to_dict()
+
+
+def split(total, parts):
+    """把 total 尽量平均地分给 parts 份"""
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+
+def run(options):
+    """按 options 施压，返回可 JSON 序列化的结果（包含合并后的统计与注入次数变化）"""
+    processes = options['processes']
+    worker_options = []
+    users = split(options['users'], processes)
+    for i in range(processes):
+        worker_options.append(dict(options, users=users[i], rate=options['rate'] / processes,
+                                   worker=options.get('worker_base', 0) + i))
+    if options['mode'] == 'closed':
+        worker_options = [item for item in worker_options if item['users'] > 0]
+
+    base_url = options.get('base_url') or YamlLoader.get_config().get('base_url')
+    before = scrape_injections(base_url)
+    start = time.perf_counter()
+    if len(worker_options) == 1:
+        results = [run_worker(worker_options[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=len(worker_options)) as pool:
+            results = list(pool.map(run_worker, worker_options))
+    elapsed = time.perf_counter() - start
+    after = scrape_injections(base_url)
+
+    stats = LoadStats()
+    for result in results:
+        stats.merge(LoadStats.from_dict(result))
+    return dict(stats.to_dict(), options=options, elapsed=elapsed, injections=injection_delta(before, after))
+
+
+def main(argv=None):
+    defaults = YamlLoader.get_config().get('loadtest', {})
+    parser = argparse.ArgumentParser(description='用户管理接口压测')
+    parser.add_argument('--mode', choices=['closed', 'open'], default=defaults.get('mode', 'closed'),
+                        help='closed：固定虚拟用户数；open：按目标 RPS 泊松到达')
+    parser.add_argument('--users', type=int, default=defaults.get('users', 20), help='closed 模式的虚拟用户总数')
+    parser.add_argument('--rate', type=float, default=defaults.get('rate', 50),
+                        help='open 模式每秒开始的流程数（所有进程合计）')
+    parser.add_argument('--duration', type=float, default=defaults.get('duration', 30), help='施压时长（秒）')
+    parser.add_argument('--processes', type=int, default=defaults.get('processes', 1))
+    parser.add_argument('--max-in-flight', type=int, default=defaults.get('max_in_flight', 200),
+                        help='open 模式每个进程同时执行的流程上限')
+    parser.add_argument('--think-time', type=float, default=defaults.get('think_time', 0),
+                        help='closed 模式两个流程之间的平均思考时间（秒，指数分布）')
+    parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in defaults.get('mix', {'session': 1}).items()),
+                        help='场景权重，如 session=6,signup=2,lifecycle=2')
+    parser.add_argument('--seed', default=defaults.get('seed'),
+                        help='运行种子：指定后注册的用户由 (种子, worker 编号) 确定，可复现、各 worker 互不冲突')
+    parser.add_argument('--worker-base', type=int, default=0,
+                        help='本机第一个进程的 worker 编号，多台机器使用同一种子时各自错开（如 0、16、32）')
+    parser.add_argument('--base-url', default=None, help='默认使用 config.yaml 中的 base_url')
+    parser.add_argument('--json', dest='json_path', default=None, help='同时把完整结果写入该 JSON 文件')
+    args = parser.parse_args(argv)
+
+    options = {
+        'mode': args.mode, 'users': args.users, 'rate': args.rate, 'duration': args.duration,
+        'processes': max(1, args.processes), 'max_in_flight': args.max_in_flight,
+        'think_time': args.think_time, 'mix': parse_mix(args.mix), 'base_url': args.base_url,
+        'seed': args.seed, 'worker_base': args.worker_base,
+    }
+    result = run(options)
+    print(format_report(result))
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0 if not result['errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
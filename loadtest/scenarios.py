@@ -0,0 +1,104 @@
+"""压测场景：由 UserManagementAPI 的接口调用组成的用户流程
+
+每个场景是一个函数 scenario(api, step)，按顺序调用接口；step(key, call) 负责计时、判断成败，
+某一步失败时抛出 StepFailed，流程就此结束（后续步骤依赖前一步的结果）。
+"""
+import random
+from collections import deque
+
+from api.user_management import ENDPOINTS
+from common.parameter_json import Parameter
+
+
+class StepFailed(Exception):
+    """流程中某一步的 HTTP 状态码或业务码不是 200"""
+
+
+def endpoint_key(method, name):
+    """统计用的接口标识，如 'GET /api/v1/users/{user_id}'"""
+    return f"{method} {ENDPOINTS[name]}"
+
+
+REGISTER = endpoint_key("POST", "register")
+LOGIN = endpoint_key("POST", "login")
+OBTAIN = endpoint_key("GET", "obtain")
+UPDATE = endpoint_key("PUT", "update")
+DELETE = endpoint_key("DELETE", "delete")
+
+# 指定运行种子时由 runner 设置为本进程的 DataStream，注册参数按顺序从中取，可复现且与其他进程不冲突
+data_stream = None
+
+# 本进程注册过、仍然存在的账号（用户名 / 当前密码），供 returning 场景以老用户身份再次访问
+known_accounts = deque(maxlen=10000)
+
+
+def _signup(api, step):
+    """注册并登录（令牌放入令牌池），返回 (以该用户身份请求的句柄, user_id, 账号)"""
+    params = data_stream.next() if data_stream is not None else Parameter.register_parameters()
+    step(REGISTER, lambda: api.register(params))
+    login = {"username": params["username"], "password": params["password"], "remember_me": False}
+    data = step(LOGIN, lambda: api.login(login))
+    api.token_pool.put(api.base_url, params["username"], params["password"], data, save=False)
+    user_id = data["user_info"]["user_id"]
+    account = {"username": params["username"], "password": params["password"], "user_id": user_id}
+    return api.as_user(data["token"]), user_id, account
+
+
+def signup(api, step):
+    """注册 → 登录"""
+    known_accounts.append(_signup(api, step)[2])
+
+
+def session(api, step):
+    """注册 → 登录 → 获取信息 → 再次获取（带 ETag）→ 更新"""
+    user, user_id, account = _signup(api, step)
+    step(OBTAIN, lambda: user.obtain(user_id))
+    step(OBTAIN, lambda: user.obtain(user_id))
+    update = Parameter.update_parameters()
+    step(UPDATE, lambda: user.update(user_id, update))
+    account["password"] = update["password"]
+    known_accounts.append(account)
+
+
+def returning(api, step):
+    """老用户再次访问：令牌池中有未过期的令牌时不再登录 → 获取信息 ×2；还没有老用户时按 signup 处理"""
+    try:
+        account = random.choice(known_accounts)
+    except IndexError:
+        return signup(api, step)
+    try:
+        entry = api.token_pool.get(api, account["username"], account["password"])
+    except RuntimeError as e:
+        raise StepFailed(LOGIN) from e
+    user = api.as_user(entry["token"])
+    step(OBTAIN, lambda: user.obtain(account["user_id"]))
+    step(OBTAIN, lambda: user.obtain(account["user_id"]))
+
+
+def lifecycle(api, step):
+    """注册 → 登录 → 获取信息 → 更新 → 删除"""
+    user, user_id, _ = _signup(api, step)
+    step(OBTAIN, lambda: user.obtain(user_id))
+    step(UPDATE, lambda: user.update(user_id, Parameter.update_parameters()))
+    step(DELETE, lambda: user.delete_user(user_id, {"reason": "压测清理"}))
+
+
+SCENARIOS = {
+    "signup": signup,
+    "session": session,
+    "lifecycle": lifecycle,
+    "returning": returning,
+}
+
+
+def parse_mix(text):
+    """'session=6,signup=2' -> {'session': 6.0, 'signup': 2.0}"""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"未知场景: {name}，可选值 {tuple(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("场景权重之和必须大于 0")
+    return mix
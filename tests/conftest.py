@@ -0,0 +1,34 @@
+import os
+import re
+
+from api.timing import current_recorder
+from common.generate_parameter import DataStream
+from common.parameter_json import Parameter
+
+
+def pytest_addoption(parser):
+    parser.addoption("--data-seed", default=os.environ.get("DATA_SEED"),
+                     help="注册用户数据的运行种子：指定后用户可复现，并按 worker（pytest-xdist 的 gwN）划分互不冲突；"
+                          "同一种子再次运行需要干净的服务数据，否则用户名已存在")
+
+
+def pytest_configure(config):
+    seed = config.getoption("--data-seed")
+    if seed is not None:
+        match = re.search(r"\d+", os.environ.get("PYTEST_XDIST_WORKER", ""))
+        Parameter.stream = DataStream(seed, int(match.group()) if match else 0)
+
+
+def pytest_report_header(config):
+    if Parameter.stream is not None:
+        return f"data seed: {Parameter.stream.seed}, worker: {Parameter.stream.worker}"
+
+
+def pytest_terminal_summary(terminalreporter):
+    """测试结束时输出本次会话各接口的客户端耗时分位数（毫秒）"""
+    recorder = current_recorder()
+    if recorder is None or not recorder.summary():
+        return
+    terminalreporter.section("接口耗时（客户端，毫秒）")
+    terminalreporter.write_line(recorder.format_summary())
+    recorder.close()
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from api.async_user_management import AsyncUserManagementAPI
+from api.user_management import UserManagementAPI
+from common.parameter_json import Parameter
+
+
+def assert_obtained(resp, user_id):
+    """同步 / 异步响应共用的断言"""
+    assert resp.status_code == 200
+    resp_json = resp.json()
+    assert resp_json["code"] == 200, f"获取失败:{resp_json}"
+    assert resp_json["message"] == "获取成功"
+    assert resp_json["data"]["user_id"] == user_id
+
+
+async def register_and_obtain(api, params):
+    resp_json = (await api.register(params)).json()
+    assert resp_json["code"] == 200, f"注册失败:{resp_json}"
+    resp_json = (await api.login({"username": params["username"], "password": params["password"]})).json()
+    assert resp_json["code"] == 200, f"登录失败:{resp_json}"
+    token = resp_json["data"]["token"]
+    user_id = resp_json["data"]["user_info"]["user_id"]
+    return token, user_id, await api.as_user(token).obtain(user_id)
+
+
+def test_async_concurrent_users():
+    """大量虚拟用户在同一个事件循环里并发注册、登录、获取信息"""
+    async def main():
+        async with AsyncUserManagementAPI() as api:
+            params_list = [Parameter.register_parameters() for _ in range(30)]
+            return await asyncio.gather(*(register_and_obtain(api, params) for params in params_list))
+
+    results = asyncio.run(main())
+    assert len({user_id for _, user_id, _ in results}) == 30
+    sync_api = UserManagementAPI()
+    for token, user_id, resp in results:
+        assert_obtained(resp, user_id)
+        sync_resp = sync_api.as_user(token).obtain(user_id)
+        assert_obtained(sync_resp, user_id)
+        assert sync_resp.json() == resp.json()
+
+
+class CountingSemaphore(asyncio.Semaphore):
+    """记录同时持有信号量的最大协程数"""
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.holding = 0
+        self.peak = 0
+
+    async def __aenter__(self):
+        await super().__aenter__()
+        self.holding += 1
+        self.peak = max(self.peak, self.holding)
+
+    async def __aexit__(self, *exc):
+        self.holding -= 1
+        await super().__aexit__(*exc)
+
+
+def test_async_concurrency_limit_and_timeout():
+    """信号量限制在途请求数；单个请求可覆盖超时，服务端注入的延迟超过超时时抛出 asyncio.TimeoutError"""
+    admin = UserManagementAPI().login_as("admin", "Admin123!")
+    token = admin.auth_headers["Authorization"].split()[-1]
+
+    async def main():
+        async with AsyncUserManagementAPI() as api:
+            api.session
+            semaphore = api._state["semaphore"] = CountingSemaphore(2)
+            resps = await asyncio.gather(*(api.get("/health", timeout=5) for _ in range(10)))
+            user = api.as_user(token)
+            with pytest.raises(asyncio.TimeoutError):
+                await user.get("/api/v1/users/1", timeout=0.2)
+            slow = await user.get("/api/v1/users/1", timeout=5)
+            return resps, semaphore.peak, slow
+
+    admin.put("/api/v1/admin/fault-injection",
+              json={"profiles": {"GET /api/v1/users/<int:user_id>": {"latency": 1000}}})
+    try:
+        resps, peak, slow = asyncio.run(main())
+    finally:
+        admin.delete("/api/v1/admin/fault-injection")
+    assert all(resp.status_code == 200 for resp in resps)
+    assert peak == 2
+    assert_obtained(slow, 1)
+    assert slow.elapsed >= 1
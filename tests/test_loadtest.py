@@ -0,0 +1,107 @@
+import pytest
+
+from api.user_management import UserManagementAPI
+from loadtest.report import format_report, injection_delta
+from loadtest.runner import LoadStats, run, split
+from loadtest.scenarios import OBTAIN, parse_mix
+
+
+def options(**overrides):
+    return dict({'mode': 'closed', 'users': 2, 'rate': 20, 'duration': 1, 'processes': 1,
+                 'max_in_flight': 20, 'think_time': 0, 'mix': {'session': 1}, 'base_url': None}, **overrides)
+
+
+def test_load_stats_merge_across_processes():
+    a, b = LoadStats(), LoadStats()
+    a.observe(OBTAIN, 0.010)
+    b.observe(OBTAIN, 0.030, 503)
+    b.observe_scenario('session', 0.1, False)
+    merged = LoadStats.from_dict(a.to_dict()).merge(LoadStats.from_dict(b.to_dict()))
+    assert merged.endpoints[OBTAIN].count == 2
+    assert merged.errors == {OBTAIN: {'503': 1}}
+    assert merged.failed == {'session': 1}
+    assert split(5, 3) == [2, 2, 1]
+    assert parse_mix('session=3,signup') == {'session': 3.0, 'signup': 1.0}
+    with pytest.raises(ValueError):
+        parse_mix('nope=1')
+
+
+def test_closed_loop_run():
+    result = run(options(mix={'session': 2, 'lifecycle': 1}))
+    assert result['endpoints'][OBTAIN]['count'] > 0
+    assert not result['errors']
+    assert sum(h['count'] for h in result['scenarios'].values()) > 0
+    assert 'GET /api/v1/users/{user_id}' in format_report(result)
+
+
+def test_open_loop_reports_injections():
+    """开环压测：按到达时间计时，并统计压测期间服务端注入的延迟次数"""
+    api = UserManagementAPI()
+    admin = api.login_as('admin', 'Admin123!')
+    admin.put('/api/v1/admin/fault-injection',
+              json={'profiles': {'GET /api/v1/users/<int:user_id>': {'latency': 20}}})
+    try:
+        result = run(options(mode='open', rate=30, duration=1, mix={'session': 1}))
+    finally:
+        admin.delete('/api/v1/admin/fault-injection')
+    obtain = result['endpoints'][OBTAIN]
+    assert obtain['count'] > 0 and obtain['min'] >= 0.02
+    assert {'route': '/api/v1/users/<int:user_id>', 'kind': 'latency', 'count': obtain['count']} \
+        in result['injections']
+    assert '故障注入' in format_report(result)
+    assert injection_delta({('r', 'error'): 1}, {('r', 'error'): 3}) == [{'route': 'r', 'kind': 'error', 'count': 2}]
+
+
+def test_record_and_replay_remaps_ids_and_tokens(tmp_path):
+    """录制一段真实会话，换成新用户名后回放：user_id 与 token 换成回放时得到的值"""
+    import json
+    from api.traffic import TrafficRecorder, open_trace, read_trace
+    from common.parameter_json import Parameter
+    from loadtest.replay import replay
+
+    path = str(tmp_path / 'trace.jsonl.gz')
+    api = UserManagementAPI()
+    api.traffic = TrafficRecorder(path, api.base_url)
+    params = Parameter.register_parameters()
+    user_id = api.register(params).json()['data']['user_id']
+    token = api.login({'username': params['username'], 'password': params['password']}).json()['data']['token']
+    user = api.as_user(token)
+    user.obtain(user_id)
+    user.update(user_id, Parameter.update_parameters())
+    user.obtain(user_id)
+    api.traffic.close()
+
+    header, records = read_trace(path)
+    records = list(records)
+    assert header['base_url'] == api.base_url
+    assert [(r['m'], r['e']) for r in records][:3] == [('POST', '/api/v1/users/register'),
+                                                       ('POST', '/api/v1/users/login'),
+                                                       ('GET', '/api/v1/users/{user_id}')]
+    assert records[1]['o'] == {'identity': 'u1', 'user_id': user_id} and records[2]['i'] == 'u1'
+    assert token not in open_trace(path).read()
+
+    # 模拟全新的回放目标：换掉录制时已被占用的用户名和邮箱
+    username = Parameter.register_parameters()['username']
+    replay_path = str(tmp_path / 'replay.jsonl')
+    with open_trace(replay_path, 'wt') as f:
+        f.write(json.dumps(header) + '\n')
+        for record in records:
+            if 'username' in record.get('b', {}):
+                record['b']['username'] = username
+            if 'email' in record.get('b', {}):
+                record['b']['email'] = Parameter.register_parameters()['email']
+            f.write(json.dumps(record) + '\n')
+
+    result = replay(replay_path, speed=0, lanes=4)
+    assert not result['errors'], result['errors']
+    assert result['unmapped'] == {'identity': 0, 'user_id': 0}
+    assert result['endpoints']['GET /api/v1/users/{user_id}']['count'] == 2
+
+
+def test_returning_users_reuse_pooled_tokens():
+    """returning 场景复用 signup 时放入令牌池的令牌，不再请求登录接口"""
+    from loadtest.scenarios import LOGIN, REGISTER
+    result = run(options(users=2, mix={'signup': 1, 'returning': 3}))
+    assert not result['errors']
+    assert result['scenarios']['returning']['count'] > 0
+    assert result['endpoints'][LOGIN]['count'] == result['endpoints'][REGISTER]['count']
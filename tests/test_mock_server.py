@@ -0,0 +1,810 @@
+import json
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api import mock_server
+from api.user_store import UserStore, JournalPersistence, DuplicateUserError
+from api.sqlite_store import migrate_json_to_sqlite, SqliteUserStore
+from api.token_cache import TokenCache
+from api.seed import seed_json, seed_sqlite
+
+SEED_USERS = [
+    {
+        "user_id": 1,
+        "username": "admin",
+        "password": "Admin123!",
+        "email": "admin@example.com",
+        "phone": "13800138001",
+        "avatar": "http://example.com/avatar/1.jpg",
+        "create_time": "2023-01-01 10:00:00",
+        "update_time": "2023-01-02 15:30:00",
+        "role": "admin",
+        "status": 1
+    },
+    {
+        "user_id": 2,
+        "username": "test_user",
+        "password": "Test123!",
+        "email": "test@example.com",
+        "phone": "13800138000",
+        "avatar": "http://example.com/avatar/2.jpg",
+        "create_time": "2023-01-02 10:00:00",
+        "update_time": "2023-01-03 15:30:00",
+        "role": "user",
+        "status": 1
+    }
+]
+
+
+@pytest.fixture()
+def users_file(tmp_path):
+    path = tmp_path / "users.json"
+    path.write_text(json.dumps(SEED_USERS))
+    return str(path)
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def open_store(request, users_file, tmp_path):
+    """按存储引擎初始化 mock 服务的存储，可重复调用以模拟重启"""
+    def _open():
+        return mock_server.init_store(users_file, {"engine": request.param, "fsync": "off"},
+                                      sqlite_file=str(tmp_path / "users.db"))
+    return _open
+
+
+@pytest.fixture()
+def client(open_store):
+    """进程内的 mock 服务，数据写入临时目录"""
+    open_store()
+    return mock_server.app.test_client()
+
+
+def login(client, username, password):
+    resp = client.post("/api/v1/users/login", json={"username": username, "password": password})
+    return resp.get_json()["data"]["token"]
+
+
+def test_store_indexes():
+    store = UserStore([dict(u) for u in SEED_USERS])
+    assert store.get(1)["username"] == "admin"
+    assert store.get_by_username("test_user")["user_id"] == 2
+    assert store.username_exists("admin")
+    assert store.email_exists("test@example.com")
+    assert store.peek_user_id() == 3
+
+    store.update(2, {"email": "new@example.com"})
+    assert not store.email_exists("test@example.com")
+    assert store.email_exists("new@example.com")
+
+    store.delete(2)
+    assert store.get(2) is None
+    assert not store.username_exists("test_user")
+    assert not store.email_exists("new@example.com")
+
+
+def test_user_record_round_trip():
+    from api.user_record import UserRecord
+
+    record = UserRecord.from_dict(SEED_USERS[0])
+    assert record.to_dict() == SEED_USERS[0]
+    assert dict(record) == SEED_USERS[0]
+    assert record["create_time"] == "2023-01-01 10:00:00"
+    assert isinstance(record.create_ts, int)
+    record.update({"update_time": "2024-02-29 23:59:59", "role": "user"})
+    assert record["update_time"] == "2024-02-29 23:59:59"
+    assert record.role is UserRecord.from_dict(SEED_USERS[1]).role
+    with pytest.raises(KeyError):
+        record["nickname"]
+
+
+def test_register_login_obtain(client, open_store):
+    resp = client.post("/api/v1/users/register", json={
+        "username": "alice01", "password": "abc12345", "email": "alice@qq.com", "phone": "13312345678"})
+    body = resp.get_json()
+    assert body["code"] == 200
+    user_id = body["data"]["user_id"]
+    assert user_id == 3
+
+    dup = client.post("/api/v1/users/register", json={
+        "username": "alice01", "password": "abc12345", "email": "other@qq.com"}).get_json()
+    assert dup["code"] == 40001
+    dup = client.post("/api/v1/users/register", json={
+        "username": "alice02", "password": "abc12345", "email": "alice@qq.com"}).get_json()
+    assert dup["code"] == 40002
+
+    token = login(client, "alice01", "abc12345")
+    resp = client.get(f"/api/v1/users/{user_id}", headers={"Authorization": f"Bearer {token}"})
+    assert resp.get_json()["data"]["email"] == "alice@qq.com"
+
+    # 重新加载存储，数据应已持久化
+    reloaded = open_store()
+    assert reloaded.get_by_username("alice01")["user_id"] == user_id
+
+
+def test_update_and_delete(client):
+    token = login(client, "test_user", "Test123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    body = client.put("/api/v1/users/2", json={"email": "changed@example.com"}, headers=headers).get_json()
+    assert body["code"] == 200
+    assert mock_server.store.email_exists("changed@example.com")
+    body = client.put("/api/v1/users/2", json={"email": "admin@example.com"}, headers=headers).get_json()
+    assert body["code"] == 40002
+
+    body = client.delete("/api/v1/users/2", headers=headers).get_json()
+    assert body["code"] == 200
+    assert mock_server.store.get(2) is None
+    assert client.get("/api/v1/users/2", headers=headers).get_json()["code"] == 40007
+
+
+def test_journal_replay_and_compaction(users_file):
+    persistence = JournalPersistence(users_file, fsync="off", compact_every=3)
+    store = UserStore.load(persistence)
+    store.add(dict(SEED_USERS[1], user_id=3, username="u3", email="u3@qq.com"))
+    store.update(3, {"phone": "13900000000"})
+    with open(persistence.journal_path) as f:
+        assert len(f.readlines()) == 2
+
+    # 模拟崩溃：日志尾部留下半行
+    with open(persistence.journal_path, "a") as f:
+        f.write('{"op":"delete","us')
+    reloaded = UserStore.load(JournalPersistence(users_file, fsync="off", compact_every=3))
+    assert reloaded.get(3)["phone"] == "13900000000"
+    assert len(reloaded) == 3
+
+    # 第三条变更触发压缩：快照包含全部数据，日志被清空
+    reloaded.delete(2)
+    with open(users_file) as f:
+        snapshot = json.load(f)
+    assert sorted(u["user_id"] for u in snapshot["users"]) == [1, 3]
+    assert snapshot["next_user_id"] == 4
+    with open(reloaded.persistence.journal_path) as f:
+        assert f.read() == ""
+
+
+def test_migrate_json_to_sqlite(users_file, tmp_path):
+    db = str(tmp_path / "users.db")
+    assert migrate_json_to_sqlite(users_file, db) == 2
+    # 重复导入时跳过已存在的用户
+    assert migrate_json_to_sqlite(users_file, db) == 0
+    store = SqliteUserStore(db)
+    assert store.get_by_username("admin")["role"] == "admin"
+    assert store._conn().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_user_id_allocator_never_reuses_ids(client, open_store):
+    token = login(client, "admin", "Admin123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    body = client.post("/api/v1/admin/users/create", json={
+        "username": "bob001", "password": "abc12345", "email": "bob@qq.com"}, headers=headers).get_json()
+    assert body["data"]["user_id"] == 3
+    # 删除最大 ID 的用户并压缩、重启后，ID 仍不回退
+    client.delete("/api/v1/users/3", headers=headers)
+    mock_server.store.compact()
+    store = open_store()
+    assert store.allocate_user_id() == 4
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = list(pool.map(lambda _: store.allocate_user_id(), range(200)))
+    assert len(set(ids)) == 200
+    assert min(ids) == 5
+
+
+def _register_and_update(worker, count):
+    """单个线程：注册 count 个用户，每个用户更新一次手机号，并争抢同一个用户名"""
+    client = mock_server.app.test_client()
+    created = []
+    for i in range(count):
+        body = client.post("/api/v1/users/register", json={
+            "username": f"w{worker}_{i}", "password": "abc12345",
+            "email": f"w{worker}_{i}@qq.com"}).get_json()
+        assert body["code"] == 200, body
+        created.append(body["data"]["user_id"])
+    for i, user_id in enumerate(created):
+        token = login(client, f"w{worker}_{i}", "abc12345")
+        body = client.put(f"/api/v1/users/{user_id}", json={"phone": f"1390000{worker:02d}{i:02d}"},
+                          headers={"Authorization": f"Bearer {token}"}).get_json()
+        assert body["code"] == 200, body
+    race = client.post("/api/v1/users/register", json={
+        "username": "race_user", "password": "abc12345", "email": f"race{worker}@qq.com"}).get_json()
+    return created, race["code"]
+
+
+def test_concurrent_register_and_update_lose_no_writes(client, open_store):
+    workers, per_worker = 16, 20
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda w: _register_and_update(w, per_worker), range(workers)))
+
+    ids = [user_id for created, _ in results for user_id in created]
+    assert len(set(ids)) == workers * per_worker
+    assert sorted(code for _, code in results).count(200) == 1
+
+    # 同一用户的不同字段被并发更新，两个字段都要保留
+    token = login(client, "test_user", "Test123!")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def update_field(i):
+        field = "phone" if i % 2 else "avatar"
+        mock_server.app.test_client().put("/api/v1/users/2", json={field: f"{field}-{i}"}, headers=headers)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(update_field, range(40)))
+
+    # 重新加载后所有写入都在
+    store = open_store()
+    assert len(store) == 2 + workers * per_worker + 1
+    for worker in range(workers):
+        for i in range(per_worker):
+            assert store.get_by_username(f"w{worker}_{i}")["phone"] == f"1390000{worker:02d}{i:02d}"
+    assert store.get(2)["phone"].startswith("phone-")
+    assert store.get(2)["avatar"].startswith("avatar-")
+
+
+def _process_worker(users_file, sqlite_file, engine, worker, count):
+    """子进程：直接通过存储注册用户，并争抢同一个用户名"""
+    store = mock_server.init_store(users_file, {"engine": engine, "fsync": "off", "shared": True,
+                                                "compact_every": 37}, sqlite_file=sqlite_file)
+    for i in range(count):
+        user_id = store.allocate_user_id()
+        store.add(dict(SEED_USERS[1], user_id=user_id, username=f"p{worker}_{i}", email=f"p{worker}_{i}@qq.com"))
+    try:
+        store.add(dict(SEED_USERS[1], user_id=store.allocate_user_id(), username="race_user",
+                       email=f"race{worker}@qq.com"))
+    except DuplicateUserError:
+        pass
+
+
+@pytest.mark.parametrize("engine", ["json", "sqlite"])
+def test_multiprocess_writes_share_one_store(users_file, tmp_path, engine):
+    ctx = multiprocessing.get_context("fork")
+    sqlite_file = str(tmp_path / "users.db")
+    workers, per_worker = 4, 60
+    procs = [ctx.Process(target=_process_worker, args=(users_file, sqlite_file, engine, w, per_worker))
+             for w in range(workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+        assert p.exitcode == 0
+
+    store = mock_server.init_store(users_file, {"engine": engine, "fsync": "off"}, sqlite_file=sqlite_file)
+    users = store.all()
+    assert len(users) == 2 + workers * per_worker + 1
+    assert len({u["user_id"] for u in users}) == len(users)
+    assert sum(u["username"] == "race_user" for u in users) == 1
+
+
+def test_token_cache_respects_exp_and_secret(monkeypatch):
+    cache = TokenCache(maxsize=2)
+    now = time.time()
+    cache.put("t1", "s", {"user_id": 1, "exp": now + 60})
+    assert cache.get("t1", "s")["user_id"] == 1
+    cache.put("t2", "s", {"user_id": 2, "exp": now + 60})
+    cache.put("t3", "s", {"user_id": 3, "exp": now + 60})
+    assert cache.get("t1", "s") is None  # LRU 淘汰
+    assert cache.stats()["evictions"] == 1
+
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert cache.get("t2", "s") is None  # 已过期
+    assert cache.stats()["expired"] == 1
+    monkeypatch.undo()
+
+    assert cache.get("t3", "other-secret") is None  # 密钥变化后清空
+    assert cache.stats()["size"] == 0
+
+
+def test_token_required_uses_cache(client, monkeypatch):
+    monkeypatch.setattr(mock_server, "token_cache", TokenCache(16))
+    token = login(client, "test_user", "Test123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(3):
+        assert client.get("/api/v1/users/2", headers=headers).get_json()["code"] == 200
+    stats = client.get("/health").get_json()["token_cache"]
+    assert stats["misses"] == 1 and stats["hits"] == 2
+
+    monkeypatch.setitem(mock_server.app.config, "SECRET_KEY", "rotated")
+    assert client.get("/api/v1/users/2", headers=headers).get_json()["code"] == 40009
+
+
+def test_batch_endpoints_report_per_item_codes(client):
+    users = [
+        {"username": "batch1", "password": "abc12345", "email": "batch1@qq.com"},
+        {"username": "admin", "password": "abc12345", "email": "x@qq.com"},
+        {"username": "batch2", "password": "abc12345", "email": "admin@example.com"},
+        {"username": "batch3", "password": "short", "email": "batch3@qq.com"},
+    ]
+    data = client.post("/api/v1/users/batch/register", json={"users": users}).get_json()["data"]
+    assert [r["code"] for r in data["results"]] == [200, 40001, 40002, 40003]
+    assert (data["succeeded"], data["failed"]) == (1, 3)
+    new_id = data["results"][0]["data"]["user_id"]
+
+    data = client.post("/api/v1/users/batch/login", json={"users": [
+        {"username": "batch1", "password": "abc12345"},
+        {"username": "batch1", "password": "wrong123"}]}).get_json()["data"]
+    assert [r["code"] for r in data["results"]] == [200, 40005]
+    token = data["results"][0]["data"]["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    data = client.post("/api/v1/users/batch/get", json={"user_ids": [new_id, 1, 999]},
+                       headers=headers).get_json()["data"]
+    assert [r["code"] for r in data["results"]] == [200, 40008, 40007]
+    assert data["results"][0]["data"]["username"] == "batch1"
+
+    admin_headers = {"Authorization": f"Bearer {login(client, 'admin', 'Admin123!')}"}
+    data = client.post("/api/v1/users/batch/delete", json={"user_ids": [new_id, 1, new_id]},
+                       headers=admin_headers).get_json()["data"]
+    assert [r["code"] for r in data["results"]] == [200, 40008, 40007]
+
+    assert client.post("/api/v1/users/batch/get", json={"user_ids": []},
+                       headers=admin_headers).get_json()["code"] == 40000
+    too_many = list(range(mock_server.BATCH_MAX_ITEMS + 1))
+    assert client.post("/api/v1/users/batch/get", json={"user_ids": too_many},
+                       headers=admin_headers).get_json()["code"] == 40013
+
+
+def test_batch_malformed_items_fail_individually(client):
+    """非对象条目、缺少必填字段、非整数 user_id 只让对应条目返回 40000，其余条目照常处理"""
+    resp = client.post("/api/v1/users/batch/register", json={"users": [
+        1, {"username": "nopass", "email": "nopass@qq.com"},
+        {"username": "batch9", "password": "abc12345", "email": "batch9@qq.com"}]})
+    assert resp.status_code == 200
+    data = resp.get_json()["data"]
+    assert [r["code"] for r in data["results"]] == [40000, 40000, 200]
+    new_id = data["results"][2]["data"]["user_id"]
+
+    data = client.post("/api/v1/users/batch/login", json={"users": [
+        "batch9", {"username": "batch9", "password": None},
+        {"username": "batch9", "password": "abc12345"}]}).get_json()["data"]
+    assert [r["code"] for r in data["results"]] == [40000, 40000, 200]
+
+    admin_headers = {"Authorization": f"Bearer {login(client, 'admin', 'Admin123!')}"}
+    for path in ("/api/v1/users/batch/get", "/api/v1/users/batch/delete"):
+        resp = client.post(path, json={"user_ids": [1.5, "2", True, new_id]}, headers=admin_headers)
+        assert resp.status_code == 200
+        assert [r["code"] for r in resp.get_json()["data"]["results"]] == [40000, 40000, 40000, 200]
+
+
+def test_admin_list_users_paginates_with_filters(client):
+    for i in range(7):
+        mock_server.store.add(dict(SEED_USERS[1], user_id=mock_server.store.allocate_user_id(),
+                                   username=f"page{i}", email=f"page{i}@qq.com",
+                                   role="admin" if i % 3 == 0 else "user",
+                                   create_time=f"2024-01-0{i + 1} 00:00:00"))
+    headers = {"Authorization": f"Bearer {login(client, 'admin', 'Admin123!')}"}
+
+    seen, cursor = [], None
+    while True:
+        query = {"limit": 3} if cursor is None else {"limit": 3, "cursor": cursor}
+        data = client.get("/api/v1/admin/users", query_string=query, headers=headers).get_json()["data"]
+        seen += [u["user_id"] for u in data["users"]]
+        assert "password" not in (data["users"] or [{}])[0]
+        if not data["has_more"]:
+            break
+        cursor = data["next_cursor"]
+    assert seen == list(range(1, 10))
+
+    data = client.get("/api/v1/admin/users", headers=headers, query_string={
+        "role": "user", "create_time_from": "2024-01-02 00:00:00",
+        "create_time_to": "2024-01-06 00:00:00"}).get_json()["data"]
+    assert [u["username"] for u in data["users"]] == ["page1", "page2", "page4", "page5"]
+    # 日期前缀 / ISO 格式的边界按时间比较，两种存储结果一致
+    data = client.get("/api/v1/admin/users", headers=headers, query_string={
+        "role": "user", "create_time_from": "2024-01-02T00:00:00",
+        "create_time_to": "2024-01-05"}).get_json()["data"]
+    assert [u["username"] for u in data["users"]] == ["page1", "page2", "page4"]
+
+    user_headers = {"Authorization": f"Bearer {login(client, 'test_user', 'Test123!')}"}
+    assert client.get("/api/v1/admin/users", headers=user_headers).get_json()["code"] == 40008
+    assert client.get("/api/v1/admin/users", query_string={"limit": 0},
+                      headers=headers).get_json()["code"] == 40014
+
+
+def test_prod_handler_keeps_connection_alive(users_file):
+    import http.client
+    import threading
+    from werkzeug.serving import make_server
+    from api.serving import KeepAliveRequestHandler
+
+    mock_server.init_store(users_file)
+    server = make_server("127.0.0.1", 0, mock_server.app, threaded=True,
+                         request_handler=KeepAliveRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+        body = json.dumps({"username": "admin", "password": "Admin123!", "extra": "x" * 4096})
+        for _ in range(3):
+            conn.request("POST", "/api/v1/users/login", body=body,
+                         headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            assert json.loads(resp.read())["code"] == 200
+            assert resp.getheader("Connection") != "close"
+            sock = conn.sock
+            conn.request("GET", "/health")
+            assert conn.getresponse().read()
+            # 同一条 TCP 连接上连续处理多个请求
+            assert conn.sock is sock
+        conn.close()
+    finally:
+        server.shutdown()
+        mock_server.close_store()
+
+
+@pytest.mark.parametrize("engine", ["json", "sqlite"])
+def test_seed_users_are_unique_and_loadable(users_file, tmp_path, engine):
+    sqlite_file = str(tmp_path / "users.db")
+    if engine == "json":
+        total = seed_json(users_file, 500, fsync="off")
+    else:
+        mock_server.init_store(users_file, {"engine": "sqlite"}, sqlite_file=sqlite_file)
+        mock_server.close_store()
+        total = seed_sqlite(sqlite_file, 500, fsync="off")
+    assert total == len(SEED_USERS) + 500
+
+    store = mock_server.init_store(users_file, {"engine": engine, "fsync": "off"}, sqlite_file=sqlite_file)
+    users = store.all()
+    assert len({u["username"] for u in users}) == len({u["email"] for u in users}) == total
+    assert [u["user_id"] for u in users] == list(range(1, total + 1))
+    assert store.peek_user_id() == total + 1
+
+    client = mock_server.app.test_client()
+    seeded = users[-1]
+    login(client, "admin", "Admin123!")
+    assert login(client, seeded["username"], seeded["password"])
+    resp = client.post("/api/v1/users/register", json={
+        "username": "after_seed", "password": "Abc12345", "email": "after_seed@example.com"})
+    assert resp.get_json()["data"]["user_id"] == total + 1
+
+
+def test_batch_generation_is_unique_and_valid(monkeypatch):
+    import re
+    from common import generate_parameter
+    from common.generate_parameter import Generate, PHONE_PREFIXES
+
+    # 不论是否装了 NumPy，都走一遍标准库的采样路径
+    for np in {generate_parameter.np, None}:
+        monkeypatch.setattr(generate_parameter, "np", np)
+        users = Generate.generate_users(2000) + Generate.generate_users(2000)
+        users.append({"username": Generate.generate_username(), "email": Generate.generate_email()})
+        assert len({u["username"] for u in users}) == len({u["email"] for u in users}) == len(users)
+        for user in users[:-1]:
+            assert re.fullmatch(r"[A-Za-z0-9]{4,20}", user["username"])
+            assert re.fullmatch(r"(?=.*[A-Za-z])(?=.*\d)[A-Za-z0-9]{8,20}", user["password"])
+            assert "@" in user["email"] and "." in user["email"]
+            assert user["phone"][:3] in PHONE_PREFIXES and re.fullmatch(r"\d{11}", user["phone"])
+
+    assert 4 <= len(Generate.generate_short_username()) <= 10
+
+    # 播种后只走标准库采样：相同种子的结果与是否安装 NumPy 无关
+    results = []
+    for np in (generate_parameter.np, None):
+        monkeypatch.setattr(generate_parameter, "np", np)
+        generate_parameter.seed(7)
+        results.append(Generate.generate_users(300))
+    assert results[0] == results[1]
+    generate_parameter.seed()
+
+
+def test_data_stream_is_deterministic_and_partitioned():
+    from common.generate_parameter import DataStream
+
+    streams = [DataStream("run-1", worker) for worker in range(4)]
+    users = [user for stream in streams for user in stream.records(count=500)]
+    assert len({u["username"] for u in users}) == len({u["email"] for u in users}) == 2000
+
+    again = DataStream("run-1", 2)
+    assert [again.next() for _ in range(3)] == list(streams[2].records(count=3))
+    assert again.record(499) == users[1499]
+    assert again.position(users[1499]["username"]) == 499 and streams[1].position(users[1499]["email"]) is None
+    assert DataStream("run-2", 2).record(499) != users[1499]
+
+
+def test_histogram_percentiles_and_merge():
+    from common.histogram import Histogram
+
+    first, second = Histogram(), Histogram()
+    for i in range(1, 1001):
+        (first if i % 2 else second).record(i / 1000)
+    merged = Histogram().merge(first).merge(second)
+    assert merged.count == 1000
+    for q in (50, 95, 99):
+        assert merged.percentile(q) == pytest.approx(q / 100, rel=0.04)
+    assert Histogram.from_dict(json.loads(json.dumps(merged.to_dict()))).summary() == merged.summary()
+
+
+def test_metrics_endpoint_reports_routes_and_phases(client):
+    mock_server.metrics.reset()
+    mock_server.token_cache.clear()
+    token = login(client, "admin", "Admin123!")
+    client.get("/api/v1/users/1", headers={"Authorization": f"Bearer {token}"})
+    client.get("/api/v1/users/999", headers={"Authorization": f"Bearer {token}"})
+    client.get("/no/such/route")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.content_type.startswith("text/plain")
+    text = resp.get_data(as_text=True)
+    assert 'mock_server_requests_total{method="POST",route="/api/v1/users/login",status="200"} 1' in text
+    assert 'mock_server_requests_total{method="GET",route="/api/v1/users/<int:user_id>",status="200"} 1' in text
+    assert 'mock_server_requests_total{method="GET",route="/api/v1/users/<int:user_id>",status="404"} 1' in text
+    assert 'route="unmatched",status="404"' in text
+    assert 'mock_server_request_duration_seconds{method="POST",route="/api/v1/users/login",quantile="0.99"}' in text
+    for phase in ('phase="store_read",op="get_by_username"', 'phase="jwt_encode"', 'phase="jwt_decode"',
+                  'phase="json_dumps"', 'phase="json_loads"'):
+        assert f'mock_server_phase_duration_seconds_count{{{phase}' in text
+
+
+def test_metrics_shards_stay_bounded_without_scrape(users_file):
+    """每个请求一个线程、从不抓取 /metrics 时，已退出线程的分片也会被合并，不随请求数增长"""
+    import http.client
+    import threading
+    from werkzeug.serving import make_server
+
+    mock_server.init_store(users_file)
+    mock_server.metrics.reset()
+    server = make_server("127.0.0.1", 0, mock_server.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        for _ in range(300):
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+            conn.request("GET", "/health")
+            assert conn.getresponse().read()
+            conn.close()
+        assert len(mock_server.metrics._shards) < 50
+    finally:
+        server.shutdown()
+        mock_server.close_store()
+    requests_total = mock_server.metrics.collect().requests
+    assert sum(n for (method, route, _), n in requests_total.items() if route == "/health") == 300
+
+
+def test_request_profiler_writes_per_route_files(client, tmp_path, monkeypatch):
+    import pstats
+    from api.profiling import RequestProfiler
+
+    # 配置中关闭分析时不安装中间件，这里临时给应用装上
+    assert mock_server.profiler is None
+    profiler = RequestProfiler(str(tmp_path / "profiles"), flush_interval=60)
+    monkeypatch.setattr(mock_server.app, "wsgi_app", profiler.wrap(mock_server.app))
+    token = login(client, "admin", "Admin123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/api/v1/users/1", headers=headers)
+    for _ in range(2):
+        client.get("/api/v1/users/1", headers=dict(headers, **{"X-Profile": "1"}))
+    assert profiler.profiled == 2
+    # 写盘由后台线程定时完成，不在请求中进行
+    assert not (tmp_path / "profiles").exists()
+    profiler.close()
+
+    files = sorted(p.name for p in (tmp_path / "profiles").iterdir())
+    assert [name.rsplit(".", 2)[0] for name in files] == ["GET_api_v1_users_int_user_id"] * 2
+    stats = pstats.Stats(str(next((tmp_path / "profiles").glob("*.pstats"))))
+    assert any(func[2] == "get_user" for func in stats.stats)
+    collapsed = next((tmp_path / "profiles").glob("*.collapsed")).read_text(encoding="utf-8")
+    assert any("get_user (mock_server.py" in line and int(line.rsplit(" ", 1)[1]) >= 0
+               for line in collapsed.splitlines())
+
+
+def test_get_user_etag_and_conditional_get(client):
+    token = login(client, "admin", "Admin123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    first = client.get("/api/v1/users/2", headers=headers)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+
+    again = client.get("/api/v1/users/2", headers=dict(headers, **{"If-None-Match": etag}))
+    assert again.status_code == 304
+    assert again.data == b""
+    assert again.headers["ETag"] == etag
+
+    client.put("/api/v1/users/2", json={"phone": "13911112222"}, headers=headers)
+    changed = client.get("/api/v1/users/2", headers=dict(headers, **{"If-None-Match": etag}))
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["data"]["phone"] == "13911112222"
+
+
+def test_large_responses_are_gzipped(client, monkeypatch):
+    import gzip
+
+    monkeypatch.setattr(mock_server, "GZIP_MIN_SIZE", 200)
+    token = login(client, "admin", "Admin123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    plain = client.get("/api/v1/admin/users", headers=headers)
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+
+    packed = client.get("/api/v1/admin/users", headers=dict(headers, **{"Accept-Encoding": "gzip"}))
+    assert packed.headers["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(packed.data)) == plain.get_json()
+
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+
+def test_fault_injection_latency_errors_and_rate_limit(client, monkeypatch):
+    from api.fault_injection import FaultInjector
+
+    monkeypatch.setattr(mock_server, "injector", FaultInjector())
+    token = login(client, "admin", "Admin123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    url = "/api/v1/admin/fault-injection"
+
+    for latency in ({"distribution": "zipf"}, "100", [100]):
+        bad = client.put(url, json={"profiles": {"*": {"latency": latency}}}, headers=headers)
+        assert bad.status_code == 400 and bad.get_json()["code"] == 40015
+    assert not mock_server.injector.active
+
+    resp = client.put(url, headers=headers, json={"profiles": {
+        "GET /api/v1/users/<int:user_id>": {"latency": 30, "error_rate": 1, "error_status": 502},
+        "POST /api/v1/users/login": {"rate_limit": {"rate": 0.5, "burst": 2}},
+    }})
+    assert resp.get_json()["code"] == 200
+
+    start = time.perf_counter()
+    resp = client.get("/api/v1/users/1", headers=headers)
+    assert resp.status_code == 502
+    assert time.perf_counter() - start >= 0.03
+
+    codes = [client.post("/api/v1/users/login", json={"username": "admin", "password": "Admin123!"})
+             for _ in range(3)]
+    assert [r.status_code for r in codes] == [200, 200, 429]
+    assert int(codes[-1].headers["Retry-After"]) >= 1
+
+    # 注入配置接口本身不受影响
+    stats = client.get(url, headers=headers).get_json()["data"]["stats"]
+    assert stats["/api/v1/users/<int:user_id>"]["error"] == 1
+    assert stats["/api/v1/users/<int:user_id>"]["latency"] == 1
+    assert stats["/api/v1/users/login"]["rate_limited"] == 1
+    assert 'mock_server_injected_events_total{route="/api/v1/users/login",kind="rate_limited"} 1' \
+        in client.get("/metrics").get_data(as_text=True)
+
+    client.delete(url, headers=headers)
+    assert client.get("/api/v1/users/1", headers=headers).status_code == 200
+
+
+def test_fault_injection_profiles_sync_between_workers(tmp_path):
+    from api.fault_injection import FaultInjector
+
+    path = str(tmp_path / "fault_injection.json")
+    first = FaultInjector(workers=2, sync_path=path)
+    second = FaultInjector(workers=2, sync_path=path)
+    first.set_profiles({"*": {"rate_limit": {"rate": 10, "burst": 4}}}, publish=True)
+    second.maybe_reload()
+    assert second.active
+    assert second.profile_for("GET", "/x").bucket.rate == 5
+
+    # 共享文件损坏时保留当前配置
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"*": {"latency": ')
+    second._next_check = 0
+    second.maybe_reload()
+    assert second.profile_for("GET", "/x").bucket.rate == 5
+
+
+def test_sorted_index_matches_sorted_list(monkeypatch):
+    import random
+    from api import user_store
+    from api.user_store import SortedIndex
+
+    monkeypatch.setattr(user_store, "INDEX_CHUNK", 4)
+    rng = random.Random(1)
+    expected = sorted((f"{rng.randrange(50):02d}", uid) for uid in range(30))
+    index = SortedIndex(expected)
+    for uid in range(30, 400):
+        if rng.random() < 0.6 or not expected:
+            pair = (f"{rng.randrange(50):02d}", uid)
+            expected.append(pair)
+            expected.sort()
+            index.add(*pair)
+        else:
+            pair = expected.pop(rng.randrange(len(expected)))
+            index.remove(*pair)
+        index.remove("zz", uid)  # 不存在的条目
+    assert len(index) == len(expected)
+    assert list(index.iter_from("")) == expected
+    assert list(index.iter_from("25")) == [p for p in expected if p[0] >= "25"]
+    assert list(index.iter_from("zz")) == []
+
+
+def test_sorted_ids_match_sorted_list(monkeypatch):
+    import random
+    from api import user_store
+    from api.user_store import SortedIds
+
+    monkeypatch.setattr(user_store, "INDEX_CHUNK", 4)
+    rng = random.Random(2)
+    expected = sorted(rng.sample(range(1000), 30))
+    ids = SortedIds(expected)
+    for _ in range(400):
+        if rng.random() < 0.6 or not expected:
+            user_id = rng.randrange(1000)
+            if user_id not in expected:
+                expected.append(user_id)
+                expected.sort()
+                ids.add(user_id)
+        else:
+            ids.remove(expected.pop(rng.randrange(len(expected))))
+        missing = rng.randrange(1001)
+        if missing not in expected:
+            ids.remove(missing)  # 不存在的 ID
+    assert len(ids) == len(expected)
+    assert ids.after(0, len(expected) + 1) == [i for i in expected if i > 0]
+    for cursor in (-1, 250, 999):
+        assert ids.after(cursor, 7) == [i for i in expected if i > cursor][:7]
+
+
+def test_search_by_email_and_phone_prefix(client):
+    token = login(client, "admin", "Admin123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    url = "/api/v1/admin/users/search"
+
+    def search(**params):
+        return client.get(url, query_string=params, headers=headers).get_json()
+
+    # 首次搜索建立有序索引，之后注册 / 更新 / 删除增量维护
+    assert [u["user_id"] for u in search(q="1380013", field="phone")["data"]["users"]] == [2, 1]
+    for i in range(5):
+        client.post("/api/v1/users/register", json={
+            "username": f"s_user{i}", "password": "Abc12345", "email": f"s{i}@search.cn", "phone": f"1331200000{i}"})
+    result = search(q="13312", field="phone", limit=3)["data"]
+    assert [u["phone"] for u in result["users"]] == ["13312000000", "13312000001", "13312000002"]
+    assert result["has_more"] is True
+
+    client.put("/api/v1/users/3", json={"phone": "19900000000", "email": "moved@search.cn"}, headers=headers)
+    client.delete("/api/v1/users/4", json={"reason": "test"}, headers=headers)
+    assert [u["user_id"] for u in search(q="13312", field="phone", limit=10)["data"]["users"]] == [5, 6, 7]
+    assert [u["user_id"] for u in search(q="199", field="phone")["data"]["users"]] == [3]
+    assert search(q="moved@search.cn", mode="exact")["data"]["users"][0]["user_id"] == 3
+    assert search(q="moved@search", mode="exact")["data"]["users"] == []
+    assert [u["email"] for u in search(q="s")["data"]["users"]] == ["s2@search.cn", "s3@search.cn", "s4@search.cn"]
+
+    assert search(q="")["code"] == 40016
+    assert search(q="1", field="username")["code"] == 40016
+    user_token = login(client, "test_user", "Test123!")
+    assert client.get(url, query_string={"q": "1"},
+                      headers={"Authorization": f"Bearer {user_token}"}).get_json()["code"] == 40008
+
+
+def test_search_prefix_ending_in_max_code_point(open_store):
+    store = open_store()
+    for user_id, email in ((3, "a\U0010ffff@x.cn"), (4, "a\U0010ffff\U0010ffff@x.cn"),
+                           (5, "\ud7ff@x.cn"), (6, "\ue000@x.cn"), (7, "b@x.cn")):
+        store.add(dict(SEED_USERS[1], user_id=user_id, username=f"max{user_id}", email=email))
+    assert [u["user_id"] for u in store.search("email", "a\U0010ffff")[0]] == [3, 4]
+    assert [u["user_id"] for u in store.search("email", "\U0010ffff")[0]] == []
+    assert [u["user_id"] for u in store.search("email", "\ud7ff")[0]] == [5]
+
+
+def test_non_string_phone_is_rejected(client):
+    token = login(client, "admin", "Admin123!")
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/api/v1/admin/users/search", query_string={"q": "1", "field": "phone"}, headers=headers)
+
+    resp = client.post("/api/v1/users/register", json={
+        "username": "phone_int", "password": "Abc12345", "email": "phone_int@test.cn", "phone": 13800000000})
+    assert resp.status_code == 400 and resp.get_json()["code"] == 40000
+    resp = client.post("/api/v1/admin/users/create", json={
+        "username": "phone_list", "password": "Abc12345", "email": "phone_list@test.cn", "phone": ["1"]},
+        headers=headers)
+    assert resp.status_code == 400 and resp.get_json()["code"] == 40000
+    resp = client.put("/api/v1/users/2", json={"phone": 1}, headers=headers)
+    assert resp.status_code == 400 and resp.get_json()["code"] == 40010
+    resp = client.post("/api/v1/users/register", json={
+        "username": "phone_none", "password": "Abc12345", "email": "phone_none@test.cn", "phone": None})
+    assert resp.get_json()["code"] == 200
+    assert client.get(f"/api/v1/users/{resp.get_json()['data']['user_id']}",
+                      headers=headers).get_json()["data"]["phone"] == ""
+
+
+def test_store_index_is_all_or_nothing():
+    store = UserStore([dict(u) for u in SEED_USERS])
+    store.search("phone", "1")  # 建立有序索引
+    with pytest.raises(TypeError):
+        store.add(dict(SEED_USERS[1], user_id=3, username="bad", email="bad@test.cn", phone=1))
+    assert store.get(3) is None and not store.username_exists("bad") and not store.email_exists("bad@test.cn")
+    with pytest.raises(TypeError):
+        store.update(2, {"phone": 1})
+    assert store.get(2)["phone"] == "13800138000"
+    assert [u["user_id"] for u in store.search("phone", "1380013")[0]] == [2, 1]
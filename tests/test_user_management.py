@@ -14,15 +14,15 @@ def api_client():
 
 @pytest.fixture(scope="session")
 def registered_users(api_client):
-    """注册用户返回账号密码列表"""
+    """注册用户返回账号密码列表（批量注册，一次请求）"""
     users = []
-    for _ in range(5):
-        params = Parameter.register_parameters()
-        resp = api_client.register(params)
-        resp_json = resp.json()
-        assert resp_json.get("code") == 200
-        assert resp_json.get("message") == "注册成功"
-        data = resp_json.get("data", {})
+    params_list = [Parameter.register_parameters() for _ in range(5)]
+    resp = api_client.batch_register(params_list)
+    results = resp.json()["data"]["results"]
+    for params, result in zip(params_list, results):
+        assert result.get("code") == 200
+        assert result.get("message") == "注册成功"
+        data = result.get("data", {})
         assert isinstance(data.get("user_id"), int)
         assert data.get("create_time") is not None
         users.append({
@@ -35,29 +35,30 @@ def registered_users(api_client):
 
 @pytest.fixture(scope="session")
 def login_info(api_client, registered_users):
-    """登录接口返回用户登录的token"""
+    """登录接口返回用户登录的token（批量登录，一次请求），结果同时放入令牌池"""
     login_info_list = []
+    params_list = []
     for i in range(5):
         params = Parameter.login_parameters()
         params["username"] = registered_users[i]["username"]
         params["password"] = registered_users[i]["password"]
-        # print("9"* 50)
-        # print(params)
-        # print("9" * 50)
-        resp = api_client.login(params)
-        resp_json = resp.json()
+        params_list.append(params)
+    resp = api_client.batch_login(params_list)
+    for params, resp_json in zip(params_list, resp.json()["data"]["results"]):
         assert resp_json["code"] == 200, f"登录失败：{resp_json}"
         assert resp_json["message"] == "登录成功"
         assert "token" in resp_json["data"]
         token = resp_json["data"]["token"]
         user_id = resp_json["data"]["user_info"]["user_id"]
         role = resp_json["data"]["user_info"]["role"]
+        api_client.token_pool.put(api_client.base_url,params["username"],params["password"],resp_json["data"],save=False)
         login_info_list.append({
             "token":token,
             "user_id":user_id,
             "role":role
         })
     # print(login_info_list)
+    api_client.token_pool.save()
     yield login_info_list
 
 
@@ -68,8 +69,8 @@ def obtain_avatar(api_client,login_info):
     for i in range(5):
         token = login_info[i]["token"]
         user_id = login_info[i]["user_id"]
-        api_client.authenticate(token)
-        resp = api_client.obtain(user_id)
+        client = api_client.as_user(token)
+        resp = client.obtain(user_id)
         resp_json = resp.json()
         avatar = resp_json["data"]["avatar"]
         avatar_list.append({"avatar": avatar})
@@ -81,14 +82,8 @@ def obtain_avatar(api_client,login_info):
 
 @pytest.fixture(scope="session")
 def admin_token(api_client,login_info):
-    """获取普通管理员token"""
-    param = {
-        "username": "admin",
-         "password": "Admin123!"
-    }
-    resp = api_client.login(param)
-    resp_json =resp.json()
-    token = resp_json["data"]["token"]
+    """获取普通管理员token（令牌池中有未过期的令牌时不再登录）"""
+    token = api_client.token_pool.get(api_client,"admin","Admin123!")["token"]
     print(f"获取默认管理员token：{token}")
     return token
 
@@ -96,16 +91,11 @@ def admin_token(api_client,login_info):
 @pytest.fixture(scope="session")
 def create_token(api_client,admin_token):
     print()
-    api_client.authenticate(admin_token)
+    client = api_client.as_user(admin_token)
     params = Parameter.admin_parameters()
-    api_client.admin(params)
-
-    login_data = {"username":params["username"],
-                  "password":params["password"]}
+    client.admin(params)
 
-    resp = api_client.login(login_data)
-    resp_json = resp.json()
-    token = resp_json["data"]["token"]
+    token = api_client.token_pool.get(api_client,params["username"],params["password"])["token"]
     print(f"获取新添管理员token：{token}")
     yield token
 
@@ -140,6 +130,17 @@ def test_register(api_client,username):
 
 
 
+@pytest.mark.parametrize("length",[4,10])
+def test_register_short_username(api_client,length):
+    """短用户名（Generate 的唯一用户名至少 11 位，边界长度单独覆盖）"""
+    params = Parameter.register_parameters()
+    params["username"] = Generate.generate_short_username(length,length)
+    resp_json = api_client.register(register_data=params).json()
+    assert resp_json.get("code") == 200, resp_json
+    assert resp_json["data"]["username"] == params["username"]
+
+
+
 # @pytest.mark.skip
 @pytest.mark.parametrize("user_index",range(5))
 def test_login(api_client,registered_users,user_index):  #registered_users被注入测试用例里面后，返回的就是users列表
@@ -164,8 +165,8 @@ def test_obtain(api_client, login_info, index):
     user_id = login_info[index]["user_id"]
     headers = {"Authorization": f"Bearer {token}"}
     print(f"准备传递的 headers: {headers}")
-    api_client.authenticate(token)
-    resp = api_client.obtain(user_id)
+    client = api_client.as_user(token)
+    resp = client.obtain(user_id)
     resp_json = resp.json()
     print("-" * 50)
     print(resp_json)
@@ -176,17 +177,232 @@ def test_obtain(api_client, login_info, index):
 
 
 
+def test_obtain_revalidates_with_etag(api_client, login_info):
+    """重复获取同一用户时客户端带 If-None-Match，服务端返回 304 后复用缓存的响应"""
+    client = api_client.as_user(login_info[0]["token"])
+    user_id = login_info[0]["user_id"]
+    first = client.obtain(user_id)
+    hits = client.etag_cache.hits
+    second = client.obtain(user_id)
+    assert client.etag_cache.hits == hits + 1
+    assert second.json() == first.json()
+
+
+def test_etag_cache_counters_are_thread_safe():
+    from concurrent.futures import ThreadPoolExecutor
+    from api.client import ETagCache
+    cache = ETagCache()
+
+    def count(_):
+        for _ in range(5000):
+            cache.record_hit()
+            cache.record_miss()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(count, range(8)))
+    assert (cache.hits, cache.misses) == (40000, 40000)
+
+
+def test_as_user_concurrent_identities(api_client, login_info):
+    """多个身份句柄共用一个连接池并发请求，各自只拿到自己的用户信息"""
+    from concurrent.futures import ThreadPoolExecutor
+    clients = [(api_client.as_user(info["token"]), info["user_id"]) for info in login_info] * 20
+
+    def obtain(item):
+        client, user_id = item
+        return user_id, client.obtain(user_id).json()
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        for user_id, resp_json in pool.map(obtain, clients):
+            assert resp_json["code"] == 200, f"获取失败:{resp_json}"
+            assert resp_json["data"]["user_id"] == user_id
+    assert "Authorization" not in api_client.session.headers
+    assert all(client.session is api_client.session for client, _ in clients)
+
+
+def test_request_timing(api_client, login_info, tmp_path):
+    """每次请求按接口模板记录耗时和字节数，同时写入 JSONL"""
+    import json
+    from api.timing import RequestRecorder
+    client = api_client.as_user(login_info[0]["token"])
+    client.recorder = RequestRecorder(maxlen=2, sink=str(tmp_path / "timing.jsonl"))
+    for _ in range(3):
+        client.obtain(login_info[0]["user_id"])
+    client.recorder.close()
+    records = list(client.recorder.records)
+    assert len(records) == 2
+    assert {record["endpoint"] for record in records} == {"/api/v1/users/{user_id}"}
+    assert all(0 < record["ttfb"] <= record["total"] for record in records)
+    assert records[-1]["status"] == 304
+    assert all(0 <= record["connect"] <= record["ttfb"] for record in records)
+    assert records[0]["response_bytes"] == 0 and records[0]["request_bytes"] == 0
+    summary = client.recorder.summary()[("GET", "/api/v1/users/{user_id}")]
+    assert summary["count"] == 3 and summary["p95"] > 0
+    lines = (tmp_path / "timing.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["status"] for line in lines][-1] == 304
+    assert len(lines) == 3
+
+
+def test_token_pool_reuses_tokens(api_client, tmp_path):
+    """令牌池：未过期的令牌直接复用（跨实例读取磁盘缓存），快过期或密码变化时重新登录"""
+    import os
+    import threading
+    from api.token_pool import TokenPool
+    path = str(tmp_path / "tokens.json")
+    pool = TokenPool(path, refresh_margin=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.get(api_client,"admin","Admin123!")))
+               for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (pool.logins, pool.hits) == (1, 9)
+    assert len({entry["token"] for entry in results}) == 1
+    assert results[0]["role"] == "admin" and results[0]["exp"] > 0
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert "Admin123!" not in open(path, encoding="utf-8").read()
+
+    reloaded = TokenPool(path, refresh_margin=60)
+    assert reloaded.get(api_client,"admin","Admin123!")["token"] == results[0]["token"]
+    assert reloaded.logins == 0
+    with pytest.raises(RuntimeError):
+        reloaded.get(api_client,"admin","wrong-password1")
+    near_expiry = TokenPool(path, refresh_margin=3600)
+    near_expiry.get(api_client,"admin","Admin123!")
+    assert near_expiry.logins == 1
+
+
+def test_token_pool_concurrent_saves_keep_all_entries(tmp_path):
+    """多个令牌池（模拟多个进程）同时保存同一个文件：文件锁保证彼此的令牌都不丢失，摘要带盐"""
+    import hashlib
+    import threading
+    import time
+    from api.token_pool import TokenPool
+    path = str(tmp_path / "tokens.json")
+    pools = [TokenPool(path) for _ in range(4)]
+    assert len({pool.salt for pool in pools}) == 1
+    exp = int(time.time()) + 3600
+
+    def login_many(index, pool):
+        for i in range(5):
+            pool.put("http://x", f"p{index}_{i}", "Abc12345", {"token": f"t{index}_{i}", "expires_in": 3600})
+            pool.save()
+
+    threads = [threading.Thread(target=login_many, args=item) for item in enumerate(pools)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    reloaded = TokenPool(path)
+    assert len(reloaded._entries) == 20 and all(e["exp"] >= exp for e in reloaded._entries.values())
+    plain = hashlib.blake2b(b"Abc12345", digest_size=16).hexdigest()
+    assert plain not in open(path, encoding="utf-8").read()
+
+
+def test_login_as_evicts_rejected_token():
+    """令牌被服务端拒绝（401）时从令牌池移除，下次 login_as 重新登录"""
+    from api.token_pool import TokenPool
+    api = UserManagementAPI()
+    api.token_pool = TokenPool()
+    api.token_pool.put(api.base_url,"admin","Admin123!",{"token": "stale.token.value"})
+    admin = api.login_as("admin","Admin123!")
+    assert admin.obtain(1).status_code == 401
+    admin = api.login_as("admin","Admin123!")
+    assert admin.obtain(1).json()["code"] == 200
+    assert api.token_pool.logins == 1
+
+
+@pytest.fixture
+def faulty(api_client,admin_token):
+    """按路由设置故障注入，用例结束后清除"""
+    admin = api_client.as_user(admin_token)
+
+    def inject(profiles):
+        resp_json = admin.put("/api/v1/admin/fault-injection",json={"profiles": profiles}).json()
+        assert resp_json["code"] == 200, f"设置故障注入失败：{resp_json}"
+
+    yield inject
+    admin.delete("/api/v1/admin/fault-injection")
+
+
+def test_retry_idempotent_only(api_client,admin_token,faulty):
+    """5xx 时只重试幂等方法，次数计入耗时记录"""
+    from api.timing import RequestRecorder
+    client = api_client.as_user(admin_token)
+    client.recorder = RequestRecorder()
+    faulty({"GET /api/v1/admin/users": {"error_rate": 1},
+            "POST /api/v1/users/batch/get": {"error_rate": 1}})
+    assert client.list_users(limit=1).status_code == 503
+    assert client.batch_obtain([1]).status_code == 503
+    summary = client.recorder.summary()
+    assert summary[("GET","/api/v1/admin/users")]["count"] == client.max_attempts
+    assert summary[("GET","/api/v1/admin/users")]["retry"] == client.max_attempts - 1
+    assert summary[("POST","/api/v1/users/batch/get")]["count"] == 1
+    assert summary[("POST","/api/v1/users/batch/get")]["retry"] == 0
+
+
+def test_deadline_bounds_slow_requests(api_client,login_info,faulty):
+    """服务端变慢时调用在 deadline 内以超时结束"""
+    import time
+    import requests
+    from api.timing import RequestRecorder
+    client = api_client.as_user(login_info[1]["token"])
+    client.recorder = RequestRecorder()
+    faulty({"GET /api/v1/users/<int:user_id>": {"latency": 1000}})
+    start = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        client.get(client.endpoint["obtain"],path_params={"user_id": login_info[1]["user_id"]},deadline=0.3)
+    assert time.monotonic() - start < 0.8
+    assert client.recorder.summary()[("GET","/api/v1/users/{user_id}")]["deadline_exceeded"] == 1
+
+
+def test_hedged_get_takes_first_response(login_info):
+    """第一个请求超过已观测的 p95 时发出对冲请求，取先返回的一个；close() 关闭对冲线程池"""
+    import threading
+    import time
+    from api.timing import RequestRecorder
+    api = UserManagementAPI()
+    client = api.as_user(login_info[2]["token"])
+    client.recorder = RequestRecorder()
+    client.hedge_enabled = True
+    for _ in range(client.hedge_min_samples):
+        client.recorder.record("GET","/api/v1/users/{user_id}",200,0,0.005,0.01,0,100)
+    send = client._send
+    calls = []
+    lock = threading.Lock()
+
+    def slow_first(*args,**kwargs):
+        with lock:
+            calls.append(len(calls))
+            first = len(calls) == 1
+        if first:
+            time.sleep(0.5)
+        return send(*args,**kwargs)
+
+    client._send = slow_first
+    with api:
+        start = time.monotonic()
+        resp = client.obtain(login_info[2]["user_id"])
+        assert time.monotonic() - start < 0.4
+        executor = api._shared["executor"]
+    assert resp.json()["data"]["user_id"] == login_info[2]["user_id"]
+    item = client.recorder.summary()[("GET","/api/v1/users/{user_id}")]
+    assert (item["hedge"],item["hedge_won"]) == (1,1)
+    assert api._shared["executor"] is None and executor._shutdown
+
+
 @pytest.mark.parametrize("index",range(5))
 def test_update(api_client,login_info,index,obtain_avatar):
     token = login_info[index]["token"]
     user_id = login_info[index]["user_id"]
-    api_client.authenticate(token)
+    client = api_client.as_user(token)
     params = Parameter.update_parameters()
     params["avatar"] = obtain_avatar[index]["avatar"]
     print("*" * 80)
     print(params)
     print("*" * 80)
-    resp = api_client.update(user_id,params)
+    resp = client.update(user_id,params)
     resp_json = resp.json()
     assert resp_json["code"] == 200,f"断言出错，返回的json数据为：{resp_json}"
     assert resp_json["message"] == "更新成功"
@@ -199,18 +415,37 @@ def test_delete(api_client,login_info,index):
     user_info = login_info[index]
     token = user_info["token"]
     user_id = user_info["user_id"]
-    api_client.authenticate(token)
+    client = api_client.as_user(token)
     params = {"reason":"用户不想要了"}
-    resp = api_client.delete_user(user_id,params)
+    resp = client.delete_user(user_id,params)
     resp_json = resp.json()
     assert resp_json["code"] == 200,f"断言出错，返回的json数据为：{resp_json}"
     assert resp_json["message"] == "删除成功"
 
 @pytest.mark.parametrize("index",range(5))
 def test_admin_delete(api_client,admin_token,login_info,index):
-    api_client.authenticate(admin_token)
+    client = api_client.as_user(admin_token)
     user_id = login_info[index]["user_id"]
     param = {"reason":"管理员清除"}
-    resp = api_client.delete_user(user_id,param)
+    resp = client.delete_user(user_id,param)
     resp_json = resp.json()
-    print(resp_json)
\ No newline at end of file
+    print(resp_json)
+
+def test_iter_users(api_client,admin_token):
+    """管理员逐页遍历用户列表"""
+    client = api_client.as_user(admin_token)
+    users = list(client.iter_users(page_size=50,role="admin"))
+    assert users, "至少应存在默认管理员"
+    assert all(user["role"] == "admin" for user in users)
+    user_ids = [user["user_id"] for user in users]
+    assert user_ids == sorted(set(user_ids))
+
+def test_search(api_client,admin_token):
+    """管理员按邮箱精确搜索、按手机号前缀搜索"""
+    client = api_client.as_user(admin_token)
+    resp_json = client.search("admin@example.com",mode="exact").json()
+    assert resp_json["code"] == 200
+    assert [user["username"] for user in resp_json["data"]["users"]] == ["admin"]
+    resp_json = client.search("138",field="phone",limit=5).json()
+    assert resp_json["code"] == 200
+    assert all(user["phone"].startswith("138") for user in resp_json["data"]["users"])